@@ -0,0 +1,608 @@
+"""
+Cached, stage-based version of the Final_Analysis.ipynb computations.
+
+The analysis is a graph of stages:
+
+    load -> clean -> derive -> trials -> aggregates (descriptives, correlation,
+    trade-off, faulty-AI trust, error detection) -> tests / figures
+
+clean and derive run once per participant; the other stages see the whole
+table. Every stage's output is memoized on disk under a key made from the
+stage's code (its source, the constants it uses, the repo-local helpers
+and modules it reaches and the numpy/pandas/scipy versions), its
+parameters and the content fingerprints of its inputs. On a re-run:
+
+    - a participant whose rows did not change is not cleaned or derived again;
+    - a stage whose inputs are unchanged is loaded from the cache;
+    - a stage that re-runs but produces the same output as before (e.g. the
+      error-detection table when the new participant never saw a faulty AI)
+      leaves everything downstream cached.
+
+Stages whose inputs are ready run in parallel in a process pool. Tables are
+written to <output>/tables/*.csv and figures (with matplotlib installed) to
+<output>/figures/*.png.
+
+Usage:
+    python analysis_pipeline.py [data/results.csv] [--output data/analysis]
+                                [--workers 4] [--resamples 10000]
+"""
+
+import argparse
+import csv
+import hashlib
+import inspect
+import io
+import json
+import os
+import pickle
+import sys
+import warnings
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from data_logger import RESULTS_COLUMNS
+from resampling import (AWARENESS_COLS, COMPOSITE_COLS, POST_TRUST_COLS, PRE_TRUST_COLS,
+                        PRODUCTIVITY_COLS, contrast_tests)
+
+try:
+    from matplotlib.figure import Figure
+except ImportError:  # figures are skipped
+    Figure = None
+
+
+_REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT_DIR = os.path.join("data", "analysis")
+LOA3_TIME_OFFSET = 70  # seconds subtracted from LOA 3 completion times, as in Final_Analysis.ipynb
+BOOL_COLUMNS = ("ai_faulty", "accepted_advice", "overridden", "final_correctness")
+TEXT_COLUMNS = ("participant_id", "start_time", "end_time", "action_sequence", "final_answer",
+                "expected_answer", "loa3_degradation")
+SUMMARY_METRICS = ["productivity_score", "awareness_score", "pre_trust_score", "post_trust_score",
+                   "trust_change", "completion_time", "num_interactions", "final_correctness"]
+LOA_TEST_METRICS = ["productivity_score", "awareness_score", "post_trust_score", "trust_change",
+                    "completion_time", "final_correctness"]
+
+
+class Stage(NamedTuple):
+    name: str
+    func: Callable
+    inputs: Tuple[str, ...] = ()
+    per_participant: bool = False  # func maps one participant's frame to a frame
+    kind: str = "table"  # "table" (written as CSV), "figure" (PNG bytes) or "data"
+
+
+# ---------------------------------------------------------------------- stages
+
+def load_results_rows(results_file: str) -> Dict[str, pd.DataFrame]:
+    """results.csv as raw strings, one frame per participant (rows longer than the header are cut)."""
+    with open(results_file, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        rows = [row[:len(header)] + [""] * (len(header) - len(row)) for row in reader if row]
+    frame = pd.DataFrame(rows, columns=header, dtype=object)
+    if "participant_id" not in frame:
+        return {}
+    return {str(pid): part.reset_index(drop=True) for pid, part in frame.groupby("participant_id", sort=True)}
+
+
+def clean_participant(raw: pd.DataFrame) -> pd.DataFrame:
+    """Keep the logger's columns (dropping hand-added junk such as Column2..) with proper types."""
+    frame = pd.DataFrame(index=raw.index)
+    for name in RESULTS_COLUMNS:
+        values = raw[name] if name in raw else pd.Series("", index=raw.index, dtype=object)
+        if name in BOOL_COLUMNS:
+            frame[name] = values.astype(str).str.strip().str.lower().isin(("true", "1"))
+        elif name in TEXT_COLUMNS:
+            frame[name] = values.fillna("").astype(str)
+        else:
+            frame[name] = pd.to_numeric(values, errors="coerce")
+    return frame[frame["loa_level"].between(1, 4)].reset_index(drop=True)
+
+
+def derive_scores(trials: pd.DataFrame) -> pd.DataFrame:
+    """Composite productivity, awareness and trust scores per trial."""
+    frame = trials.copy()
+    frame.loc[frame["loa_level"] == 3, "completion_time"] -= LOA3_TIME_OFFSET
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)  # LOA 1 has no trust answers
+        frame["productivity_score"] = frame[PRODUCTIVITY_COLS].mean(axis=1)
+        frame["awareness_score"] = frame[AWARENESS_COLS].sum(axis=1)
+        frame["pre_trust_score"] = frame[PRE_TRUST_COLS].mean(axis=1)
+        frame["post_trust_score"] = frame[POST_TRUST_COLS].mean(axis=1)
+    frame["trust_change"] = frame["post_trust_score"] - frame["pre_trust_score"]
+    return frame
+
+
+def combine_trials(derived: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """All participants' trials plus the scores that depend on the whole sample."""
+    frames = [derived[pid] for pid in sorted(derived)]
+    trials = pd.concat(frames, ignore_index=True) if frames else derive_scores(clean_participant(pd.DataFrame()))
+    times = trials["completion_time"].astype(float)
+    spread = times.max() - times.min()
+    time_score = 1 - (times - times.min()) / spread if spread > 0 else pd.Series(0.5, index=trials.index)
+    trials["productivity_objective"] = trials["final_correctness"].astype(int) * time_score
+    return trials
+
+
+def describe_by_loa(trials: pd.DataFrame) -> pd.DataFrame:
+    """Mean, median, SD and count of every summary metric per LOA."""
+    metrics = SUMMARY_METRICS + ["productivity_objective"]
+    grouped = trials.groupby("loa_level")[metrics].agg(["mean", "median", "std", "count"])
+    grouped.columns = [f"{metric}_{stat}" for metric, stat in grouped.columns]
+    return grouped.reset_index()
+
+
+def correlation_matrix(trials: pd.DataFrame) -> pd.DataFrame:
+    return trials[SUMMARY_METRICS].astype(float).corr().reset_index(names="metric")
+
+
+def tradeoff_by_loa(trials: pd.DataFrame) -> pd.DataFrame:
+    """Productivity, awareness and trust on a 0-1 scale per LOA, with their balance."""
+    normalized = pd.DataFrame({
+        "loa_level": trials["loa_level"],
+        "productivity": trials["productivity_objective"],
+        "awareness": trials["awareness_score"] / 10,
+        "trust": (trials["post_trust_score"] - 1) / 4,
+    })
+    summary = normalized.groupby("loa_level").mean()
+    dimensions = summary[["productivity", "awareness", "trust"]]
+    summary["balance"] = dimensions.std(axis=1)  # lower = more balanced
+    summary["average"] = dimensions.mean(axis=1)
+    return summary.reset_index()
+
+
+def faulty_trust(trials: pd.DataFrame) -> pd.DataFrame:
+    """Pre/post trust and trust change for faulty vs reliable AI (LOA 2-4)."""
+    ai_trials = trials[trials["loa_level"] > 1]
+    grouped = ai_trials.groupby("ai_faulty")[["pre_trust_score", "post_trust_score", "trust_change"]]
+    summary = grouped.agg(["mean", "std", "count"])
+    summary.columns = [f"{metric}_{stat}" for metric, stat in summary.columns]
+    return summary.reset_index()
+
+
+def faulty_detection(trials: pd.DataFrame) -> pd.DataFrame:
+    """Share of faulty-AI trials per LOA that still ended with the correct answer."""
+    faulty = trials[(trials["loa_level"] > 1) & trials["ai_faulty"]]
+    summary = faulty.groupby("loa_level").agg(
+        sessions=("final_correctness", "size"),
+        caught=("final_correctness", "sum"),
+        awareness=("awareness_score", "mean"),
+    )
+    summary["catch_rate"] = summary["caught"] / summary["sessions"]
+    return summary.reset_index()
+
+
+def loa_tests(trials: pd.DataFrame) -> pd.DataFrame:
+    """One-way ANOVA and Kruskal-Wallis across LOAs for the key metrics."""
+    rows = []
+    for metric in LOA_TEST_METRICS:
+        groups = [group[metric].astype(float).dropna().to_numpy()
+                  for _, group in trials.groupby("loa_level")]
+        groups = [group for group in groups if group.size > 1]
+        row = {"metric": metric, "groups": len(groups), "anova_f": np.nan, "anova_p": np.nan,
+               "kruskal_h": np.nan, "kruskal_p": np.nan}
+        if len(groups) > 1 and any(np.ptp(group) > 0 for group in groups):
+            row["anova_f"], row["anova_p"] = stats.f_oneway(*groups)
+            row["kruskal_h"], row["kruskal_p"] = stats.kruskal(*groups)
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def faulty_tests(trials: pd.DataFrame) -> pd.DataFrame:
+    """Welch t-tests of faulty vs reliable AI trials (LOA 2-4) for trust."""
+    ai_trials = trials[trials["loa_level"] > 1]
+    rows = []
+    for metric in ("pre_trust_score", "post_trust_score", "trust_change"):
+        faulty = ai_trials.loc[ai_trials["ai_faulty"], metric].dropna()
+        reliable = ai_trials.loc[~ai_trials["ai_faulty"], metric].dropna()
+        statistic, p_value = (stats.ttest_ind(faulty, reliable, equal_var=False)
+                              if len(faulty) > 1 and len(reliable) > 1 else (np.nan, np.nan))
+        rows.append({"metric": metric, "n_faulty": len(faulty), "n_reliable": len(reliable),
+                     "mean_difference": faulty.mean() - reliable.mean(), "t": statistic, "p_value": p_value})
+    return pd.DataFrame(rows)
+
+
+def resampling_tests(trials: pd.DataFrame, resamples: int = 10000, seed: int = 0) -> pd.DataFrame:
+    """Bootstrap CIs and permutation p-values (resampling.py) for the composite scores."""
+    data = {"loa_level": trials["loa_level"].to_numpy(dtype=np.int64),
+            "ai_faulty": trials["ai_faulty"].to_numpy(dtype=bool)}
+    metrics = COMPOSITE_COLS + ["completion_time", "final_correctness"]
+    for metric in metrics:
+        data[metric] = trials[metric].to_numpy(dtype=np.float64)
+    return pd.DataFrame(contrast_tests(data, metrics, n_resamples=resamples, seed=seed))
+
+
+def _png(figure) -> bytes:
+    buffer = io.BytesIO()
+    figure.tight_layout()
+    figure.savefig(buffer, format="png", dpi=100)
+    return buffer.getvalue()
+
+
+def plot_metrics(descriptives: pd.DataFrame) -> bytes:
+    """Bar charts of the mean of each key metric per LOA (notebook section 9)."""
+    panels = [("productivity_objective", "Productivity Score", (0, 1)), ("awareness_score", "Awareness Score", (0, 10)),
+              ("post_trust_score", "Post-Task Trust", (0, 5)), ("completion_time", "Completion Time (s)", None),
+              ("num_interactions", "Interactions", None), ("final_correctness", "Correctness", (0, 1))]
+    figure = Figure(figsize=(18, 10))
+    figure.suptitle("Average Metrics by Level of Automation", fontsize=16, fontweight="bold")
+    labels = descriptives["loa_level"].astype(int).astype(str)
+    for i, (metric, title, limits) in enumerate(panels):
+        ax = figure.add_subplot(2, 3, i + 1)
+        ax.bar(labels, descriptives[f"{metric}_mean"], color="#4682B4", alpha=0.8)
+        ax.set_xlabel("LOA Level")
+        ax.set_title(title)
+        if limits:
+            ax.set_ylim(limits)
+        ax.grid(axis="y", alpha=0.3)
+    return _png(figure)
+
+
+def plot_correlation(correlation: pd.DataFrame) -> bytes:
+    """Heatmap of the correlation matrix (notebook section 11)."""
+    matrix = correlation.set_index("metric")
+    figure = Figure(figsize=(10, 8))
+    ax = figure.add_subplot(1, 1, 1)
+    image = ax.imshow(matrix.to_numpy(dtype=float), cmap="Blues", vmin=-1, vmax=1)
+    ax.set_xticks(range(len(matrix.columns)), matrix.columns, rotation=45, ha="right")
+    ax.set_yticks(range(len(matrix.index)), matrix.index)
+    for (row, col), value in np.ndenumerate(matrix.to_numpy(dtype=float)):
+        ax.text(col, row, f"{value:.2f}", ha="center", va="center", fontsize=8)
+    figure.colorbar(image, ax=ax, shrink=0.8)
+    ax.set_title("Correlation: Key Metrics", fontsize=14, fontweight="bold")
+    return _png(figure)
+
+
+def plot_tradeoff(tradeoff: pd.DataFrame) -> bytes:
+    """Normalized productivity, awareness and trust per LOA (notebook section 15)."""
+    figure = Figure(figsize=(10, 6))
+    ax = figure.add_subplot(1, 1, 1)
+    positions = np.arange(len(tradeoff))
+    for i, dimension in enumerate(("productivity", "awareness", "trust")):
+        ax.bar(positions + (i - 1) * 0.25, tradeoff[dimension], width=0.25, label=dimension.title())
+    ax.set_xticks(positions, [f"LOA {int(level)}" for level in tradeoff["loa_level"]])
+    ax.set_ylim(0, 1)
+    ax.set_ylabel("Score (0-1)")
+    ax.legend()
+    ax.set_title("Trade-off Between Productivity, Awareness and Trust", fontweight="bold")
+    return _png(figure)
+
+
+def plot_faulty_trust(trust: pd.DataFrame) -> bytes:
+    """Pre/post trust for faulty vs reliable AI."""
+    figure = Figure(figsize=(8, 6))
+    ax = figure.add_subplot(1, 1, 1)
+    positions = np.arange(len(trust))
+    for offset, metric, label in ((-0.2, "pre_trust_score", "Pre-task"), (0.2, "post_trust_score", "Post-task")):
+        ax.bar(positions + offset, trust[f"{metric}_mean"], width=0.4, yerr=trust[f"{metric}_std"],
+               capsize=4, label=label)
+    ax.set_xticks(positions, ["Faulty AI" if faulty else "Reliable AI" for faulty in trust["ai_faulty"]])
+    ax.set_ylim(0, 5)
+    ax.set_ylabel("Trust (1-5)")
+    ax.legend()
+    ax.set_title("Trust With Faulty vs Reliable AI (LOA 2-4)", fontweight="bold")
+    return _png(figure)
+
+
+def plot_detection(detection: pd.DataFrame) -> bytes:
+    """Rate of caught AI errors per LOA."""
+    figure = Figure(figsize=(8, 6))
+    ax = figure.add_subplot(1, 1, 1)
+    ax.bar([f"LOA {int(level)}" for level in detection["loa_level"]], detection["catch_rate"] * 100, color="coral")
+    ax.set_ylim(0, 100)
+    ax.set_ylabel("Faulty AI trials answered correctly (%)")
+    ax.set_title("Detection of Faulty AI by LOA", fontweight="bold")
+    return _png(figure)
+
+
+STAGES = [
+    Stage("load", load_results_rows, kind="data"),
+    Stage("clean", clean_participant, ("load",), per_participant=True, kind="data"),
+    Stage("derive", derive_scores, ("clean",), per_participant=True, kind="data"),
+    Stage("trials", combine_trials, ("derive",)),
+    Stage("descriptives", describe_by_loa, ("trials",)),
+    Stage("correlation", correlation_matrix, ("trials",)),
+    Stage("tradeoff", tradeoff_by_loa, ("trials",)),
+    Stage("faulty_trust", faulty_trust, ("trials",)),
+    Stage("faulty_detection", faulty_detection, ("trials",)),
+    Stage("loa_tests", loa_tests, ("trials",)),
+    Stage("faulty_tests", faulty_tests, ("trials",)),
+    Stage("resampling", resampling_tests, ("trials",)),
+    Stage("plot_metrics", plot_metrics, ("descriptives",), kind="figure"),
+    Stage("plot_correlation", plot_correlation, ("correlation",), kind="figure"),
+    Stage("plot_tradeoff", plot_tradeoff, ("tradeoff",), kind="figure"),
+    Stage("plot_faulty_trust", plot_faulty_trust, ("faulty_trust",), kind="figure"),
+    Stage("plot_detection", plot_detection, ("faulty_detection",), kind="figure"),
+]
+
+
+# ---------------------------------------------------------------------- hashing
+
+def _library_versions() -> str:
+    versions = [f"python={sys.version_info[0]}.{sys.version_info[1]}"]
+    for name in ("numpy", "pandas", "scipy", "matplotlib"):
+        module = sys.modules.get(name)
+        versions.append(f"{name}={getattr(module, '__version__', None)}")
+    return " ".join(versions)
+
+
+LIBRARY_VERSIONS = _library_versions()  # part of every code hash: a new scipy may change results
+
+
+def _is_repo_local(obj) -> bool:
+    path = getattr(inspect.getmodule(obj), "__file__", None)
+    return bool(path) and os.path.dirname(os.path.abspath(path)) == _REPO_DIR
+
+
+def _referenced_names(code) -> List[str]:
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if inspect.iscode(const):  # nested functions, lambdas, comprehensions
+            names.update(_referenced_names(const))
+    return sorted(names)
+
+
+def code_hash(func: Callable) -> str:
+    """
+    Hash of a stage's source, the constants it refers to, the repo-local
+    functions, classes and modules it reaches (e.g. resampling.py), and the
+    library versions.
+    """
+    digest = hashlib.sha256(LIBRARY_VERSIONS.encode("utf-8"))
+    seen, pending = set(), [func]
+    while pending:
+        current = pending.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        digest.update(inspect.getsource(current).encode("utf-8"))
+        if not inspect.isfunction(current):
+            continue  # a module or class: its whole source is hashed
+        for name in _referenced_names(current.__code__):
+            value = current.__globals__.get(name)
+            if (inspect.isfunction(value) or inspect.isclass(value) or inspect.ismodule(value)) and _is_repo_local(value):
+                pending.append(value)
+            elif isinstance(value, (int, float, str, tuple, list)) and not isinstance(value, bool):
+                digest.update(f"{name}={value!r}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def fingerprint(value) -> str:
+    """Content hash of a stage output (frames by value, not by memory layout)."""
+    digest = hashlib.sha256()
+    if isinstance(value, pd.DataFrame):
+        digest.update(repr((list(value.columns), [str(t) for t in value.dtypes], list(value.index))).encode("utf-8"))
+        if (value.dtypes == object).all():
+            # Raw partitions: one join instead of hashing ~1000 string columns one by one
+            digest.update("\x1f".join(map(str, value.to_numpy().ravel())).encode("utf-8"))
+        else:
+            for _, column in value.items():
+                values = column.to_numpy()
+                if values.dtype == object:
+                    digest.update("\x1f".join(map(str, values)).encode("utf-8"))
+                else:
+                    digest.update(np.ascontiguousarray(values).tobytes())
+    elif isinstance(value, bytes):
+        digest.update(value)
+    elif isinstance(value, dict):
+        for key in sorted(value):
+            digest.update(f"{key}\x00{fingerprint(value[key])}\x00".encode("utf-8"))
+    else:
+        digest.update(pickle.dumps(value, protocol=4))
+    return digest.hexdigest()
+
+
+def _key(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+# ---------------------------------------------------------------------- runner
+
+def _map_participants(func: Callable, items: List[Tuple[str, pd.DataFrame]]) -> List[Tuple[str, pd.DataFrame]]:
+    return [(pid, func(frame)) for pid, frame in items]
+
+
+def _call(func: Callable, args: tuple, kwargs: Dict):
+    return func(*args, **kwargs)
+
+
+class AnalysisPipeline:
+    """
+    Args:
+        results_file: results.csv to analyse
+        output_dir: Where tables/, figures/ and the stage cache (cache/) go
+        workers: Processes for independent stages (1 runs everything in-process)
+        resamples: Replicates per contrast for the resampling stage
+        stages: Stage graph (default: STAGES)
+    """
+
+    def __init__(self, results_file: str = os.path.join("data", "results.csv"),
+                 output_dir: str = DEFAULT_OUTPUT_DIR, workers: Optional[int] = None,
+                 resamples: int = 10000, stages: Sequence[Stage] = STAGES):
+        self.results_file = results_file
+        self.output_dir = output_dir
+        self.cache_dir = os.path.join(output_dir, "cache")
+        self.workers = workers or os.cpu_count() or 1
+        self.params = {"resampling": {"resamples": resamples}}
+        self.stages = list(stages)
+        self._code = {stage.name: code_hash(stage.func) for stage in self.stages}
+
+    # ------------------------------------------------------------------ cache
+
+    def _cache_path(self, stage: str, key: str) -> str:
+        return os.path.join(self.cache_dir, stage, key[:2], key + ".pkl")
+
+    def _cached(self, stage: str, key: str):
+        try:
+            with open(self._cache_path(stage, key), "rb") as f:
+                return pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def _store(self, stage: str, key: str, output) -> str:
+        value_hash = fingerprint(output)
+        path = self._cache_path(stage, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump((value_hash, output), f, protocol=4)
+        os.replace(path + ".tmp", path)
+        return value_hash
+
+    # ------------------------------------------------------------------ run
+
+    def run(self) -> Dict[str, Dict]:
+        """
+        Bring every stage up to date.
+
+        Returns:
+            {stage: {"status": "cached" | "ran" | "skipped", "computed": partitions
+            recomputed (per-participant stages), "fingerprint": output hash}}
+        """
+        outputs: Dict[str, object] = {}
+        hashes: Dict[str, str] = {}
+        report: Dict[str, Dict] = {}
+        waiting = {stage.name: stage for stage in self.stages}
+        running: Dict = {}  # future -> (stage, key or partition ids)
+        partial: Dict[str, Dict] = {}  # per-participant stage -> {pid: (hash, frame)}
+
+        pool = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+        try:
+            while waiting or running:
+                for stage in [s for s in waiting.values() if all(i in hashes for i in s.inputs)]:
+                    del waiting[stage.name]
+                    if stage.kind == "figure" and Figure is None:
+                        report[stage.name] = {"status": "skipped", "reason": "matplotlib is not installed"}
+                        continue
+                    if any(i not in outputs for i in stage.inputs):  # an input was skipped
+                        report[stage.name] = {"status": "skipped", "reason": "input skipped"}
+                        continue
+                    self._start(stage, outputs, hashes, report, running, partial, pool)
+                if not running:
+                    continue
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, key = running.pop(future)
+                    self._finish(stage, key, future.result(), outputs, hashes, report, running, partial)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        self._write_outputs(outputs, report)
+        return report
+
+    def _start(self, stage: Stage, outputs, hashes, report, running, partial, pool):
+        if stage.name == "load":
+            digest = hashlib.sha256()
+            with open(self.results_file, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+            input_hashes = [digest.hexdigest()]
+        else:
+            input_hashes = [hashes[name] for name in stage.inputs]
+
+        if stage.per_participant:
+            source = outputs[stage.inputs[0]]
+            partial[stage.name] = {}
+            missing = []
+            for pid, frame in source.items():
+                key = _key(stage.name, self._code[stage.name], fingerprint(frame))
+                cached = self._cached(stage.name, key)
+                if cached is None:
+                    missing.append((pid, key, frame))
+                else:
+                    partial[stage.name][pid] = cached
+            report[stage.name] = {"status": "ran" if missing else "cached", "computed": len(missing)}
+            if not missing:
+                self._complete_partitions(stage, source, outputs, hashes, report, partial)
+                return
+            chunk = max(1, -(-len(missing) // self.workers))
+            for start in range(0, len(missing), chunk):
+                batch = missing[start:start + chunk]
+                items = [(pid, frame) for pid, _, frame in batch]
+                keys = {pid: key for pid, key, _ in batch}
+                running[self._submit(pool, _map_participants, (stage.func, items), {})] = (stage, keys)
+            partial[stage.name]["__pending__"] = len(missing)
+            return
+
+        params = self.params.get(stage.name, {})
+        key = _key(stage.name, self._code[stage.name], params, input_hashes)
+        cached = self._cached(stage.name, key)
+        if cached is not None:
+            hashes[stage.name], outputs[stage.name] = cached
+            report[stage.name] = {"status": "cached", "fingerprint": hashes[stage.name]}
+            return
+        args = (self.results_file,) if stage.name == "load" else tuple(outputs[name] for name in stage.inputs)
+        running[self._submit(pool, _call, (stage.func, args, params), {})] = (stage, key)
+
+    @staticmethod
+    def _submit(pool, func, args, kwargs):
+        if pool is not None:
+            return pool.submit(func, *args, **kwargs)
+        future = Future()
+        try:
+            future.set_result(func(*args, **kwargs))
+        except Exception as exc:  # surfaced by future.result() like a pool failure
+            future.set_exception(exc)
+        return future
+
+    def _finish(self, stage: Stage, key, result, outputs, hashes, report, running, partial):
+        if stage.per_participant:
+            done = partial[stage.name]
+            for pid, frame in result:
+                done[pid] = (self._store(stage.name, key[pid], frame), frame)
+                done["__pending__"] -= 1
+            if done["__pending__"] == 0:
+                del done["__pending__"]
+                self._complete_partitions(stage, outputs[stage.inputs[0]], outputs, hashes, report, partial)
+            return
+        hashes[stage.name] = self._store(stage.name, key, result)
+        outputs[stage.name] = result
+        report[stage.name] = {"status": "ran", "fingerprint": hashes[stage.name]}
+
+    def _complete_partitions(self, stage: Stage, source, outputs, hashes, report, partial):
+        done = partial.pop(stage.name)
+        outputs[stage.name] = {pid: done[pid][1] for pid in source}
+        hashes[stage.name] = _key(stage.name, sorted((pid, done[pid][0]) for pid in source))
+        report[stage.name]["fingerprint"] = hashes[stage.name]
+
+    def _write_outputs(self, outputs: Dict[str, object], report: Dict[str, Dict]):
+        """Write tables and figures whose stage ran or whose file is missing."""
+        for stage in self.stages:
+            if stage.kind == "data" or stage.name not in outputs:
+                continue
+            folder, suffix = ("figures", ".png") if stage.kind == "figure" else ("tables", ".csv")
+            path = os.path.join(self.output_dir, folder, stage.name + suffix)
+            if report[stage.name]["status"] == "cached" and os.path.exists(path):
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if stage.kind == "figure":
+                with open(path, "wb") as f:
+                    f.write(outputs[stage.name])
+            else:
+                outputs[stage.name].to_csv(path, index=False)
+        with open(os.path.join(self.output_dir, "report.json"), "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the cached HTI analysis pipeline")
+    parser.add_argument("results_file", nargs="?", default=os.path.join("data", "results.csv"))
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--workers", type=int, default=None, help="Processes (default: CPU count)")
+    parser.add_argument("--resamples", type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    report = AnalysisPipeline(args.results_file, args.output, args.workers, args.resamples).run()
+    for stage in STAGES:
+        name, entry = stage.name, report[stage.name]
+        detail = entry.get("reason") or (f"{entry['computed']} participants" if "computed" in entry else "")
+        print(f"  {name:<18} {entry['status']:<8} {detail}")
+    print(f"Tables and figures in {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,45 +1,59 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import Blueprint, Flask, Response, current_app, has_app_context, render_template, request, jsonify, session, redirect, url_for, stream_with_context
 from flask_cors import CORS
+import importlib.util
 import json
 import random
 import os
 import re
+import sys
+import threading
 import time
 import asyncio
+import urllib.parse
+import hashlib
+import hmac
 from datetime import datetime
 from data_logger import DataLogger
+from event_codec import TrialEvents
+from live_stats import LiveAggregator, sse_stream
+from page_cache import PageCache
+from request_profiler import RequestProfiler
+from snapshots import Snapshotter
+from graceful import DrainTracker, load_secret_key
+from circuit_breaker import CircuitBreaker, DeadlineExceeded
+from single_flight import SingleFlight
+from sharding import parse_nodes, shard_for
+from hedging import HedgePolicy, hedged_call
+from loa3_prompt import DEFAULT_TOKEN_BUDGET, PromptBuilder
+from plan_salvage import parse_plan_json
+from model_backends import GeminiBackend
+from model_cassettes import CassetteStore, RecordingBackend, ReplayBackend
+from trial_replay import ReplayService
 from dotenv import load_dotenv
 
-load_dotenv()  # Load environment variables from .env if present
+# Routes live on a blueprint; create_app() loads config and puzzles and builds
+# the Flask app. `from app import app` builds a default app on first access.
+bp = Blueprint('experiment', __name__)
 
-try:
-    import google.generativeai as genai
-    GEMINI_AVAILABLE = True
-except ImportError:
-    genai = None
-    GEMINI_AVAILABLE = False
+PUZZLES_FILE = 'logic_puzzles.json'
 
-app = Flask(__name__)
-app.secret_key = os.urandom(24)  # Secret key for session management
-CORS(app)
-
-# Initialize data logger
-logger = DataLogger()
-
-# Load puzzle data
-with open('logic_puzzles.json', 'r', encoding='utf-8') as f:
-    puzzle_data = json.load(f)
-
-# Only use the model specified in .env, no fallbacks
-GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL_NAME")
-if not GEMINI_MODEL_NAME:
-    raise ValueError("GEMINI_MODEL_NAME must be set in .env file")
+# Former module globals, now ExperimentState attributes (see __getattr__)
+_STATE_ALIASES = {
+    'logger': 'logger', 'live_stats': 'live_stats', 'replay_service': 'replay_service',
+    'puzzle_data': 'puzzle_data', 'ADMIN_TOKEN': 'admin_token', 'GEMINI_MODEL_NAME': 'model_name',
+    'GEMINI_CONFIGURED': 'gemini_configured', 'MODEL_BACKEND': 'model_backend',
+    'HEDGE_POLICY': 'hedge_policy', 'PROMPT_BUILDER': 'prompt_builder', 'LOA3_BREAKER': 'breaker',
+    'LOA3_FLIGHTS': 'flights',
+}
 
-GEMINI_MODEL_CANDIDATES = [GEMINI_MODEL_NAME]
+ADMIN_SESSION_KEY = 'admin'  # set by /admin/login
+LOOPBACK_ADDRESSES = {'127.0.0.1', '::1'}
 
 LOA3_TOTAL_STEPS = 5
 LOA3_MIN_STEPS_BEFORE_FINAL = 3
 LOA3_MAX_MODEL_ATTEMPTS = 3
+LOA3_RETRY_DELAY_SECONDS = 2  # between model attempts, to avoid rate limits
+LOA3_DEADLINE_SECONDS = 20.0  # budget for one plan request before the local plan is served
 LOA3_PLAN_EXAMPLE = """
 {
   "steps": [
@@ -107,40 +121,50 @@ def _make_step_object(step_number, step_text, is_final, final_sequence):
     }
 
 
-def _validate_loa3_plan(steps, required_numbers, expected_final_sequence, puzzle_elements):
-    if len(steps) != len(required_numbers):
-        return False, "incorrect_number_of_steps"
+def _valid_step_prefix(steps, required_numbers, expected_final_sequence, puzzle_elements):
+    """
+    Check steps in order against `required_numbers`.
 
+    Returns:
+        (number of leading steps that are valid, reason the next one is not or None)
+    """
     seen_numbers = set()
-    for idx, expected_number in enumerate(required_numbers):
+    for idx, expected_number in enumerate(required_numbers[:len(steps)]):
         step = steps[idx]
         actual_number = step.get("step_number")
         if actual_number != expected_number:
-            return False, f"unexpected_step_number_{actual_number}_expected_{expected_number}"
+            return idx, f"unexpected_step_number_{actual_number}_expected_{expected_number}"
         if actual_number in seen_numbers:
-            return False, "duplicate_step_number"
+            return idx, "duplicate_step_number"
         seen_numbers.add(actual_number)
 
         text = (step.get("step_text") or "").strip()
         if not text:
-            return False, "empty_step_text"
+            return idx, "empty_step_text"
         if actual_number != LOA3_TOTAL_STEPS and _looks_like_full_sequence(text, puzzle_elements):
-            return False, "premature_full_sequence"
+            return idx, "premature_full_sequence"
 
         is_final = bool(step.get("is_final", False))
         final_sequence = _normalize_sequence_string(step.get("final_sequence"))
         if actual_number == LOA3_TOTAL_STEPS:
             if not is_final:
-                return False, "final_step_missing_flag"
+                return idx, "final_step_missing_flag"
             if final_sequence != expected_final_sequence:
-                return False, f"final_sequence_mismatch: expected '{expected_final_sequence}', got '{final_sequence}'"
+                return idx, f"final_sequence_mismatch: expected '{expected_final_sequence}', got '{final_sequence}'"
         else:
             if is_final:
-                return False, "non_final_marked_final"
+                return idx, "non_final_marked_final"
             if final_sequence:
-                return False, "non_final_has_sequence"
+                return idx, "non_final_has_sequence"
+
+    return min(len(steps), len(required_numbers)), None
+
 
-    return True, None
+def _validate_loa3_plan(steps, required_numbers, expected_final_sequence, puzzle_elements):
+    if len(steps) != len(required_numbers):
+        return False, "incorrect_number_of_steps"
+    _, reason = _valid_step_prefix(steps, required_numbers, expected_final_sequence, puzzle_elements)
+    return reason is None, reason
 
 
 def _extract_reasoning_sentences(text):
@@ -153,104 +177,136 @@ def _extract_reasoning_sentences(text):
     return sentences
 
 
-async def _plan_steps_gemini(puzzle, accepted_steps, start_step_number, expected_final_sequence, is_faulty, puzzle_elements):
-    remaining_numbers = list(range(start_step_number, LOA3_TOTAL_STEPS + 1))
-    accepted_text = (
-        "\n".join(step["step_text"] for step in accepted_steps)
-        if accepted_steps else "None so far."
-    )
+def _reject_reason(reason):
+    """Collapse a validation reason to its category, e.g. 'final_sequence_mismatch'."""
+    return re.sub(r"_-?\d+", "", reason.split(":")[0])
 
-    base_prompt = (
-        "You are an AI assistant helping a participant solve a logic puzzle.\n"
-        "You must operate under a supervisory model: generate a fixed number of reasoning steps, "
-        "and the user will reveal them one by one.\n\n"
-        f"Puzzle:\n{puzzle.get('prompt', '')}\n\n"
-        f"Previously accepted steps:\n{accepted_text}\n\n"
-        f"Generate EXACTLY {len(remaining_numbers)} new steps covering Step {remaining_numbers[0]} "
-        f"through Step {LOA3_TOTAL_STEPS}. Each step must:\n"
-        "- Start with the literal prefix \"Step X:\" where X is the step number.\n"
-        "- Contain only 1-2 sentences describing a single incremental deduction.\n"
-        "- Avoid revealing the final arrangement until Step {LOA3_TOTAL_STEPS}.\n"
-        f"- The final arrangement MUST be exactly: \"{expected_final_sequence}\".\n"
-        f"- Step {LOA3_TOTAL_STEPS} must include the phrase \"This is my final step\" and set is_final=true.\n"
-        f"- The 'final_sequence' field in the JSON for Step {LOA3_TOTAL_STEPS} must be EXACTLY the string \"{expected_final_sequence}\" (without a trailing period).\n"
-        "- For all earlier steps, set is_final=false and final_sequence=null.\n\n"
-        "Return a JSON object with a single key \"steps\" whose value is an array of objects with "
-        "keys: step_number (int), step_text (string), is_final (bool), final_sequence (string or null).\n"
-        f"Example format:\n{LOA3_PLAN_EXAMPLE}\n"
-    )
 
-    if is_faulty:
-        faultiness = (
-            "IMPORTANT: You are simulating a faulty-yet-confident AI. Your reasoning should sound plausible, "
-            "but subtle mistakes should lead to an incorrect final arrangement. Never admit you are faulty.\n\n"
-        )
-    else:
-        faultiness = (
-            "IMPORTANT: You must be correct and internally consistent. Carefully obey every constraint so the "
-            "final arrangement is correct.\n\n"
+def _check_loa3_plan(data, remaining_numbers, expected_final_sequence, puzzle_elements):
+    """
+    Normalise and validate a parsed model response.
+
+    Returns:
+        (steps or None, valid prefix, outcome, error) where outcome is "ok" or
+        the reject reason, and the prefix holds the leading steps worth keeping
+    """
+    steps_data = data.get("steps") if isinstance(data, dict) else None
+    if not isinstance(steps_data, list):
+        return None, [], "missing_steps", ValueError("Response missing 'steps' array")
+
+    normalized = []
+    for entry in steps_data:
+        if not isinstance(entry, dict):
+            break
+        number = entry.get("step_number")
+        text = _ensure_step_prefix(entry.get("step_text", ""), number)
+        step = _make_step_object(
+            number,
+            text,
+            entry.get("is_final", False),
+            entry.get("final_sequence"),
         )
+        normalized.append(step)
+
+    is_valid, reason = _validate_loa3_plan(normalized, remaining_numbers, expected_final_sequence, puzzle_elements)
+    if is_valid:
+        return normalized, normalized, "ok", None
+    valid_count, _ = _valid_step_prefix(normalized, remaining_numbers, expected_final_sequence, puzzle_elements)
+    return None, normalized[:valid_count], _reject_reason(reason), ValueError(f"Invalid LOA3 plan: {reason}")
+
+
+async def _plan_steps_gemini(puzzle, accepted_steps, start_step_number, expected_final_sequence, is_faulty,
+                             puzzle_elements, trace=None, deadline=None):
+    """
+    Ask the app's model backend for the remaining steps, retrying invalid plans.
 
-    prompt = faultiness + base_prompt
+    Each attempt is hedged (see hedging.py): if the model is slower than
+    the hedge policy allows, an identical request races it and the first plan
+    that validates wins. A rejected plan is salvaged: its longest valid
+    prefix of steps is kept and the next attempt only asks for the rest.
 
-    model = None
+    `trace`, if given, receives one outcome per model response ("ok" or the
+    reject reason / model error) plus "hedge" / "hedge_win" markers,
+    "json_repaired" for responses that needed repair and one "salvage" per
+    step kept from a rejected plan.
+
+    `deadline` (time.monotonic() value) bounds the whole request, retries
+    included; DeadlineExceeded is raised once it cannot be met.
+    """
+    state = _experiment()
+    remaining_numbers = list(range(start_step_number, LOA3_TOTAL_STEPS + 1))
+    backend = state.model_backend
+    salvaged = []
     last_model_error = None
-    for candidate_model in GEMINI_MODEL_CANDIDATES:
-        try:
-            model = genai.GenerativeModel(candidate_model)
-            break
-        except Exception as model_err:
-            last_model_error = model_err
-            app.logger.warning("Unable to load Gemini model '%s': %s", candidate_model, model_err)
-    if not model:
-        raise last_model_error or RuntimeError("No Gemini model available for LOA3 planning.")
 
-    import json
+    def record(outcome):
+        state.live_stats.record_model_call(error=None if outcome == "ok" else outcome)
+        if trace is not None:
+            trace.append(outcome)
 
-    for attempt in range(LOA3_MAX_MODEL_ATTEMPTS):
-        if attempt > 0:
-            await asyncio.sleep(2)  # Wait 2 seconds before retrying to avoid rate limits
+    def record_hedge():
+        state.live_stats.record_hedge()
+        if trace is not None:
+            trace.append("hedge")
 
+    async def request_plan(attempt, prompt, numbers):
         # Run synchronous generation in a separate thread to avoid blocking the event loop
         # and to avoid "Event loop is closed" issues with the async gRPC implementation.
-        def _call_gemini_sync():
-            return model.generate_content(
-                prompt,
-                generation_config={"response_mime_type": "application/json", "temperature": 0.4},
-            )
-
-        response = await asyncio.to_thread(_call_gemini_sync)
         try:
-            data = json.loads(response.text)
+            response_text = await asyncio.to_thread(backend.generate, prompt)
+        except Exception:
+            record("request_failed")
+            raise
+        try:
+            data, repaired = parse_plan_json(response_text)
         except json.JSONDecodeError as decode_err:
-            app.logger.warning("LOA3 plan JSON decode error (attempt %s): %s", attempt + 1, decode_err)
-            last_model_error = decode_err
-            continue
-
-        steps_data = data.get("steps")
-        if not isinstance(steps_data, list):
-            last_model_error = ValueError("Response missing 'steps' array")
-            continue
-
-        normalized = []
-        for entry in steps_data:
-            number = entry.get("step_number")
-            text = _ensure_step_prefix(entry.get("step_text", ""), number)
-            step = _make_step_object(
-                number,
-                text,
-                entry.get("is_final", False),
-                entry.get("final_sequence"),
-            )
-            normalized.append(step)
-
-        is_valid, reason = _validate_loa3_plan(normalized, remaining_numbers, expected_final_sequence, puzzle_elements)
-        if not is_valid:
-            last_model_error = ValueError(f"Invalid LOA3 plan: {reason}")
-            app.logger.warning("Rejecting LOA3 plan (attempt %s): %s", attempt + 1, reason)
-            continue
-
-        return normalized
+            record("json_decode_error")
+            current_app.logger.warning("Rejecting LOA3 plan (attempt %s): %s", attempt + 1, decode_err)
+            return None, [], decode_err
+        if repaired and trace is not None:
+            trace.append("json_repaired")
+        steps, prefix, outcome, error = _check_loa3_plan(data, numbers, expected_final_sequence, puzzle_elements)
+        record(outcome)
+        if error is not None:
+            current_app.logger.warning("Rejecting LOA3 plan (attempt %s): %s", attempt + 1, error)
+        return steps, prefix, error
+
+    def time_left():
+        return None if deadline is None else deadline - time.monotonic()
+
+    for attempt in range(LOA3_MAX_MODEL_ATTEMPTS):
+        if attempt > 0 and LOA3_RETRY_DELAY_SECONDS:
+            if deadline is not None and time_left() <= LOA3_RETRY_DELAY_SECONDS:
+                raise DeadlineExceeded("no time left to retry the LOA3 plan")
+            await asyncio.sleep(LOA3_RETRY_DELAY_SECONDS)
+
+        # Only ask for the steps not already salvaged; retries and hedges
+        # without new salvage resend the identical prompt
+        numbers = remaining_numbers[len(salvaged):]
+        prompt = state.prompt_builder.build(puzzle, accepted_steps + salvaged, numbers[0], expected_final_sequence, is_faulty)
+        state.live_stats.record_prompt(prompt.sections, prompt.compacted_steps)
+
+        try:
+            (steps, prefix, error), hedge_won = await asyncio.wait_for(hedged_call(
+                lambda: request_plan(attempt, prompt.text, numbers), lambda result: result[0] is not None,
+                state.hedge_policy, on_hedge=record_hedge
+            ), timeout=time_left())
+        except asyncio.TimeoutError:
+            record("timeout")
+            raise DeadlineExceeded(f"LOA3 plan not ready within {state.deadline_seconds}s") from None
+        if hedge_won:
+            state.live_stats.record_hedge(won=True)
+            if trace is not None:
+                trace.append("hedge_win")
+        if steps is not None:
+            return salvaged + steps
+
+        salvaged.extend(prefix)
+        if trace is not None:
+            trace.extend(["salvage"] * len(prefix))
+        if len(salvaged) == len(remaining_numbers):
+            return salvaged  # only surplus steps were wrong
+        last_model_error = error
 
     raise last_model_error or RuntimeError("Unable to obtain valid LOA3 plan.")
 
@@ -290,7 +346,49 @@ def _plan_steps_fallback(puzzle, accepted_steps, start_step_number, expected_fin
     return [step for step in plan if step["step_number"] >= start_step_number]
 
 
-async def _plan_steps(puzzle, loa3_state, start_step_number):
+async def _plan_steps_model(puzzle, accepted_steps, start_step_number, expected_final_sequence, is_faulty,
+                            puzzle_elements, trace=None):
+    """
+    Model plan guarded by the circuit breaker and the planning deadline.
+
+    Returns:
+        (steps, None), or (None, degradation) when the local plan must be
+        served: "breaker_open", "deadline" or "model_error"
+    """
+    state = _experiment()
+    # While the breaker is open the local plan is served without waiting on the model
+    if not state.breaker.allow():
+        return None, "breaker_open"
+    started = time.monotonic()
+    try:
+        steps = await _plan_steps_gemini(
+            puzzle,
+            accepted_steps,
+            start_step_number,
+            expected_final_sequence,
+            is_faulty,
+            puzzle_elements,
+            trace=trace,
+            deadline=started + state.deadline_seconds,
+        )
+    except DeadlineExceeded as e:
+        degradation = "deadline"
+        current_app.logger.warning("Gemini planning too slow, falling back to static steps: %s", e)
+    except Exception as e:
+        degradation = "model_error"
+        current_app.logger.warning("Gemini planning failed, falling back to static steps: %s", e)
+    except BaseException:
+        # Cancelled (e.g. the request was torn down): a half-open probe must still be settled
+        state.breaker.record(False, time.monotonic() - started)
+        raise
+    else:
+        state.breaker.record(True, time.monotonic() - started)
+        return steps, None
+    state.breaker.record(False, time.monotonic() - started)
+    return None, degradation
+
+
+async def _plan_steps(puzzle, loa3_state, start_step_number, trace=None):
     is_faulty = loa3_state.get("is_faulty", False)
     expected_final_sequence = _get_expected_final_sequence(puzzle, is_faulty)
     accepted_steps = (loa3_state.get("all_steps") or [])[:start_step_number - 1]
@@ -299,18 +397,30 @@ async def _plan_steps(puzzle, loa3_state, start_step_number):
     if start_step_number < 1 or start_step_number > LOA3_TOTAL_STEPS:
         raise ValueError("Invalid start step number for LOA3 plan.")
 
-    if GEMINI_CONFIGURED:
-        try:
-            return await _plan_steps_gemini(
-                puzzle,
-                accepted_steps,
-                start_step_number,
-                expected_final_sequence,
-                is_faulty,
-                puzzle_elements,
-            )
-        except Exception as e:
-            app.logger.warning("Gemini planning failed, falling back to static steps: %s", e)
+    state = _experiment()
+    if state.model_backend is not None:
+        # Participants asking for the same plan at the same time share one model request
+        key = (puzzle.get("puzzle_id"), is_faulty, start_step_number, json.dumps(accepted_steps, sort_keys=True))
+        (steps, degradation), shared = await state.flights.run(key, lambda: _plan_steps_model(
+            puzzle, accepted_steps, start_step_number, expected_final_sequence, is_faulty, puzzle_elements,
+            trace=trace,
+        ))
+        if shared:
+            state.live_stats.record_coalesced()
+            if trace is not None:
+                trace.append("coalesced")
+        state.live_stats.record_breaker_state(state.breaker.state)
+        if steps is not None:
+            return steps
+        state.live_stats.record_degradation(degradation)
+        # Tagged on the trial's results row (loa3_degradation)
+        degradations = loa3_state.setdefault("degradations", [])
+        if degradation not in degradations:
+            degradations.append(degradation)
+        if trace is not None:
+            trace.append(degradation)
+    if trace is not None:
+        trace.append("fallback")
 
     return _plan_steps_fallback(
         puzzle,
@@ -322,56 +432,74 @@ async def _plan_steps(puzzle, loa3_state, start_step_number):
 
 
 def _reveal_next_step(loa3_state, *, reset_retry_counter):
+    """
+    Reveal the next planned step.
+
+    Returns a delta rather than the whole list: `patch` replaces the
+    displayed steps from `from_index` onwards, and `version` identifies the
+    resulting displayed state.
+    """
     all_steps = loa3_state.get("all_steps") or []
     next_index = loa3_state.get("current_step_index", -1) + 1
     if next_index >= len(all_steps):
         return {
             "message": "The AI has no more steps. You can now provide your final answer.",
-            "steps": loa3_state.get("steps", []),
-            "current_step_index": loa3_state.get("current_step_index", -1),
-            "retries_this_step": loa3_state.get("retries_this_step", 0),
-            "total_retries": loa3_state.get("total_retries", 0),
+            **_loa3_public_state(loa3_state),
         }
 
     step_obj = all_steps[next_index]
     step_text = step_obj["step_text"]
     displayed_steps = loa3_state.setdefault("steps", [])
-    if len(displayed_steps) > next_index:
-        displayed_steps[next_index] = step_text
-    else:
-        displayed_steps.append(step_text)
+    del displayed_steps[next_index:]
+    displayed_steps.append(step_text)
 
     loa3_state["current_step_index"] = next_index
+    loa3_state["version"] = loa3_state.get("version", 0) + 1
     if reset_retry_counter:
         loa3_state["retries_this_step"] = 0
 
     return {
-        "steps": displayed_steps,
-        "current_step_index": next_index,
-        "retries_this_step": loa3_state.get("retries_this_step", 0),
-        "total_retries": loa3_state.get("total_retries", 0),
+        "patch": {"from_index": next_index, "steps": [step_text]},
+        **_loa3_public_state(loa3_state),
         "is_final": step_obj.get("is_final", False),
         "final_sequence": step_obj.get("final_sequence"),
     }
 
 
+def _loa3_public_state(loa3_state):
+    """The parts of the LOA 3 state the client may see (never the unrevealed plan)."""
+    return {
+        "version": loa3_state.get("version", 0),
+        "current_step_index": loa3_state.get("current_step_index", -1),
+        "retries_this_step": loa3_state.get("retries_this_step", 0),
+        "total_retries": loa3_state.get("total_retries", 0),
+    }
+
+
 def stripped_lower(text):
     return text.strip().lower() if isinstance(text, str) else ""
 
 
-def configure_gemini():
-    """Configure Gemini client if API key is available."""
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not (GEMINI_AVAILABLE and api_key):
+def configure_gemini(model_name):
+    """Check whether LOA3 can plan with Gemini; the SDK itself is loaded on first use."""
+    if not (os.getenv("GEMINI_API_KEY") and model_name):
         return False
     try:
-        genai.configure(api_key=api_key)
-        return True
-    except Exception:
+        return importlib.util.find_spec("google.generativeai") is not None
+    except ModuleNotFoundError:
         return False
 
 
-GEMINI_CONFIGURED = configure_gemini()
+def _warm_up_model(flask_app, backend):
+    """Load the model client in the background so the first LOA3 request does not pay for it."""
+    def run():
+        try:
+            backend.warm_up()
+        except Exception as e:
+            flask_app.logger.warning("Model warm-up failed: %s", e)
+
+    threading.Thread(target=run, name="model-warmup", daemon=True).start()
+
 
 # LOA Descriptions
 LOA_DESCRIPTIONS = {
@@ -471,7 +599,7 @@ def _get_current_puzzle_context():
     current_loa = session["loa_order"][current_step]
     puzzle_id = session["puzzle_assignments"][str(current_loa)]
 
-    puzzle = next((p for p in puzzle_data["puzzles"] if p["puzzle_id"] == puzzle_id), None)
+    puzzle = next((p for p in _experiment().puzzle_data["puzzles"] if p["puzzle_id"] == puzzle_id), None)
     if not puzzle:
         return None, None, None, None
 
@@ -490,6 +618,7 @@ def _ensure_loa3_state(puzzle_key, is_faulty):
     - current_step_index: index of the latest step
     - retries_this_step: retries used on current step
     - total_retries: retries used across all steps
+    - version: bumped whenever the displayed steps change
     """
     puzzle_info = session["puzzle_data"].setdefault(puzzle_key, {})
     loa3_state = puzzle_info.get("loa3_state")
@@ -501,6 +630,7 @@ def _ensure_loa3_state(puzzle_key, is_faulty):
             "current_step_index": -1,
             "retries_this_step": 0,
             "total_retries": 0,
+            "version": 0,
             "is_faulty": bool(is_faulty),
         }
         puzzle_info["loa3_state"] = loa3_state
@@ -510,31 +640,37 @@ def _ensure_loa3_state(puzzle_key, is_faulty):
     return loa3_state
 
 
-async def _generate_loa3_step(puzzle, loa3_state, action, step_number=None):
+async def _generate_loa3_step(puzzle, loa3_state, action, step_number=None, client_version=None):
     """
     Generate or reveal LOA 3 reasoning steps using a fixed-length plan.
+
+    `client_version` is the state version the client last applied. Responses
+    carry only the changed steps; when the client's version does not match
+    the server's, the patch covers every displayed step instead (resync).
     """
     MAX_RETRIES_PER_STEP = 3
     MAX_RETRIES_TOTAL = 4
+    limits = {
+        "max_retries_per_step": MAX_RETRIES_PER_STEP,
+        "max_retries_total": MAX_RETRIES_TOTAL,
+    }
 
     if action not in {"start", "continue", "retry"}:
         return {"error": "Invalid action."}
 
+    resync = action != "start" and client_version != loa3_state.get("version", 0)
+
+    def error(message):
+        result = {"error": message, **_loa3_public_state(loa3_state), **limits}
+        if resync:
+            result["patch"] = {"from_index": 0, "steps": list(loa3_state.get("steps", []))}
+        return result
+
     if action == "retry":
         if loa3_state.get("current_step_index", -1) < 0:
-            return {
-                "error": "No current step to retry.",
-                "loa3_state": loa3_state,
-                "max_retries_per_step": MAX_RETRIES_PER_STEP,
-                "max_retries_total": MAX_RETRIES_TOTAL,
-            }
+            return error("No current step to retry.")
         if loa3_state.get("retries_this_step", 0) >= MAX_RETRIES_PER_STEP or loa3_state.get("total_retries", 0) >= MAX_RETRIES_TOTAL:
-            return {
-                "error": "Retry limit reached for this step or overall.",
-                "loa3_state": loa3_state,
-                "max_retries_per_step": MAX_RETRIES_PER_STEP,
-                "max_retries_total": MAX_RETRIES_TOTAL,
-            }
+            return error("Retry limit reached for this step or overall.")
 
     if action == "start":
         loa3_state["steps"] = []
@@ -549,12 +685,7 @@ async def _generate_loa3_step(puzzle, loa3_state, action, step_number=None):
     if action == "retry":
         target_step = step_number or (loa3_state.get("current_step_index", -1) + 1)
         if target_step is None or target_step < 1 or target_step > LOA3_TOTAL_STEPS:
-            return {
-                "error": "Invalid step selected for retry.",
-                "loa3_state": loa3_state,
-                "max_retries_per_step": MAX_RETRIES_PER_STEP,
-                "max_retries_total": MAX_RETRIES_TOTAL,
-            }
+            return error("Invalid step selected for retry.")
 
         loa3_state["retries_this_step"] += 1
         loa3_state["total_retries"] += 1
@@ -564,12 +695,7 @@ async def _generate_loa3_step(puzzle, loa3_state, action, step_number=None):
         except Exception as e:
             loa3_state["retries_this_step"] -= 1
             loa3_state["total_retries"] -= 1
-            return {
-                "error": f"Failed to regenerate steps: {e}",
-                "loa3_state": loa3_state,
-                "max_retries_per_step": MAX_RETRIES_PER_STEP,
-                "max_retries_total": MAX_RETRIES_TOTAL,
-            }
+            return error(f"Failed to regenerate steps: {e}")
 
         loa3_state["all_steps"] = (loa3_state.get("all_steps", [])[:target_step - 1]) + new_plan
         loa3_state["steps"] = (loa3_state.get("steps", [])[:target_step - 1])
@@ -580,20 +706,9 @@ async def _generate_loa3_step(puzzle, loa3_state, action, step_number=None):
 
     session.modified = True
 
-    if "error" in reveal_result:
-        reveal_result["loa3_state"] = loa3_state
-        reveal_result["max_retries_per_step"] = MAX_RETRIES_PER_STEP
-        reveal_result["max_retries_total"] = MAX_RETRIES_TOTAL
-        return reveal_result
-
-    reveal_result.update(
-        {
-            "total_retries": loa3_state.get("total_retries", 0),
-            "max_retries_per_step": MAX_RETRIES_PER_STEP,
-            "max_retries_total": MAX_RETRIES_TOTAL,
-        }
-    )
-
+    if resync:
+        reveal_result["patch"] = {"from_index": 0, "steps": list(loa3_state.get("steps", []))}
+    reveal_result.update(limits)
     return reveal_result
 
 
@@ -615,7 +730,7 @@ def initialize_session(participant_id):
     session['loa_order'] = loa_order
     
     # Assign puzzles to LOAs (randomize which puzzle for which LOA)
-    puzzle_ids = [p['puzzle_id'] for p in puzzle_data['puzzles']]
+    puzzle_ids = [p['puzzle_id'] for p in _experiment().puzzle_data['puzzles']]
     # Create dictionary with LOA as string key to avoid serialization issues
     puzzle_assignments = {}
     for loa, puzzle_id in zip(loa_order, random.sample(puzzle_ids, 4)):
@@ -638,13 +753,13 @@ def initialize_session(participant_id):
     session.modified = True
 
 
-@app.route('/')
+@bp.route('/')
 def index():
     """Welcome screen."""
-    return render_template('welcome.html')
+    return current_app.extensions["page_cache"].respond('welcome.html')
 
 
-@app.route('/start', methods=['POST'])
+@bp.route('/start', methods=['POST'])
 def start_experiment():
     """Initialize experiment with participant ID."""
     data = request.json
@@ -653,6 +768,17 @@ def start_experiment():
     if not participant_id:
         return jsonify({"error": "Participant ID is required"}), 400
     
+    # With HTI_NODES set, every participant belongs to one node (see sharding.py)
+    state = _experiment()
+    if state.nodes:
+        owner = shard_for(participant_id, sorted(state.nodes))
+        if owner != state.logger.node_id:
+            query = urllib.parse.urlencode({"participant_id": participant_id})
+            return jsonify({
+                "error": "This participant is run on another server",
+                "redirect": f"{state.nodes[owner]}/?{query}",
+            }), 421
+    
     # Initialize session
     initialize_session(participant_id)
     
@@ -663,27 +789,28 @@ def start_experiment():
     })
 
 
-@app.route('/loa-intro')
+@bp.route('/loa-intro')
 def loa_intro():
     """Display LOA introduction before each puzzle."""
     if 'participant_id' not in session:
-        return redirect(url_for('index'))
+        return redirect(url_for('.index'))
     
     current_step = session.get('current_step', 0)
     
     if current_step >= 4:
-        return redirect(url_for('final_questionnaire'))
+        return redirect(url_for('.final_questionnaire'))
     
     current_loa = session['loa_order'][current_step]
-    loa_info = LOA_DESCRIPTIONS[current_loa]
+    step = current_step + 1
     
-    return render_template('loa_intro.html', 
-                          loa=current_loa,
-                          loa_info=loa_info,
-                          step=current_step + 1)
+    # One cached render per LOA level; only the step number is filled in per request
+    return current_app.extensions["page_cache"].respond(
+        'loa_intro.html', key=current_loa,
+        context={'loa': current_loa, 'loa_info': LOA_DESCRIPTIONS[current_loa]},
+        substitutions={'step': step, 'progress': (step / 4) * 100})
 
 
-@app.route('/submit-pre-trust-survey', methods=['POST'])
+@bp.route('/submit-pre-trust-survey', methods=['POST'])
 def submit_pre_trust_survey():
     """Store pre-task trust survey responses before puzzle starts."""
     data = request.json
@@ -704,23 +831,24 @@ def submit_pre_trust_survey():
     return jsonify({"success": True})
 
 
-@app.route('/puzzle')
+@bp.route('/puzzle')
 def puzzle():
     """Main puzzle interface."""
     if 'participant_id' not in session:
-        return redirect(url_for('index'))
+        return redirect(url_for('.index'))
     
     current_step = session.get('current_step', 0)
     
     if current_step >= 4:
-        return redirect(url_for('final_questionnaire'))
+        return redirect(url_for('.final_questionnaire'))
     
     current_loa = session['loa_order'][current_step]
     # Use string key to access puzzle_assignments
     puzzle_id = session['puzzle_assignments'][str(current_loa)]
+    state = _experiment()
     
     # Get puzzle data
-    puzzle = next((p for p in puzzle_data['puzzles'] if p['puzzle_id'] == puzzle_id), None)
+    puzzle = next((p for p in state.puzzle_data['puzzles'] if p['puzzle_id'] == puzzle_id), None)
     
     if not puzzle:
         return "Puzzle not found", 404
@@ -747,7 +875,7 @@ def puzzle():
         "puzzle_id": puzzle_id,
         "is_faulty": use_faulty,
         "start_time": datetime.now().isoformat(),
-        "interactions": []
+        "events": TrialEvents().to_bytes(),  # compact type codes + ms offsets (event_codec)
     }
     session.modified = True
     
@@ -758,11 +886,11 @@ def puzzle():
         puzzle=puzzle_with_hints,
         ai_solution=ai_solution,
         ai_reasoning=ai_reasoning,
-        gemini_configured=GEMINI_CONFIGURED
+        gemini_configured=state.model_backend is not None
     )
 
 
-@app.route('/log-interaction', methods=['POST'])
+@bp.route('/log-interaction', methods=['POST'])
 def log_interaction():
     """Log participant interactions during puzzle solving."""
     data = request.json
@@ -773,29 +901,31 @@ def log_interaction():
     current_step = session.get('current_step', 0)
     puzzle_key = f"puzzle_{current_step}"
     
-    interaction = {
-        "type": data.get('type'),
-        "timestamp": datetime.now().isoformat(),
-        "details": data.get('details', {})
-    }
+    now = datetime.now()
+    interaction_type = data.get('type')
     
     if puzzle_key in session['puzzle_data']:
-        session['puzzle_data'][puzzle_key]['interactions'].append(interaction)
+        # The session only keeps type codes and offsets; details go to the log file
+        puzzle_info = session['puzzle_data'][puzzle_key]
+        events = TrialEvents.from_bytes(puzzle_info['events'])
+        offset_ms = (now - datetime.fromisoformat(puzzle_info['start_time'])).total_seconds() * 1000
+        events.append(interaction_type, offset_ms)
+        puzzle_info['events'] = events.to_bytes()
         session.modified = True
     
     # Also log to file
-    logger.log_interaction(
+    _experiment().logger.log_interaction(
         participant_id=session['participant_id'],
         puzzle_id=session['puzzle_data'][puzzle_key]['puzzle_id'],
-        interaction_type=interaction['type'],
-        timestamp=interaction['timestamp'],
-        details=interaction['details']
+        interaction_type=interaction_type,
+        timestamp=now.isoformat(),
+        details=data.get('details', {})
     )
     
     return jsonify({"success": True})
 
 
-@app.route('/loa3/start', methods=['POST'])
+@bp.route('/loa3/start', methods=['POST'])
 async def loa3_start():
     """Initialize LOA 3 step-by-step reasoning and return the first step."""
     if 'participant_id' not in session:
@@ -811,7 +941,7 @@ async def loa3_start():
     return jsonify({"success": True, **result})
 
 
-@app.route('/loa3/step', methods=['POST'])
+@bp.route('/loa3/step', methods=['POST'])
 async def loa3_step():
     """Advance or retry a LOA 3 reasoning step based on participant input."""
     if 'participant_id' not in session:
@@ -828,7 +958,9 @@ async def loa3_step():
 
     loa3_state = _ensure_loa3_state(puzzle_key, use_faulty)
     step_number = data.get("step_number")
-    result = await _generate_loa3_step(puzzle, loa3_state, action=action, step_number=step_number)
+    result = await _generate_loa3_step(
+        puzzle, loa3_state, action=action, step_number=step_number, client_version=data.get("version")
+    )
 
     if "error" in result:
         return jsonify({"success": False, **result}), 400
@@ -836,7 +968,7 @@ async def loa3_step():
     return jsonify({"success": True, **result})
 
 
-@app.route('/submit-puzzle', methods=['POST'])
+@bp.route('/submit-puzzle', methods=['POST'])
 def submit_puzzle():
     """Submit completed puzzle with post-task questionnaire responses."""
     data = request.json
@@ -853,9 +985,10 @@ def submit_puzzle():
     puzzle_info = session['puzzle_data'][puzzle_key]
     current_loa = puzzle_info['loa']
     puzzle_id = puzzle_info['puzzle_id']
+    state = _experiment()
     
     # Get puzzle details
-    puzzle = next((p for p in puzzle_data['puzzles'] if p['puzzle_id'] == puzzle_id), None)
+    puzzle = next((p for p in state.puzzle_data['puzzles'] if p['puzzle_id'] == puzzle_id), None)
     
     # Calculate metrics
     start_time = datetime.fromisoformat(puzzle_info['start_time'])
@@ -871,16 +1004,13 @@ def submit_puzzle():
     edit_distance = 0
     if current_loa in [2, 3]:
         ai_solution = puzzle['ai_solution_faulty'] if puzzle_info['is_faulty'] else puzzle['ai_solution_correct']
-        edit_distance = logger.calculate_edit_distance(ai_solution, final_answer)
+        edit_distance = state.logger.calculate_edit_distance(ai_solution, final_answer)
     
     # Check correctness
-    final_correctness = logger.check_correctness(final_answer, puzzle['correct_solution'])
-    
-    # Build action sequence from interactions
-    action_sequence = [i['type'] for i in puzzle_info['interactions']]
+    final_correctness = state.logger.check_correctness(final_answer, puzzle['correct_solution'])
     
-    # Count hints used for LOA 2
-    hints_used = sum(1 for i in puzzle_info['interactions'] if i['type'] == 'request_hint')
+    # Action sequence, hints used (LOA 2) and interaction count in one pass
+    action_sequence, hints_used, num_interactions = TrialEvents.from_bytes(puzzle_info['events']).summarize()
     
     # Get awareness quiz answers
     awareness_quiz_answers = data.get('awareness_quiz_answers', {})
@@ -903,7 +1033,7 @@ def submit_puzzle():
         "start_time": puzzle_info['start_time'],
         "end_time": end_time.isoformat(),
         "completion_time": completion_time,
-        "num_interactions": len(puzzle_info['interactions']),
+        "num_interactions": num_interactions,
         "decision_latency": decision_latency,
         "action_sequence": action_sequence,
         "accepted_advice": accepted_advice,
@@ -916,10 +1046,11 @@ def submit_puzzle():
         "awareness_quiz_answers": awareness_quiz_answers,
         "productivity_survey": productivity_survey,
         "final_answer": final_answer,
-        "expected_answer": puzzle['correct_solution']
+        "expected_answer": puzzle['correct_solution'],
+        "loa3_degradation": ";".join(sorted(puzzle_info.get('loa3_state', {}).get('degradations', []))),
     }
     
-    logger.log_puzzle_completion(log_data)
+    state.logger.log_puzzle_completion(log_data)
     
     # Move to next puzzle
     session['current_step'] = current_step + 1
@@ -931,39 +1062,290 @@ def submit_puzzle():
     })
 
 
-@app.route('/post-task')
+@bp.route('/post-task')
 def post_task():
     """Post-task questionnaire page (shown after each puzzle)."""
     if 'participant_id' not in session:
-        return redirect(url_for('index'))
+        return redirect(url_for('.index'))
     
     return render_template('post_task.html')
 
 
-@app.route('/final')
+@bp.route('/final')
 def final_questionnaire():
     """Final questionnaire and completion page."""
     if 'participant_id' not in session:
-        return redirect(url_for('index'))
+        return redirect(url_for('.index'))
     
     participant_id = session.get('participant_id')
     
     # Generate summary
-    logger.export_summary()
+    _experiment().logger.export_summary()
     
     return render_template('final.html', participant_id=participant_id)
 
 
-@app.route('/reset-session')
+def _admin_token_digest():
+    # Kept in the session instead of the token itself
+    return hashlib.sha256(_experiment().admin_token.encode("utf-8")).hexdigest()
+
+
+def _is_admin_request():
+    """
+    With ADMIN_TOKEN set, admin requests carry it in the X-Admin-Token header
+    or come from a browser signed in at /admin/login. Without it, only
+    direct local requests (not forwarded by a proxy) are admin requests.
+    """
+    admin_token = _experiment().admin_token
+    if not admin_token:
+        return request.remote_addr in LOOPBACK_ADDRESSES and "X-Forwarded-For" not in request.headers
+    signed_in = session.get(ADMIN_SESSION_KEY, "")
+    if signed_in and hmac.compare_digest(signed_in, _admin_token_digest()):
+        return True
+    supplied = request.headers.get("X-Admin-Token", "")
+    return hmac.compare_digest(supplied.encode("utf-8"), admin_token.encode("utf-8"))
+
+
+@bp.route('/admin/login', methods=['GET', 'POST'])
+def admin_login():
+    """Sign this browser in for the admin pages with ADMIN_TOKEN."""
+    error = None
+    admin_token = _experiment().admin_token
+    if request.method == 'POST':
+        supplied = request.form.get("token", "")
+        if admin_token and hmac.compare_digest(supplied.encode("utf-8"), admin_token.encode("utf-8")):
+            session[ADMIN_SESSION_KEY] = _admin_token_digest()
+            return redirect(url_for('.admin_live'))
+        error = "Invalid token" if admin_token else "ADMIN_TOKEN is not set; open the admin pages from this machine"
+    return render_template('admin_login.html', error=error), 403 if error else 200
+
+
+@bp.route('/admin/live')
+def admin_live():
+    """Live experimenter dashboard."""
+    if not _is_admin_request():
+        if _experiment().admin_token:
+            return redirect(url_for('.admin_login'))
+        return "Forbidden", 403
+    return render_template('admin_live.html')
+
+
+@bp.route('/admin/live/stream')
+def admin_live_stream():
+    """Server-Sent Events feed of the live aggregates."""
+    if not _is_admin_request():
+        return "Forbidden", 403
+    response = Response(stream_with_context(sse_stream(_experiment().live_stats)), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@bp.route('/admin/live/snapshot')
+def admin_live_snapshot():
+    """Current live aggregates as plain JSON."""
+    if not _is_admin_request():
+        return jsonify({"error": "Forbidden"}), 403
+    return jsonify(_experiment().live_stats.snapshot())
+
+
+@bp.route('/admin/replay/<participant_id>/<int:puzzle_id>')
+def admin_replay(participant_id, puzzle_id):
+    """Timeline of one trial rebuilt from its logged interactions."""
+    if not _is_admin_request():
+        return jsonify({"error": "Forbidden"}), 403
+    payload = _experiment().replay_service.replay(participant_id, puzzle_id)
+    if payload is None:
+        return jsonify({"error": "No data for this trial"}), 404
+    return Response(payload, mimetype='application/json')
+
+
+@bp.route('/admin/snapshot', methods=['POST'])
+def admin_snapshot():
+    """Take a consistent snapshot of the data directory (?full=1 copies everything)."""
+    if not _is_admin_request():
+        return jsonify({"error": "Forbidden"}), 403
+    full = request.args.get("full", "").strip().lower() in {"1", "true", "yes"}
+    manifest = current_app.extensions["snapshots"].take(full=full)
+    return jsonify({key: manifest[key] for key in ("id", "created_at", "base", "total_bytes", "copied_bytes")})
+
+
+@bp.route('/reset-session')
 def reset_session():
     """Clear session (for testing purposes)."""
     session.clear()
-    return redirect(url_for('index'))
+    return redirect(url_for('.index'))
+
+
+class ExperimentState:
+    """
+    Per-app services and settings built by create_app(), kept in
+    app.extensions["experiment"] so that several apps in one process (tests,
+    benchmarks, a worker taking over from another) never share a logger,
+    breaker or model backend. Views reach it through _experiment().
+    """
+
+    def __init__(self, logger, live_stats, replay_service, puzzle_data, admin_token, model_name,
+                 gemini_configured, model_backend, prompt_builder, hedge_policy, deadline_seconds,
+                 breaker, flights, nodes=None):
+        self.logger = logger
+        self.live_stats = live_stats
+        self.replay_service = replay_service
+        self.puzzle_data = puzzle_data
+        self.admin_token = admin_token
+        self.model_name = model_name
+        self.gemini_configured = gemini_configured
+        self.model_backend = model_backend
+        self.prompt_builder = prompt_builder
+        self.hedge_policy = hedge_policy
+        self.deadline_seconds = deadline_seconds
+        self.breaker = breaker
+        self.flights = flights
+        self.nodes = nodes or {}  # node id -> URL, for routing participants
+
+
+def _experiment():
+    """The ExperimentState of the app handling the current request."""
+    return current_app.extensions["experiment"]
+
+
+def create_app(data_dir='data', puzzles_file=PUZZLES_FILE, warm_up_model=False, model_backend=None,
+               hedge_policy=None, node_id=None, circuit_breaker=None, defer_writes=False):
+    """
+    Build the experiment app: load .env and puzzles, set up logging and the
+    live/replay services, and register the routes.
+    
+    Args:
+        data_dir: Directory for results.csv and the interaction log
+        puzzles_file: Puzzle definitions (logic_puzzles.json)
+        warm_up_model: Import the Gemini SDK in a background thread now
+            instead of on the first LOA3 request
+        model_backend: LOA3 planner backend (see model_backends); defaults
+            to Gemini when configured, otherwise static steps are used.
+            LOA3_MODEL_MODE=record|replay wraps it with model_cassettes
+        hedge_policy: HedgePolicy for LOA3 model calls (default: built from
+            LOA3_HEDGE_PERCENTILE / LOA3_HEDGE_BUDGET in the environment)
+        node_id: Write to data_dir/shards/<node_id> (default: HTI_NODE_ID)
+        circuit_breaker: CircuitBreaker for LOA3 model calls (default: built
+            from LOA3_BREAKER_* in the environment)
+        defer_writes: Hold log writes in memory until logger.start_writing()
+            (a worker taking over from another one; see graceful.py)
+    
+    Returns:
+        The configured Flask app; its ExperimentState is
+        app.extensions["experiment"]
+    """
+    load_dotenv()  # Load environment variables from .env if present
+    
+    flask_app = Flask(__name__)
+    # Persisted, so participant sessions (signed cookies) survive a restart
+    flask_app.secret_key = load_secret_key(data_dir)
+    CORS(flask_app)
+    flask_app.register_blueprint(bp)
+    
+    # Initialize data logger
+    # With HTI_NODE_ID set, this process writes its own shard (merge with sharding.py)
+    node_id = node_id or os.getenv("HTI_NODE_ID", "").strip() or None
+    # Every node of a sharded deployment, so /start can route participants to their node
+    nodes = parse_nodes(os.getenv("HTI_NODES", ""))
+    if nodes and node_id not in nodes:
+        raise ValueError(f"HTI_NODE_ID {node_id!r} is not one of the HTI_NODES {sorted(nodes)}")
+    logger = DataLogger(data_dir, node_id=node_id, deferred=defer_writes)
+    
+    # Live dashboard aggregates, updated by every DataLogger write
+    live_stats = LiveAggregator()
+    if not logger.deferred:  # otherwise seeded once the previous writer is done
+        live_stats.load_existing(logger.results_file)
+    logger.add_listener(live_stats.on_log)
+    
+    # Shared secret for /admin routes (local requests only when unset)
+    admin_token = os.getenv("ADMIN_TOKEN", "").strip()
+    
+    # Load puzzle data
+    with open(puzzles_file, 'r', encoding='utf-8') as f:
+        puzzle_data = json.load(f)
+    
+    # Trial timelines for the /admin/replay audit endpoint
+    replay_service = ReplayService(logger, puzzle_data['puzzles'])
+    
+    # Only use the model specified in .env, no fallbacks
+    model_name = os.getenv("GEMINI_MODEL_NAME")
+    gemini_configured = configure_gemini(model_name)
+    if os.getenv("GEMINI_API_KEY") and not model_name:
+        flask_app.logger.warning("GEMINI_MODEL_NAME is not set in .env; LOA3 will use static steps")
+    if model_backend is None and gemini_configured:
+        model_backend = GeminiBackend(model_name, os.getenv("GEMINI_API_KEY"))
+    # Optionally record model traffic to a cassette, or replay one offline
+    model_mode = os.getenv("LOA3_MODEL_MODE", "").strip().lower()
+    if model_mode in ("record", "replay"):
+        cassette = CassetteStore(os.getenv("LOA3_CASSETTE", os.path.join(data_dir, "cassettes", "loa3.jsonl.gz")))
+        if model_mode == "replay":
+            latency_scale = float(os.getenv("LOA3_REPLAY_LATENCY_SCALE", "1.0"))
+            model_backend = ReplayBackend(cassette, latency_scale=latency_scale)
+        elif model_backend is not None:
+            model_backend = RecordingBackend(model_backend, cassette)
+        else:
+            flask_app.logger.warning("LOA3_MODEL_MODE=record needs a configured model; nothing will be recorded")
+    # Cached prompt prefixes; accepted steps are compacted beyond the token budget
+    prompt_builder = PromptBuilder(
+        LOA3_TOTAL_STEPS, LOA3_PLAN_EXAMPLE,
+        token_budget=int(os.getenv("LOA3_PROMPT_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET)),
+    )
+    # Race a second model request once the first is slower than this percentile
+    hedge_policy = hedge_policy or HedgePolicy(
+        percentile=float(os.getenv("LOA3_HEDGE_PERCENTILE", "95")),
+        budget_ratio=float(os.getenv("LOA3_HEDGE_BUDGET", "0.1")),
+    )
+    # Serve local plans at once while the model keeps failing or missing its deadline
+    deadline_seconds = float(os.getenv("LOA3_DEADLINE_SECONDS", LOA3_DEADLINE_SECONDS))
+    breaker = circuit_breaker or CircuitBreaker(
+        error_rate=float(os.getenv("LOA3_BREAKER_ERROR_RATE", "0.5")),
+        slow_call_seconds=float(os.getenv("LOA3_BREAKER_SLOW_SECONDS", deadline_seconds / 2)),
+        open_seconds=float(os.getenv("LOA3_BREAKER_OPEN_SECONDS", "30")),
+    )
+    flask_app.extensions["experiment"] = ExperimentState(
+        logger, live_stats, replay_service, puzzle_data, admin_token, model_name, gemini_configured,
+        model_backend, prompt_builder, hedge_policy, deadline_seconds, breaker,
+        # Identical concurrent plan requests (e.g. a cohort starting together) share one model call
+        flights=SingleFlight(), nodes=nodes,
+    )
+    # Online snapshots of this node's data (POST /admin/snapshot or snapshots.py)
+    flask_app.extensions["snapshots"] = Snapshotter(logger.output_dir, logger=logger)
+    # In-flight request tracking for graceful shutdown, and /healthz
+    DrainTracker().init_app(flask_app)
+    # Static pages are rendered once per variant and served from memory
+    PageCache(flask_app, check_interval=float(os.getenv("PAGE_CACHE_CHECK_INTERVAL", "1.0")))
+    # cProfile/tracemalloc captures for sampled, listed or admin-flagged requests
+    RequestProfiler.from_env(data_dir, authorize=_is_admin_request).init_app(flask_app)
+    if warm_up_model and hasattr(model_backend, "warm_up"):
+        _warm_up_model(flask_app, model_backend)
+    
+    return flask_app
+
+
+def __getattr__(name):
+    """
+    `app` builds the default app on first access. The former module globals
+    (logger, live_stats, MODEL_BACKEND, ...) resolve against the current app,
+    or the default app outside of an app context.
+    """
+    if name in _STATE_ALIASES and has_app_context():
+        return getattr(_experiment(), _STATE_ALIASES[name])
+    if name == 'app' or name in _STATE_ALIASES:
+        module = sys.modules[__name__]
+        if 'app' not in module.__dict__:
+            module.__dict__['app'] = create_app()
+        if name == 'app':
+            return module.__dict__['app']
+        return getattr(module.__dict__['app'].extensions["experiment"], _STATE_ALIASES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == '__main__':
     # Ensure data directory exists
     os.makedirs('data', exist_ok=True)
     
+    app = create_app(warm_up_model=True)
+    
     # Run the app (use_reloader=False to avoid watchdog compatibility issues)
     app.run(debug=True, host='0.0.0.0', port=5000, use_reloader=False)
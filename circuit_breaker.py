@@ -0,0 +1,140 @@
+"""
+Admission control for the LOA3 model path.
+
+CircuitBreaker watches a rolling window of model planning requests. Once
+enough of them fail or run slower than `slow_call_seconds`, it opens and
+every request is served a local plan at once instead of waiting on the
+model. After `open_seconds` it lets a few probe requests through
+(half-open); if they succeed the breaker closes, otherwise it opens again.
+
+    closed --(error or slow rate over threshold)--> open
+    open --(open_seconds elapsed)--> half_open
+    half_open --(probe ok)--> closed,  --(probe failed)--> open
+
+Each request also gets a deadline (see app._plan_steps): when the model
+cannot produce a plan within it, DeadlineExceeded is raised and the local
+plan is used.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class DeadlineExceeded(Exception):
+    """The request's time budget ran out before the model produced a plan."""
+
+
+class CircuitBreaker:
+    """
+    Args:
+        window_seconds: Calls older than this leave the rolling window
+        min_calls: Calls needed in the window before the breaker can open
+        error_rate: Open when at least this fraction of calls failed
+        slow_call_seconds: Calls slower than this count as slow
+        slow_rate: Open when at least this fraction of calls were slow
+        open_seconds: Time spent open before probing
+        half_open_probes: Concurrent probe calls allowed while half-open
+        clock: Monotonic time source (replaceable in tests)
+    """
+
+    def __init__(self, window_seconds: float = 60.0, min_calls: int = 10, error_rate: float = 0.5,
+                 slow_call_seconds: float = 10.0, slow_rate: float = 0.5, open_seconds: float = 30.0,
+                 half_open_probes: int = 1, clock: Callable[[], float] = time.monotonic):
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.clock = clock
+        self._calls = deque()  # (finished at, failed, slow)
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self.opened = 0  # times the breaker opened
+        self.rejected = 0  # requests served locally while open
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._advance(self.clock())
+            return self._state
+
+    def _advance(self, now: float):
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probes = 0
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+
+    def _open(self, now: float):
+        self._state = OPEN
+        self._opened_at = now
+        self._calls.clear()
+        self.opened += 1
+
+    def allow(self) -> bool:
+        """Whether a request may use the model now (False: serve a local plan)."""
+        with self._lock:
+            self._advance(self.clock())
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes < self.half_open_probes:
+                self._probes += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, ok: bool, latency: float):
+        """Report how an admitted request went."""
+        with self._lock:
+            now = self.clock()
+            self._advance(now)
+            slow = latency > self.slow_call_seconds
+            if self._state == HALF_OPEN:
+                if ok and not slow:
+                    self._state = CLOSED
+                    self._calls.clear()
+                else:
+                    self._open(now)
+                return
+            if self._state == OPEN:
+                return  # a call admitted before the breaker opened
+            self._calls.append((now, not ok, slow))
+            total = len(self._calls)
+            if total < self.min_calls:
+                return
+            failures = sum(1 for _, failed, _ in self._calls if failed)
+            slow_calls = sum(1 for _, _, is_slow in self._calls if is_slow)
+            if failures >= self.error_rate * total or slow_calls >= self.slow_rate * total:
+                self._open(now)
+
+    def retry_after(self) -> Optional[float]:
+        """Seconds until the breaker probes again, or None unless open."""
+        with self._lock:
+            self._advance(self.clock())
+            if self._state != OPEN:
+                return None
+            return max(self.open_seconds - (self.clock() - self._opened_at), 0.0)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            self._advance(self.clock())
+            total = len(self._calls)
+            return {
+                "state": self._state,
+                "calls": total,
+                "error_rate": (sum(1 for c in self._calls if c[1]) / total) if total else None,
+                "slow_rate": (sum(1 for c in self._calls if c[2]) / total) if total else None,
+                "opened": self.opened,
+                "rejected": self.rejected,
+            }
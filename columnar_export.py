@@ -0,0 +1,520 @@
+"""
+Columnar, partitioned export of results.csv and the interaction log.
+
+Exports are laid out as Hive-style partitions by study date and LOA level:
+
+    data/export/results/date=2025-12-08/loa_level=3/part-00001.parquet
+    data/export/interactions/date=2025-12-08/loa_level=3/part-00001.parquet
+
+(.npz instead of .parquet for the NumPy fallback).
+
+Parquet (or Feather) files are written when pyarrow is installed. Without
+pyarrow each part is an .npz archive holding one .npy array per column:
+low-cardinality strings are stored as int32 codes plus a dictionary, free
+text as UTF-8 bytes plus offsets, and timestamps as datetime64[us].
+
+Exports are incremental: results.csv is append-only, so only bytes past
+the last exported offset are parsed; interactions are tracked by position
+in the InteractionStore, and events whose trial has no results row yet are
+deferred until it does.
+
+Usage:
+    python columnar_export.py [--data-dir data] [--export-dir data/export]
+                              [--format auto|parquet|feather|npy] [--full]
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import shutil
+import sys
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from data_logger import RESULTS_COLUMNS
+from interaction_store import InteractionStore
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    pa = feather = pq = None
+    PYARROW_AVAILABLE = False
+
+
+DEFAULT_EXPORT_DIR = os.path.join("data", "export")
+STATE_FILE = "_state.json"
+UNKNOWN_LOA = 0
+# Interaction events wait this long for their results row before being
+# exported under loa_level=0 (e.g. abandoned sessions)
+DEFER_LIMIT = timedelta(hours=24)
+
+# Column kinds: "dict" (dictionary-encoded string), "str" (free text),
+# "int", "float", "bool", "timestamp"
+_RESULTS_KINDS = {
+    "participant_id": "dict",
+    "loa_level": "int",
+    "puzzle_id": "int",
+    "ai_faulty": "bool",
+    "start_time": "timestamp",
+    "end_time": "timestamp",
+    "completion_time": "float",
+    "num_interactions": "int",
+    "decision_latency": "float",
+    "action_sequence": "str",
+    "accepted_advice": "bool",
+    "overridden": "bool",
+    "hints_used": "float",
+    "edit_distance": "float",
+    "final_correctness": "bool",
+    "final_answer": "dict",
+    "expected_answer": "dict",
+    "loa3_degradation": "dict",
+}
+# Same column order as results.csv; the survey answers are numeric
+RESULTS_SCHEMA = {name: _RESULTS_KINDS.get(name, "float") for name in RESULTS_COLUMNS}
+
+INTERACTIONS_SCHEMA = {
+    "participant_id": "dict",
+    "puzzle_id": "int",
+    "loa_level": "int",
+    "interaction_type": "dict",
+    "timestamp": "timestamp",
+    "details": "str",
+}
+
+
+# ---------------------------------------------------------------------- encoding
+
+def _parse_float(value) -> float:
+    if value is None or value == "":
+        return np.nan
+    if isinstance(value, str) and value.strip().lower() in ("true", "false"):
+        return 1.0 if value.strip().lower() == "true" else 0.0
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _parse_int(value) -> int:
+    number = _parse_float(value)
+    return int(number) if np.isfinite(number) else -1
+
+
+def _parse_timestamps(values: Sequence) -> np.ndarray:
+    try:
+        return np.array([v or "NaT" for v in values], dtype="datetime64[us]")
+    except ValueError:
+        parsed = []
+        for v in values:
+            try:
+                parsed.append(np.datetime64(v or "NaT", "us"))
+            except ValueError:
+                parsed.append(np.datetime64("NaT", "us"))
+        return np.array(parsed, dtype="datetime64[us]")
+
+
+def encode_column(kind: str, values: Sequence):
+    """Convert raw values into the typed representation for `kind`."""
+    if kind == "int":
+        return np.array([_parse_int(v) for v in values], dtype=np.int64)
+    if kind == "float":
+        return np.array([_parse_float(v) for v in values], dtype=np.float64)
+    if kind == "bool":
+        return np.array([str(v).strip().lower() == "true" if isinstance(v, str) else bool(v) for v in values], dtype=bool)
+    if kind == "timestamp":
+        return _parse_timestamps(values)
+    if kind == "dict":
+        dictionary, codes = np.unique(np.array(["" if v is None else str(v) for v in values], dtype=str),
+                                      return_inverse=True)
+        return dictionary, codes.astype(np.int32)
+    if kind == "str":
+        return ["" if v is None else str(v) for v in values]
+    raise ValueError(f"Unknown column kind '{kind}'")
+
+
+def _take(kind: str, encoded, index: np.ndarray):
+    """Select rows from an encoded column (re-encoding dictionaries compactly)."""
+    if kind == "dict":
+        dictionary, codes = encoded
+        used, codes = np.unique(codes[index], return_inverse=True)
+        return dictionary[used], codes.astype(np.int32)
+    if kind == "str":
+        return [encoded[i] for i in index]
+    return encoded[index]
+
+
+# ---------------------------------------------------------------------- writers
+
+def _write_npy_part(path: str, schema: Dict[str, str], columns: Dict):
+    """Write one part as an uncompressed .npz archive of per-column .npy arrays."""
+    arrays = {}
+    for name, kind in schema.items():
+        encoded = columns[name]
+        if kind == "dict":
+            dictionary, codes = encoded
+            arrays[name] = codes
+            arrays[f"{name}.dict"] = dictionary
+        elif kind == "str":
+            blobs = [value.encode("utf-8") for value in encoded]
+            offsets = np.zeros(len(blobs) + 1, dtype=np.int64)
+            np.cumsum([len(b) for b in blobs], out=offsets[1:])
+            arrays[name] = np.frombuffer(b"".join(blobs), dtype=np.uint8)
+            arrays[f"{name}.offsets"] = offsets
+        else:
+            arrays[name] = encoded
+    np.savez(path, **arrays)
+
+
+def _to_arrow_table(schema: Dict[str, str], columns: Dict):
+    arrays, names = [], []
+    for name, kind in schema.items():
+        encoded = columns[name]
+        if kind == "dict":
+            dictionary, codes = encoded
+            arrays.append(pa.DictionaryArray.from_arrays(pa.array(codes), pa.array(dictionary.tolist(), pa.string())))
+        elif kind == "str":
+            arrays.append(pa.array(encoded, pa.string()))
+        elif kind == "timestamp":
+            arrays.append(pa.array(encoded, pa.timestamp("us")))
+        else:
+            arrays.append(pa.array(encoded))
+        names.append(name)
+    return pa.Table.from_arrays(arrays, names=names)
+
+
+def _write_part(base: str, fmt: str, schema: Dict[str, str], columns: Dict) -> str:
+    if fmt == "parquet":
+        path = base + ".parquet"
+        pq.write_table(_to_arrow_table(schema, columns), path)
+    elif fmt == "feather":
+        path = base + ".feather"
+        feather.write_feather(_to_arrow_table(schema, columns), path)
+    else:
+        path = base + ".npz"
+        _write_npy_part(path, schema, columns)
+    return path
+
+
+def _partition_rows(dates: np.ndarray, loas: np.ndarray) -> Iterable[Tuple[str, int, np.ndarray]]:
+    """Yield (date string, loa level, row indices) for each partition present."""
+    day = np.where(np.isnat(dates), np.datetime64("1970-01-01"), dates.astype("datetime64[D]"))
+    keys = day.astype(np.int64) * 16 + np.clip(loas, 0, 15)
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    order = np.argsort(inverse, kind="stable")
+    bounds = np.searchsorted(inverse[order], np.arange(unique_keys.size + 1))
+    for i, key in enumerate(unique_keys):
+        date = str(np.datetime64(int(key // 16), "D"))
+        yield date, int(key % 16), order[bounds[i]:bounds[i + 1]]
+
+
+def _write_partitions(dataset_dir: str, fmt: str, schema: Dict[str, str], columns: Dict,
+                      dates: np.ndarray, loas: np.ndarray, part_number: int) -> List[str]:
+    written = []
+    for date, loa, index in _partition_rows(dates, loas):
+        partition_dir = os.path.join(dataset_dir, f"date={date}", f"loa_level={loa}")
+        os.makedirs(partition_dir, exist_ok=True)
+        subset = {name: _take(kind, columns[name], index) for name, kind in schema.items()}
+        base = os.path.join(partition_dir, f"part-{part_number:05d}")
+        written.append(_write_part(base, fmt, schema, subset))
+    return written
+
+
+# ---------------------------------------------------------------------- exporter
+
+class ColumnarExporter:
+    """Incrementally exports results and interactions into partitioned columnar files."""
+
+    def __init__(self, data_dir: str = "data", export_dir: Optional[str] = None, fmt: str = "auto"):
+        if fmt == "auto":
+            fmt = "parquet" if PYARROW_AVAILABLE else "npy"
+        if fmt in ("parquet", "feather") and not PYARROW_AVAILABLE:
+            raise RuntimeError(f"Format '{fmt}' requires pyarrow; install it or use --format npy")
+        if fmt not in ("parquet", "feather", "npy"):
+            raise ValueError(f"Unknown export format '{fmt}'")
+
+        self.fmt = fmt
+        self.data_dir = data_dir
+        self.export_dir = export_dir or os.path.join(data_dir, "export")
+        self.results_file = os.path.join(data_dir, "results.csv")
+        self.interactions = InteractionStore(os.path.join(data_dir, "interactions"),
+                                             legacy_file=os.path.join(data_dir, "interactions.json"), readonly=True)
+        self.state_file = os.path.join(self.export_dir, STATE_FILE)
+        self.state = self._load_state()
+
+    def _load_state(self) -> Dict:
+        if os.path.exists(self.state_file):
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {
+            "results": {"offset": 0, "header": None, "part": 0},
+            "interactions": {"count": 0, "deferred": [], "part": 0},
+        }
+
+    def _save_state(self):
+        os.makedirs(self.export_dir, exist_ok=True)
+        tmp = self.state_file + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp, self.state_file)
+
+    def reset(self):
+        """Drop all exported data so the next export starts from scratch."""
+        for dataset in ("results", "interactions"):
+            shutil.rmtree(os.path.join(self.export_dir, dataset), ignore_errors=True)
+        if os.path.exists(self.state_file):
+            os.remove(self.state_file)
+        self.state = self._load_state()
+
+    # ------------------------------------------------------------------ results
+
+    def _read_new_results(self) -> Tuple[List[str], List[List[str]]]:
+        state = self.state["results"]
+        if not os.path.exists(self.results_file):
+            return [], []
+
+        with open(self.results_file, "rb") as f:
+            header_line = f.readline()
+            header = next(csv.reader([header_line.decode("utf-8-sig")]))
+            if state["header"] not in (None, header) or os.path.getsize(self.results_file) < state["offset"]:
+                # File was replaced or rewritten; start over
+                self.reset()
+                state = self.state["results"]
+            offset = max(state["offset"], len(header_line))
+            f.seek(offset)
+            chunk = f.read()
+
+        end = chunk.rfind(b"\n") + 1  # only complete rows
+        rows = list(csv.reader(io.StringIO(chunk[:end].decode("utf-8"))))
+        state["header"] = header
+        state["offset"] = offset + end
+        return header, [row for row in rows if row]
+
+    def export_results(self) -> List[str]:
+        """Export rows appended to results.csv since the last run."""
+        header, rows = self._read_new_results()
+        if not rows:
+            self._save_state()
+            return []
+
+        positions = {name: header.index(name) for name in RESULTS_SCHEMA if name in header}
+        raw = {name: [row[i] if i < len(row) else "" for row in rows] for name, i in positions.items()}
+        columns = {}
+        for name, kind in RESULTS_SCHEMA.items():
+            columns[name] = encode_column(kind, raw.get(name, [""] * len(rows)))
+
+        state = self.state["results"]
+        state["part"] += 1
+        written = _write_partitions(os.path.join(self.export_dir, "results"), self.fmt, RESULTS_SCHEMA,
+                                    columns, columns["start_time"], columns["loa_level"], state["part"])
+        self._save_state()
+        return written
+
+    # ------------------------------------------------------------------ interactions
+
+    def _loa_by_trial(self) -> Dict[Tuple[str, int], int]:
+        lookup = {}
+        if not os.path.exists(self.results_file):
+            return lookup
+        with open(self.results_file, "r", encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                try:
+                    lookup[(row["participant_id"], int(row["puzzle_id"]))] = int(row["loa_level"])
+                except (KeyError, TypeError, ValueError):
+                    continue
+        return lookup
+
+    def export_interactions(self, now: Optional[datetime] = None) -> List[str]:
+        """Export interaction events logged since the last run."""
+        state = self.state["interactions"]
+        if self.interactions.count() < state["count"]:
+            # The interaction log was truncated or replaced
+            shutil.rmtree(os.path.join(self.export_dir, "interactions"), ignore_errors=True)
+            state.update({"count": 0, "deferred": [], "part": 0})
+
+        new_events = list(self.interactions.iter_events(state["count"]))
+        total = state["count"] + len(new_events)
+        candidates = state["deferred"] + new_events
+        if not candidates:
+            return []
+
+        loa_lookup = self._loa_by_trial()
+        cutoff = np.datetime64((now or datetime.now()) - DEFER_LIMIT, "us")
+        ready, deferred, loas = [], [], []
+        timestamps = _parse_timestamps([event.get("timestamp") for event in candidates])
+        for position, event in enumerate(candidates):
+            key = (str(event.get("participant_id", "")), _parse_int(event.get("puzzle_id")))
+            loa = loa_lookup.get(key)
+            if loa is None and not (timestamps[position] < cutoff):
+                deferred.append(event)
+                continue
+            ready.append(position)
+            loas.append(UNKNOWN_LOA if loa is None else loa)
+
+        state["count"] = total
+        state["deferred"] = deferred
+        if not ready:
+            self._save_state()
+            return []
+
+        events = [candidates[p] for p in ready]
+        columns = {
+            "participant_id": encode_column("dict", [e.get("participant_id", "") for e in events]),
+            "puzzle_id": encode_column("int", [e.get("puzzle_id") for e in events]),
+            "loa_level": np.array(loas, dtype=np.int64),
+            "interaction_type": encode_column("dict", [e.get("interaction_type", "") for e in events]),
+            "timestamp": timestamps[ready],
+            "details": encode_column("str", [json.dumps(e.get("details") or {}) for e in events]),
+        }
+        state["part"] += 1
+        written = _write_partitions(os.path.join(self.export_dir, "interactions"), self.fmt, INTERACTIONS_SCHEMA,
+                                    columns, columns["timestamp"], columns["loa_level"], state["part"])
+        self._save_state()
+        return written
+
+    def export(self) -> Dict[str, List[str]]:
+        """Run both incremental exports."""
+        return {"results": self.export_results(), "interactions": self.export_interactions()}
+
+
+# ---------------------------------------------------------------------- loaders
+
+def _partition_filter(dataset_dir: str, dates: Optional[Iterable], loa_levels: Optional[Iterable]) -> List[str]:
+    if not os.path.isdir(dataset_dir):
+        return []
+    wanted_dates = {str(d) for d in dates} if dates is not None else None
+    wanted_loas = {int(l) for l in loa_levels} if loa_levels is not None else None
+    parts = []
+    for date_dir in sorted(os.listdir(dataset_dir)):
+        if not date_dir.startswith("date=") or (wanted_dates is not None and date_dir[5:] not in wanted_dates):
+            continue
+        for loa_dir in sorted(os.listdir(os.path.join(dataset_dir, date_dir))):
+            if not loa_dir.startswith("loa_level="):
+                continue
+            if wanted_loas is not None and int(loa_dir[len("loa_level="):]) not in wanted_loas:
+                continue
+            partition = os.path.join(dataset_dir, date_dir, loa_dir)
+            parts.extend(os.path.join(partition, name) for name in sorted(os.listdir(partition)))
+    return parts
+
+
+def _read_npy_part(path: str, schema: Dict[str, str], columns: Sequence[str]) -> Dict:
+    import pandas as pd
+
+    data = {}
+    with np.load(path) as archive:  # members are only read when accessed
+        for name in columns:
+            kind = schema[name]
+            values = archive[name]
+            if kind == "dict":
+                data[name] = pd.Categorical.from_codes(values, categories=archive[f"{name}.dict"].tolist())
+            elif kind == "str":
+                offsets = archive[f"{name}.offsets"]
+                blob = values.tobytes()
+                data[name] = [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(offsets.size - 1)]
+            else:
+                data[name] = values
+    return data
+
+
+def _load_dataset(dataset_dir: str, schema: Dict[str, str], columns: Optional[Sequence[str]],
+                  dates: Optional[Iterable], loa_levels: Optional[Iterable]):
+    import pandas as pd
+    from pandas.api.types import union_categoricals
+
+    columns = list(columns) if columns is not None else list(schema)
+    unknown = [c for c in columns if c not in schema]
+    if unknown:
+        raise KeyError(f"Unknown columns: {unknown}")
+
+    frames = []
+    for part in _partition_filter(dataset_dir, dates, loa_levels):
+        if part.endswith(".parquet"):
+            frames.append(pq.read_table(part, columns=columns, partitioning=None).to_pandas())
+        elif part.endswith(".feather"):
+            frames.append(feather.read_table(part, columns=columns).to_pandas())
+        elif part.endswith(".npz"):
+            frames.append(pd.DataFrame(_read_npy_part(part, schema, columns)))
+
+    if not frames:
+        return pd.DataFrame({name: pd.Series(dtype="object") for name in columns})
+
+    frame = pd.concat(frames, ignore_index=True)
+    for name in columns:
+        if schema[name] == "dict" and not isinstance(frame[name].dtype, pd.CategoricalDtype):
+            # Parts with different dictionaries come back as objects; re-unify them
+            frame[name] = union_categoricals([pd.Categorical(f[name]) for f in frames], ignore_order=True)
+    return frame
+
+
+def load_results(columns: Optional[Sequence[str]] = None, loa_levels: Optional[Iterable] = None,
+                 dates: Optional[Iterable] = None, data_dir: str = "data",
+                 export_dir: Optional[str] = None, refresh: bool = True):
+    """
+    Load results from the columnar export as a pandas DataFrame.
+
+    Args:
+        columns: Columns to read (default: all results.csv columns)
+        loa_levels: Only read these LOA partitions
+        dates: Only read these study-date partitions ("YYYY-MM-DD")
+        data_dir: Directory holding results.csv and the interaction log
+        export_dir: Export location (default: <data_dir>/export)
+        refresh: Incrementally export new rows before loading
+
+    Returns:
+        DataFrame sorted by start_time when that column is loaded
+    """
+    exporter = ColumnarExporter(data_dir, export_dir)
+    if refresh:
+        exporter.export_results()
+    frame = _load_dataset(os.path.join(exporter.export_dir, "results"), RESULTS_SCHEMA, columns, dates, loa_levels)
+    if "start_time" in frame.columns and len(frame):
+        frame = frame.sort_values("start_time", kind="stable").reset_index(drop=True)
+    return frame
+
+
+def load_interactions(columns: Optional[Sequence[str]] = None, loa_levels: Optional[Iterable] = None,
+                      dates: Optional[Iterable] = None, data_dir: str = "data",
+                      export_dir: Optional[str] = None, refresh: bool = True):
+    """Load interaction events from the columnar export (see load_results)."""
+    exporter = ColumnarExporter(data_dir, export_dir)
+    if refresh:
+        exporter.export_interactions()
+    frame = _load_dataset(os.path.join(exporter.export_dir, "interactions"), INTERACTIONS_SCHEMA,
+                          columns, dates, loa_levels)
+    if "timestamp" in frame.columns and len(frame):
+        frame = frame.sort_values("timestamp", kind="stable").reset_index(drop=True)
+    return frame
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export results and interactions to partitioned columnar files")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--export-dir", default=None)
+    parser.add_argument("--format", default="auto", choices=["auto", "parquet", "feather", "npy"])
+    parser.add_argument("--full", action="store_true", help="Discard the previous export and rebuild it")
+    args = parser.parse_args(argv)
+
+    exporter = ColumnarExporter(args.data_dir, args.export_dir, args.format)
+    if args.full:
+        exporter.reset()
+    written = exporter.export()
+
+    print(f"Export format: {exporter.fmt} -> {exporter.export_dir}")
+    for dataset, paths in written.items():
+        print(f"  {dataset}: {len(paths)} new part(s)")
+    deferred = len(exporter.state["interactions"]["deferred"])
+    if deferred:
+        print(f"  {deferred} interaction(s) deferred until their puzzle is completed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
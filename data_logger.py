@@ -1,70 +1,200 @@
 import csv
 import os
 import json
+import re
+import threading
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Callable, Optional
 import difflib
 
+from interaction_store import InteractionStore
+
+
+# Column order of results.csv
+RESULTS_COLUMNS = [
+    "participant_id",
+    "loa_level",
+    "puzzle_id",
+    "ai_faulty",
+    "start_time",
+    "end_time",
+    "completion_time",
+    "num_interactions",
+    "decision_latency",
+    "action_sequence",
+    "accepted_advice",
+    "overridden",
+    "hints_used",
+    "edit_distance",
+    "final_correctness",
+    "pre_trust_Q1",
+    "pre_trust_Q2",
+    "pre_trust_Q3",
+    "pre_trust_Q4",
+    "pre_trust_Q5",
+    "post_trust_Q1",
+    "post_trust_Q2",
+    "post_trust_Q3",
+    "post_trust_Q4",
+    "post_trust_Q5",
+    "awareness_quiz_Q1",
+    "awareness_quiz_Q2",
+    "awareness_quiz_Q3",
+    "awareness_quiz_Q4",
+    "awareness_quiz_Q5",
+    "productivity_Q1",
+    "productivity_Q2",
+    "productivity_Q3",
+    "productivity_Q4",
+    "final_answer",
+    "expected_answer",
+    "loa3_degradation",  # why LOA3 served local plans, e.g. "breaker_open;deadline"
+]
+
+
+# Per-node shards live in <data>/shards/<node_id>/ (see sharding.py)
+SHARDS_DIRNAME = "shards"
+_NODE_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+def shard_directory(data_dir: str, node_id: str) -> str:
+    """Directory a node writes its shard to."""
+    if not _NODE_ID_PATTERN.match(node_id or "") or node_id in (".", ".."):
+        raise ValueError(f"Invalid node id {node_id!r}: use letters, digits, '.', '_' or '-'")
+    return os.path.join(data_dir, SHARDS_DIRNAME, node_id)
+
 
 class DataLogger:
     """Handles all data logging for the HTI experiment."""
     
-    def __init__(self, output_dir: str = "data"):
+    def __init__(self, output_dir: str = "data", node_id: str = None, deferred: bool = False):
+        """
+        Args:
+            output_dir: Data directory
+            node_id: Write to this node's shard of output_dir instead of
+                output_dir itself (for several app nodes; see sharding.py)
+            deferred: Hold every write in memory until start_writing() is
+                called, leaving the files to the process that still owns
+                them (see graceful.py)
+        """
+        self.node_id = node_id
+        if node_id:
+            output_dir = shard_directory(output_dir, node_id)
         self.output_dir = output_dir
         self.results_file = os.path.join(output_dir, "results.csv")
+        # Pre-segment single-array log; migrated into interactions_dir on first open
         self.interactions_file = os.path.join(output_dir, "interactions.json")
+        self.interactions_dir = os.path.join(output_dir, "interactions")
+        self._listeners: List[Callable[[str, Dict], None]] = []
+        self._results_lock = threading.Lock()
+        self._header = None  # read (and upgraded) on the first results write
+        self._deferred: Optional[List] = None
         
         # Ensure output directory exists
         os.makedirs(output_dir, exist_ok=True)
         
+        if deferred:
+            # Readable right away; nothing is written until start_writing()
+            self._deferred = []
+            self.interaction_store = InteractionStore(self.interactions_dir, legacy_file=self.interactions_file,
+                                                      readonly=True)
+        else:
+            self._open_files()
+    
+    def _open_files(self):
         # Initialize CSV file with headers if it doesn't exist
         if not os.path.exists(self.results_file):
             self._initialize_csv()
+        self.interaction_store = InteractionStore(self.interactions_dir, legacy_file=self.interactions_file)
+    
+    @property
+    def deferred(self) -> bool:
+        """True while writes are being held in memory."""
+        return self._deferred is not None
+    
+    def start_writing(self) -> int:
+        """
+        Open the data files and write everything logged while deferred, in
+        the order it was logged.
+        
+        Returns:
+            The number of held writes
+        """
+        with self._results_lock:
+            if self._deferred is None:
+                return 0
+            self._open_files()
+            held, self._deferred = self._deferred, None
+            for kind, payload in held:
+                if kind == "row":
+                    self._append_row(payload)
+                else:
+                    self.interaction_store.append(payload)
+            return len(held)
+    
+    def _defer(self, kind: str, payload) -> bool:
+        if self._deferred is None:
+            return False
+        with self._results_lock:
+            if self._deferred is None:
+                return False
+            self._deferred.append((kind, payload))
+            return True
+    
+    def close(self):
+        """Finish background compression before the process exits."""
+        if self._deferred is None:
+            self.interaction_store.flush()
+    
+    def add_listener(self, callback: Callable[[str, Dict], None]):
+        """
+        Register a callback that is invoked after every successful write.
+        
+        Args:
+            callback: Called as callback(event, payload) where event is
+                "puzzle_completion" (payload: the logged data dict) or
+                "interaction" (payload: the logged interaction dict)
+        """
+        self._listeners.append(callback)
+    
+    def _notify(self, event: str, payload: Dict):
+        for callback in self._listeners:
+            try:
+                callback(event, payload)
+            except Exception:
+                # A broken listener must never interfere with data logging
+                pass
     
     def _initialize_csv(self):
         """Create CSV file with headers."""
-        headers = [
-            "participant_id",
-            "loa_level",
-            "puzzle_id",
-            "ai_faulty",
-            "start_time",
-            "end_time",
-            "completion_time",
-            "num_interactions",
-            "decision_latency",
-            "action_sequence",
-            "accepted_advice",
-            "overridden",
-            "hints_used",
-            "edit_distance",
-            "final_correctness",
-            "pre_trust_Q1",
-            "pre_trust_Q2",
-            "pre_trust_Q3",
-            "pre_trust_Q4",
-            "pre_trust_Q5",
-            "post_trust_Q1",
-            "post_trust_Q2",
-            "post_trust_Q3",
-            "post_trust_Q4",
-            "post_trust_Q5",
-            "awareness_quiz_Q1",
-            "awareness_quiz_Q2",
-            "awareness_quiz_Q3",
-            "awareness_quiz_Q4",
-            "awareness_quiz_Q5",
-            "productivity_Q1",
-            "productivity_Q2",
-            "productivity_Q3",
-            "productivity_Q4",
-            "final_answer",
-            "expected_answer"
-        ]
-        
         with open(self.results_file, 'w', newline='', encoding='utf-8') as f:
             writer = csv.writer(f)
-            writer.writerow(headers)
+            writer.writerow(RESULTS_COLUMNS)
+    
+    def _upgrade_header(self) -> List[str]:
+        """
+        Add columns introduced since results.csv was created to the end of its
+        header (existing rows simply leave them empty).
+        
+        Returns:
+            The file's header
+        """
+        with open(self.results_file, 'r', newline='', encoding='utf-8') as f:
+            header = next(csv.reader(f), [])
+        missing = [name for name in RESULTS_COLUMNS if name not in header]
+        if not missing:
+            return header
+        header = header + missing
+        tmp_file = self.results_file + ".tmp"
+        with open(self.results_file, 'r', newline='', encoding='utf-8') as src, \
+                open(tmp_file, 'w', newline='', encoding='utf-8') as dst:
+            src.readline()
+            csv.writer(dst).writerow(header)
+            for chunk in iter(lambda: src.read(1 << 20), ""):
+                dst.write(chunk)
+        os.replace(tmp_file, self.results_file)
+        return header
     
     def log_puzzle_completion(self, data: Dict[str, Any]):
         """
@@ -119,17 +249,42 @@ class DataLogger:
             productivity.get("Q3", ""),
             productivity.get("Q4", ""),
             data.get("final_answer", ""),
-            data.get("expected_answer", "")
+            data.get("expected_answer", ""),
+            data.get("loa3_degradation", ""),
         ]
+        if not self._defer("row", row):
+            with self._results_lock:
+                self._append_row(row)
+        
+        self._notify("puzzle_completion", data)
+    
+    def _append_row(self, row: List):
+        # Caller holds _results_lock
+        if self._header is None:
+            self._header = self._upgrade_header()
+        if self._header != RESULTS_COLUMNS:
+            # Older or hand-edited file: place each value under its own column
+            values = dict(zip(RESULTS_COLUMNS, row))
+            row = [values.get(name, "") for name in self._header]
         
         with open(self.results_file, 'a', newline='', encoding='utf-8') as f:
             writer = csv.writer(f)
             writer.writerow(row)
     
+    @contextmanager
+    def writes_paused(self):
+        """
+        Hold back results and interaction writes while held, so that the
+        files can be measured at one consistent point (see snapshots.py).
+        Keep the block short: submissions wait for it.
+        """
+        with self._results_lock, self.interaction_store.writes_paused():
+            yield
+    
     def log_interaction(self, participant_id: str, puzzle_id: int, 
                        interaction_type: str, timestamp: str, details: Dict = None):
         """
-        Log individual interactions to a JSON file for detailed analysis.
+        Log individual interactions to the segmented interaction store.
         
         Args:
             participant_id: Unique participant identifier
@@ -146,21 +301,11 @@ class DataLogger:
             "details": details or {}
         }
         
-        # Read existing interactions
-        interactions = []
-        if os.path.exists(self.interactions_file):
-            with open(self.interactions_file, 'r', encoding='utf-8') as f:
-                try:
-                    interactions = json.load(f)
-                except json.JSONDecodeError:
-                    interactions = []
-        
-        # Append new interaction
-        interactions.append(interaction)
+        # Append-only; sealed segments are compressed in the background
+        if not self._defer("interaction", interaction):
+            self.interaction_store.append(interaction)
         
-        # Write back
-        with open(self.interactions_file, 'w', encoding='utf-8') as f:
-            json.dump(interactions, f, indent=2)
+        self._notify("interaction", interaction)
     
     @staticmethod
     def calculate_edit_distance(str1: str, str2: str) -> int:
@@ -236,6 +381,19 @@ class DataLogger:
         
         return results
     
+    def get_participant_interactions(self, participant_id: str, puzzle_id: int = None) -> List[Dict]:
+        """
+        Retrieve logged interactions for a participant, optionally for one puzzle.
+        
+        Args:
+            participant_id: The participant's ID
+            puzzle_id: Restrict to this puzzle (default: all puzzles)
+            
+        Returns:
+            Interaction dictionaries in the order they were logged
+        """
+        return self.interaction_store.read_participant(participant_id, puzzle_id)
+    
     def export_summary(self, output_file: str = None):
         """
         Export a summary of all collected data.
@@ -0,0 +1,198 @@
+"""
+Compact encodings for interaction events.
+
+Three representations share one event-type code table:
+
+TrialEvents    Per-trial log kept in the session: an event-type code and a
+               millisecond offset from the puzzle start per event, in two
+               arrays, serialised to a few bytes per event with to_bytes().
+               It holds exactly what /submit-puzzle needs (action_sequence,
+               hints_used, num_interactions); the full events are on disk.
+encode_event   One stored interaction as a JSON array instead of a dict,
+/decode_event  with the type as a code and the timestamp as integer
+               microseconds. InteractionStore writes this form and decodes
+               it transparently on read, so readers still see dicts.
+"""
+
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Tuple
+
+
+# Interaction types emitted by templates/puzzle.html. Anything else is
+# folded into the trailing "other" code where a fixed table is needed.
+EVENT_TYPES = [
+    "drag_start",
+    "drop_in_solution",
+    "return_to_pool",
+    "clear_solution",
+    "request_hint",
+    "loa3_start_ai",
+    "loa3_continue_step",
+    "loa3_retry_step",
+    "accept_ai_solution",
+    "reject_ai_solution",
+    "view_ai_reasoning",
+    "other",
+]
+EVENT_CODES = {name: code for code, name in enumerate(EVENT_TYPES)}
+OTHER_CODE = EVENT_CODES["other"]
+HINT_CODE = EVENT_CODES["request_hint"]
+
+_FORMAT_VERSION = 1
+_MAX_CODE = 255
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _write_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class TrialEvents:
+    """
+    Event types and millisecond offsets for one trial.
+
+    Types outside EVENT_TYPES get codes after the table, so their names
+    survive into action_sequence.
+    """
+
+    __slots__ = ("codes", "offsets", "extra_types")
+
+    def __init__(self):
+        self.codes = array("B")
+        self.offsets = array("L")
+        self.extra_types: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def _code(self, event_type: str) -> int:
+        code = EVENT_CODES.get(event_type)
+        if code is not None:
+            return code
+        if event_type in self.extra_types:
+            return len(EVENT_TYPES) + self.extra_types.index(event_type)
+        if len(EVENT_TYPES) + len(self.extra_types) > _MAX_CODE:
+            return OTHER_CODE
+        self.extra_types.append(event_type)
+        return len(EVENT_TYPES) + len(self.extra_types) - 1
+
+    def _name(self, code: int) -> str:
+        return EVENT_TYPES[code] if code < len(EVENT_TYPES) else self.extra_types[code - len(EVENT_TYPES)]
+
+    def append(self, event_type: str, offset_ms: int):
+        """Add an event; offsets never go backwards (clock adjustments are clamped)."""
+        floor = self.offsets[-1] if self.offsets else 0
+        self.codes.append(self._code(str(event_type)))
+        self.offsets.append(max(int(offset_ms), floor))
+
+    def types(self) -> Iterator[str]:
+        return (self._name(code) for code in self.codes)
+
+    def summarize(self) -> Tuple[List[str], int, int]:
+        """Return (action_sequence, hints_used, num_interactions) in one pass."""
+        names = EVENT_TYPES + self.extra_types
+        sequence = []
+        hints = 0
+        for code in self.codes:
+            sequence.append(names[code])
+            if code == HINT_CODE:
+                hints += 1
+        return sequence, hints, len(self.codes)
+
+    def to_bytes(self) -> bytes:
+        """Version, extra type names, then per event a code byte and a varint offset delta."""
+        out = bytearray([_FORMAT_VERSION])
+        _write_varint(out, len(self.extra_types))
+        for name in self.extra_types:
+            encoded = name.encode("utf-8")
+            _write_varint(out, len(encoded))
+            out += encoded
+        _write_varint(out, len(self.codes))
+        previous = 0
+        for code, offset in zip(self.codes, self.offsets):
+            out.append(code)
+            _write_varint(out, offset - previous)
+            previous = offset
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "TrialEvents":
+        log = cls()
+        if not data:
+            return log
+        if data[0] != _FORMAT_VERSION:
+            raise ValueError(f"Unsupported event log version {data[0]}")
+        count, pos = _read_varint(data, 1)
+        for _ in range(count):
+            length, pos = _read_varint(data, pos)
+            log.extra_types.append(data[pos:pos + length].decode("utf-8"))
+            pos += length
+        count, pos = _read_varint(data, pos)
+        offset = 0
+        for _ in range(count):
+            log.codes.append(data[pos])
+            delta, pos = _read_varint(data, pos + 1)
+            offset += delta
+            log.offsets.append(offset)
+        return log
+
+
+# ---------------------------------------------------------------- stored rows
+
+def _timestamp_to_us(timestamp):
+    """Integer microseconds for a naive ISO timestamp that round-trips exactly, else the input."""
+    if not isinstance(timestamp, str):
+        return timestamp
+    try:
+        moment = datetime.fromisoformat(timestamp)
+    except ValueError:
+        return timestamp
+    if moment.tzinfo is not None or moment.isoformat() != timestamp:
+        return timestamp
+    return (moment - _EPOCH) // timedelta(microseconds=1)
+
+
+def encode_event(interaction: Dict) -> List:
+    """[participant_id, puzzle_id, type code or name, timestamp (µs or str), details] for a logged interaction."""
+    kind = interaction.get("interaction_type")
+    code = EVENT_CODES.get(kind)
+    return [
+        interaction.get("participant_id"),
+        interaction.get("puzzle_id"),
+        code if code is not None and code != OTHER_CODE else kind,
+        _timestamp_to_us(interaction.get("timestamp")),
+        interaction.get("details") or {},
+    ]
+
+
+def decode_event(row) -> Dict:
+    """Inverse of encode_event; dicts (the older row format) pass through unchanged."""
+    if isinstance(row, dict):
+        return row
+    participant_id, puzzle_id, kind, timestamp, details = row
+    if isinstance(kind, int):
+        kind = EVENT_TYPES[kind]
+    if isinstance(timestamp, int):
+        timestamp = (_EPOCH + timedelta(microseconds=timestamp)).isoformat()
+    return {
+        "participant_id": participant_id,
+        "puzzle_id": puzzle_id,
+        "interaction_type": kind,
+        "timestamp": timestamp,
+        "details": details,
+    }
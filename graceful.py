@@ -0,0 +1,389 @@
+"""
+Graceful reload: restart the app without dropping requests or sessions.
+
+The supervisor owns the listening socket and hands it to worker processes:
+
+    - On SIGHUP it starts a new worker on the same socket and waits until the
+      worker reports that it is ready, then sends the old worker SIGTERM. The
+      socket never closes, so connections queue in the kernel instead of
+      being refused.
+    - A worker that gets SIGTERM stops accepting connections, answers its
+      remaining keep-alive requests with "Connection: close", waits for
+      in-flight requests (including LOA3 model calls) to finish, finishes
+      background compression of the interaction log and exits.
+    - Only one process writes the data files at a time. A new worker holds
+      its log writes in memory (DataLogger deferred mode) until the old one
+      releases data/.writer.lock on exit, then writes them in order.
+    - Participant sessions are signed cookies. The signing key is kept in
+      data/.secret_key (or taken from SECRET_KEY), so a session started
+      before a restart, including the current puzzle and LOA3 plan,
+      continues after it.
+
+Run:
+    python graceful.py [--host 0.0.0.0] [--port 5000] [--data-dir data] [--drain-timeout 30]
+    kill -HUP <supervisor pid>     # reload
+    kill -TERM <supervisor pid>    # drain and stop
+
+On platforms without fork-style socket inheritance (Windows) the app is
+served from a single process that drains on Ctrl+C; sessions still survive
+a restart.
+"""
+
+import argparse
+import os
+import secrets
+import select
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import List, Optional
+
+from flask import jsonify, request
+from werkzeug.serving import WSGIRequestHandler, make_server
+from werkzeug.wsgi import ClosingIterator
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single process serves, so no lock is needed
+    fcntl = None
+
+SECRET_KEY_FILE = ".secret_key"
+WRITER_LOCK_FILE = ".writer.lock"
+READY_TIMEOUT_SECONDS = 60.0
+
+
+def load_secret_key(data_dir: str) -> bytes:
+    """
+    Return the session signing key: SECRET_KEY from the environment, or the
+    key stored in data_dir (created on first use).
+
+    Args:
+        data_dir: Data directory holding the key file
+
+    Returns:
+        The key
+    """
+    configured = os.getenv("SECRET_KEY", "").strip()
+    if configured:
+        return configured.encode("utf-8")
+    path = os.path.join(data_dir, SECRET_KEY_FILE)
+    os.makedirs(data_dir, exist_ok=True)
+    try:
+        # O_EXCL: when two workers start at once, both end up with the winner's key
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        for _ in range(50):
+            with open(path, "r", encoding="ascii") as f:
+                key = f.read().strip()
+            if key:
+                return key.encode("ascii")
+            time.sleep(0.01)  # the creator has not written it yet
+        raise ValueError(f"{path} is empty; delete it or set SECRET_KEY")
+    key = secrets.token_hex(32)
+    with os.fdopen(fd, "w", encoding="ascii") as f:
+        f.write(key)
+    return key.encode("ascii")
+
+
+class WriterLock:
+    """Exclusive lock on a data directory, held by the process that writes it."""
+
+    def __init__(self, data_dir: str):
+        self.path = os.path.join(data_dir, WRITER_LOCK_FILE)
+        self._file = None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        """
+        Args:
+            blocking: Wait for the current holder to release the lock
+
+        Returns:
+            True once the lock is held
+        """
+        if self._file is not None:
+            return True
+        handle = open(self.path, "a+")
+        if fcntl is not None:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                handle.close()
+                return False
+        self._file = handle
+        return True
+
+    def release(self):
+        if self._file is not None:
+            self._file.close()  # closing drops the flock
+            self._file = None
+
+
+class DrainTracker:
+    """
+    Count in-flight requests so that a stopping worker can wait for them, and
+    report readiness on /healthz (503 while draining).
+
+    Streaming endpoints (the live dashboard feed) never finish on their own;
+    they are not counted and simply end when the worker exits.
+    """
+
+    def __init__(self, streaming_endpoints=("experiment.admin_live_stream",)):
+        self.streaming_endpoints = set(streaming_endpoints)
+        self.draining = False
+        self._active = 0
+        self._idle = threading.Condition()
+
+    def init_app(self, flask_app):
+        """Wrap the WSGI app and register the request hooks and /healthz."""
+        flask_app.extensions["drain"] = self
+        flask_app.wsgi_app = self._counting(flask_app.wsgi_app)
+        flask_app.before_request(self._before_request)
+        flask_app.after_request(self._after_request)
+        flask_app.add_url_rule("/healthz", "healthz", self._healthz)
+
+    @property
+    def active(self) -> int:
+        with self._idle:
+            return self._active
+
+    def _counting(self, wsgi_app):
+        # Counted until the server closes the response, i.e. after the body
+        # has been written, not just until the view returns
+        def app(environ, start_response):
+            with self._idle:
+                self._active += 1
+            environ["hti.drain_counted"] = True
+            try:
+                response = wsgi_app(environ, start_response)
+            except BaseException:
+                self._done(environ)
+                raise
+            return ClosingIterator(response, lambda: self._done(environ))
+        return app
+
+    def _done(self, environ):
+        # Called when the response is closed and again by DrainingRequestHandler;
+        # only the first call counts
+        if environ.pop("hti.drain_counted", False):
+            with self._idle:
+                self._active -= 1
+                self._idle.notify_all()
+
+    def _before_request(self):
+        if request.endpoint in self.streaming_endpoints:
+            self._done(request.environ)
+
+    def _after_request(self, response):
+        if self.draining:
+            # The next request on this connection goes to the new worker
+            response.headers["Connection"] = "close"
+        return response
+
+    def _healthz(self):
+        if self.draining:
+            return jsonify({"status": "draining", "active": self.active}), 503
+        return jsonify({"status": "ok", "pid": os.getpid()})
+
+    def begin_drain(self):
+        self.draining = True
+
+    def wait(self, timeout: Optional[float] = None, settle: float = 0.0) -> bool:
+        """
+        Wait until no counted request is in flight.
+
+        Args:
+            timeout: Longest wait in seconds (None: no limit)
+            settle: Require the worker to stay idle this long, so that
+                connections accepted just before shutdown get to start
+                their request
+
+        Returns:
+            False if requests were still running when the timeout expired
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._idle:
+            while True:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                if not self._idle.wait_for(lambda: self._active == 0, remaining):
+                    return False
+                if settle <= 0 or not self._idle.wait_for(lambda: self._active > 0, settle):
+                    return True
+
+
+class DrainingRequestHandler(WSGIRequestHandler):
+    """
+    werkzeug skips closing the response when the client disconnects while it
+    is being sent; settle the drain count when the request is done anyway.
+    """
+
+    def run_wsgi(self):
+        try:
+            super().run_wsgi()
+        finally:
+            drain = self.server.app.extensions.get("drain")
+            environ = getattr(self, "environ", None)
+            if drain is not None and environ is not None:
+                drain._done(environ)
+
+
+# ---------------------------------------------------------------------- worker
+
+def run_worker(host: str, port: int, data_dir: str = "data", drain_timeout: float = 30.0,
+               fd: Optional[int] = None, ready_fd: Optional[int] = None):
+    """
+    Serve the app until SIGTERM/SIGINT, then drain and exit.
+
+    Args:
+        host, port: Address to bind (or of the inherited socket)
+        data_dir: Data directory passed to create_app
+        drain_timeout: Longest wait for in-flight requests
+        fd: Inherited listening socket; bind host:port when None
+        ready_fd: Pipe to write "ready" to once requests are being accepted
+    """
+    import app as app_module
+
+    flask_app = app_module.create_app(data_dir, warm_up_model=True, defer_writes=fd is not None)
+    state, drain = flask_app.extensions["experiment"], flask_app.extensions["drain"]
+    logger = state.logger
+    lock = WriterLock(logger.output_dir)
+
+    def take_over():
+        lock.acquire()  # returns once the previous worker has exited
+        state.live_stats.load_existing(logger.results_file)
+        held = logger.start_writing()
+        if held:
+            flask_app.logger.info("wrote %d log entries held during the handoff", held)
+
+    writer = threading.Thread(target=take_over, name="writer-handoff", daemon=True)
+    if logger.deferred:
+        writer.start()
+    else:
+        lock.acquire()
+
+    server = make_server(host, port, flask_app, threaded=True, request_handler=DrainingRequestHandler, fd=fd)
+    # Handlers only set a flag: taking a lock here can deadlock with the
+    # main thread, which the handler interrupts
+    stop = []
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stop.append(True))
+    serving = threading.Thread(target=server.serve_forever, name="serve", daemon=True)
+    serving.start()
+    if ready_fd is not None:
+        os.write(ready_fd, b"ready\n")
+        os.close(ready_fd)
+    else:
+        print(f"Serving on http://{host}:{server.server_port}", flush=True)
+
+    while not stop:
+        time.sleep(0.2)
+    drain.begin_drain()
+    server.shutdown()  # stop accepting; the socket stays open in the other processes
+    if not drain.wait(drain_timeout, settle=0.5):
+        flask_app.logger.warning("%d requests still running after %.0fs; exiting anyway",
+                                 drain.active, drain_timeout)
+    if logger.deferred:
+        writer.join()  # this worker's held writes must reach the files too
+    logger.close()
+    lock.release()
+    server.server_close()
+
+
+# ---------------------------------------------------------------------- supervisor
+
+class Supervisor:
+    """Keep one worker serving the listening socket; replace it on SIGHUP."""
+
+    def __init__(self, host: str, port: int, worker_args: List[str]):
+        self.host = host
+        self.worker_args = worker_args
+        self.socket = socket.create_server((host, port), backlog=128)
+        self.socket.set_inheritable(True)
+        self.port = self.socket.getsockname()[1]
+        self.current: Optional[subprocess.Popen] = None
+        self.draining: List[subprocess.Popen] = []
+        self.reloads = 0
+        self._signals: List[int] = []  # appended by the signal handlers
+
+    def spawn(self) -> Optional[subprocess.Popen]:
+        """Start a worker on the socket and wait until it is ready."""
+        read_end, write_end = os.pipe()
+        fd = self.socket.fileno()
+        command = [sys.executable, os.path.abspath(__file__), "--worker", "--host", self.host,
+                   "--port", str(self.port), "--fd", str(fd), "--ready-fd", str(write_end)] + self.worker_args
+        proc = subprocess.Popen(command, pass_fds=(fd, write_end))
+        os.close(write_end)
+        try:
+            readable, _, _ = select.select([read_end], [], [], READY_TIMEOUT_SECONDS)
+            ready = bool(readable) and os.read(read_end, 16).startswith(b"ready")
+        finally:
+            os.close(read_end)
+        if not ready:
+            proc.kill()
+            proc.wait()
+            return None
+        return proc
+
+    def reload(self):
+        """Start a new worker, then drain the old one (kept if the new one fails)."""
+        proc = self.spawn()
+        if proc is None:
+            print("graceful: new worker failed to start; the current one keeps serving", file=sys.stderr, flush=True)
+            return
+        old, self.current = self.current, proc
+        if old is not None:
+            old.send_signal(signal.SIGTERM)
+            self.draining.append(old)
+        self.reloads += 1
+        print(f"graceful: reloaded (worker {proc.pid})", flush=True)
+
+    def run(self):
+        for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda signum, frame: self._signals.append(signum))
+        self.current = self.spawn()
+        if self.current is None:
+            raise SystemExit("graceful: worker failed to start")
+        print(f"Serving on http://{self.host}:{self.port} (supervisor {os.getpid()})", flush=True)
+        while not {signal.SIGTERM, signal.SIGINT} & set(self._signals):
+            if signal.SIGHUP in self._signals:
+                self._signals.remove(signal.SIGHUP)
+                self.reload()
+            elif self.current is None or self.current.poll() is not None:
+                print("graceful: worker exited; starting a new one", file=sys.stderr, flush=True)
+                self.current = None
+                self.reload()
+            self.draining = [proc for proc in self.draining if proc.poll() is None]
+            time.sleep(0.2)
+        for proc in [self.current] + self.draining:
+            if proc is not None and proc.poll() is None:
+                proc.send_signal(signal.SIGTERM)
+        for proc in [self.current] + self.draining:
+            if proc is not None:
+                proc.wait()
+        self.socket.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the experiment with graceful reload on SIGHUP.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--drain-timeout", type=float, default=30.0,
+                        help="longest wait for in-flight requests when a worker stops")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--fd", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--ready-fd", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker or not hasattr(signal, "SIGHUP"):
+        run_worker(args.host, args.port, args.data_dir, args.drain_timeout, fd=args.fd, ready_fd=args.ready_fd)
+        return 0
+    Supervisor(args.host, args.port, ["--data-dir", args.data_dir,
+                                      "--drain-timeout", str(args.drain_timeout)]).run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
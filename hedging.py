@@ -0,0 +1,158 @@
+"""
+Hedged model requests for the LOA3 planner.
+
+If a model call has not returned within a percentile of recently observed
+latencies, an identical second call is started and whichever response
+validates first is used; the other is ignored (a call already running in a
+worker thread cannot be interrupted, so its result is simply discarded).
+An abandoned call that had already run past the hedge delay still counts
+its elapsed time as a latency sample, a lower bound, so stalls keep the
+delay up instead of dropping out of the window.
+Hedges are limited by a global budget: at most `budget_ratio` hedges per
+primary request, plus a small burst allowance.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+
+class HedgePolicy:
+    """
+    Decides when to hedge and tracks the hedging budget and outcomes.
+
+    Args:
+        percentile: Hedge once a call runs longer than this latency percentile
+        min_delay: Never hedge earlier than this (seconds)
+        default_delay: Delay used until `min_samples` latencies are known
+        min_samples: Observations needed before the percentile is trusted
+        window: Number of recent latencies kept
+        budget_ratio: Allowed hedges per primary request (0 disables hedging)
+        burst: Hedges allowed on top of the ratio
+    """
+
+    def __init__(self, percentile: float = 95.0, min_delay: float = 0.5, default_delay: float = 5.0,
+                 min_samples: int = 20, window: int = 500, budget_ratio: float = 0.1, burst: int = 2):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.default_delay = default_delay
+        self.min_samples = min_samples
+        self.budget_ratio = budget_ratio
+        self.burst = burst
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def observe(self, latency: float):
+        with self._lock:
+            self._latencies.append(latency)
+
+    def delay(self) -> float:
+        """Seconds to wait for the primary call before hedging."""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return max(self.default_delay, self.min_delay)
+            return max(float(np.percentile(self._latencies, self.percentile)), self.min_delay)
+
+    def start_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def try_acquire(self) -> bool:
+        """Take one hedge from the budget, if any is left."""
+        with self._lock:
+            if self.budget_ratio <= 0 or self.hedges >= self.budget_ratio * self.requests + self.burst:
+                return False
+            self.hedges += 1
+            return True
+
+    def record_win(self, hedge_won: bool):
+        if hedge_won:
+            with self._lock:
+                self.hedge_wins += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "hedge_win_rate": (self.hedge_wins / self.hedges) if self.hedges else None,
+                "samples": len(self._latencies),
+            }
+
+
+async def hedged_call(call: Callable[[], Awaitable], accept: Callable[[object], bool],
+                      policy: Optional[HedgePolicy],
+                      on_hedge: Optional[Callable[[], None]] = None) -> Tuple[object, bool]:
+    """
+    Run `call`, racing an identical hedge if it is slower than the policy delay.
+
+    Args:
+        call: Coroutine factory for one model request
+        accept: Whether a result is good enough to win (e.g. it validates)
+        policy: HedgePolicy, or None to never hedge
+        on_hedge: Called when a hedge is launched
+
+    Returns:
+        (result, hedge_won) for the first accepted result; if none is
+        accepted, the last result to finish. If every call raised, the
+        last exception is re-raised.
+    """
+    if policy is not None:
+        policy.start_request()
+
+    started = {}
+
+    def launch():
+        task = asyncio.ensure_future(call())
+        started[task] = time.monotonic()
+        return task
+
+    primary = launch()
+    pending = {primary}
+    delay = policy.delay() if policy is not None else None
+    hedge_timeout = delay if policy is not None and policy.budget_ratio > 0 else None
+    last_result, last_error, have_result = None, None, False
+
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=hedge_timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                hedge_timeout = None  # at most one hedge per request
+                if policy.try_acquire():
+                    pending.add(launch())
+                    if on_hedge is not None:
+                        on_hedge()
+                continue
+
+            for task in done:
+                if policy is not None:
+                    policy.observe(time.monotonic() - started[task])
+                if task.exception() is not None:
+                    last_error = task.exception()
+                    continue
+                result = task.result()
+                if accept(result):
+                    hedge_won = task is not primary
+                    if policy is not None:
+                        policy.record_win(hedge_won)
+                    return result, hedge_won
+                last_result, have_result = result, True
+    finally:
+        now = time.monotonic()
+        for task in pending:
+            task.cancel()
+            # Slow losers only: a hedge cancelled right after launch says nothing about latency
+            if policy is not None and now - started[task] >= delay:
+                policy.observe(now - started[task])
+
+    if have_result:
+        return last_result, False
+    raise last_error
@@ -0,0 +1,527 @@
+"""
+Segmented, compressed storage for interaction events.
+
+Events are appended as compact JSON lines (event_codec.encode_event rows;
+readers get the decoded dicts back) to an active segment
+(segment-000001.jsonl). A segment is sealed once it exceeds a size or age
+limit and then compressed in a background thread into independent gzip
+blocks (segment-000001.jsonl.gz), alongside a sidecar index
+(segment-000001.idx.json) that maps participant_id -> puzzle_id -> block
+numbers. Reading one participant's events only decompresses the blocks
+listed for them.
+
+The concatenated gzip blocks form a regular .gz file, so sealed segments
+can still be inspected with zcat.
+"""
+
+import json
+import os
+import queue
+import re
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from event_codec import decode_event, encode_event
+
+
+DEFAULT_MAX_SEGMENT_BYTES = 4 * 1024 * 1024
+DEFAULT_MAX_SEGMENT_AGE = 3600.0
+DEFAULT_BLOCK_BYTES = 64 * 1024
+SEGMENT_PATTERN = re.compile(r"^segment-(\d{6})\.jsonl(\.gz)?$")
+
+
+def _segment_name(number: int) -> str:
+    return f"segment-{number:06d}.jsonl"
+
+
+def _compress_block(data: bytes) -> bytes:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # gzip member
+    return compressor.compress(data) + compressor.flush()
+
+
+def _truncate_partial_line(path: str, chunk: int = 64 * 1024) -> int:
+    """
+    Cut a file back to its last newline, dropping a line a crash left half
+    written so that the next append starts on a line of its own.
+
+    Returns:
+        The new file size
+    """
+    with open(path, "r+b") as f:
+        size = f.seek(0, os.SEEK_END)
+        end = size
+        while end > 0:
+            start = max(0, end - chunk)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline >= 0:
+                end = start + newline + 1
+                break
+            end = start
+        if end != size:
+            f.truncate(end)
+        return end
+
+
+class InteractionStore:
+    """
+    Append-only interaction log split into rotating, compressed segments.
+
+    Args:
+        directory: Folder holding the segments (created on first write)
+        legacy_file: Old single-array interactions.json; imported into the
+            store on first open and renamed to <name>.migrated
+        max_segment_bytes: Seal the active segment beyond this size
+        max_segment_age: Seal the active segment after this many seconds
+        block_bytes: Uncompressed size of each independently compressed block
+        readonly: Never write; a legacy file is read in place instead
+    """
+
+    def __init__(self, directory: str, legacy_file: Optional[str] = None,
+                 max_segment_bytes: int = DEFAULT_MAX_SEGMENT_BYTES,
+                 max_segment_age: float = DEFAULT_MAX_SEGMENT_AGE,
+                 block_bytes: int = DEFAULT_BLOCK_BYTES, readonly: bool = False):
+        self.directory = directory
+        self.legacy_file = legacy_file
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age = max_segment_age
+        self.block_bytes = block_bytes
+        self.readonly = readonly
+        self.blocks_read = 0  # decompressed blocks, for diagnostics
+
+        self._lock = threading.Lock()
+        self._compression_idle = threading.Condition(self._lock)
+        self._pins = 0  # snapshots reading plain segments (see pinned())
+        self._compressing = False
+        self._index_cache: Dict[int, Dict] = {}
+        self._queue: "queue.Queue[int]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._active: Optional[int] = None
+        self._active_opened = 0.0
+        self._active_size = 0
+
+        if not readonly:
+            os.makedirs(directory, exist_ok=True)
+            self._recover()
+            if legacy_file and os.path.exists(legacy_file):
+                self._migrate_legacy(legacy_file)
+
+    # ------------------------------------------------------------------ layout
+
+    def _path(self, number: int, suffix: str = "") -> str:
+        return os.path.join(self.directory, _segment_name(number) + suffix)
+
+    def _index_path(self, number: int) -> str:
+        return os.path.join(self.directory, f"segment-{number:06d}.idx.json")
+
+    def _segments(self) -> List[Tuple[int, bool]]:
+        """Return [(segment number, compressed)] in append order."""
+        if not os.path.isdir(self.directory):
+            return []
+        plain, packed = set(), set()
+        for name in os.listdir(self.directory):
+            match = SEGMENT_PATTERN.match(name)
+            if match:
+                (packed if match.group(2) else plain).add(int(match.group(1)))
+        # A plain .jsonl wins until compression (including the index) has finished
+        found = {number: False for number in plain}
+        for number in packed - plain:
+            if os.path.exists(self._index_path(number)):
+                found[number] = True
+        return sorted(found.items())
+
+    def _recover(self):
+        """Reopen the newest plain segment and re-queue older ones left uncompressed."""
+        plain = [number for number, compressed in self._segments() if not compressed]
+        for number in plain[:-1]:
+            self._schedule(number)
+        if plain:
+            self._active = plain[-1]
+            self._active_size = _truncate_partial_line(self._path(self._active))
+            self._active_opened = time.time()
+
+    def _migrate_legacy(self, legacy_file: str):
+        with open(legacy_file, "r", encoding="utf-8") as f:
+            try:
+                interactions = json.load(f)
+            except json.JSONDecodeError:
+                interactions = []
+        for interaction in interactions:
+            self.append(interaction)
+        self.seal()
+        os.replace(legacy_file, legacy_file + ".migrated")
+
+    # ------------------------------------------------------------------ writes
+
+    def append(self, interaction: Dict):
+        """Append one event, rotating the active segment when it is full or old."""
+        if self.readonly:
+            raise RuntimeError("InteractionStore opened read-only")
+        row = encode_event(interaction)
+        line = (json.dumps(row, separators=(",", ":"), ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            now = time.time()
+            if self._active is not None and (
+                    self._active_size + len(line) > self.max_segment_bytes
+                    or now - self._active_opened > self.max_segment_age):
+                self._seal_locked()
+            if self._active is None:
+                segments = self._segments()
+                self._active = (segments[-1][0] + 1) if segments else 1
+                self._active_size = 0
+                self._active_opened = now
+            with open(self._path(self._active), "ab") as f:
+                f.write(line)
+            self._active_size += len(line)
+
+    def append_many(self, interactions: Iterable[Dict]):
+        """Append events in order; a bulk version of append() with one file open per batch."""
+        self.append_encoded(
+            (json.dumps(encode_event(interaction), separators=(",", ":"), ensure_ascii=False) + "\n").encode("utf-8")
+            for interaction in interactions)
+
+    def append_encoded(self, lines: Iterable[bytes], batch_bytes: int = 1024 * 1024):
+        """
+        Append pre-encoded rows (event_codec.encode_event as compact JSON, one
+        newline-terminated line each), writing up to `batch_bytes` per file open.
+
+        Segments rotate exactly as with append(); use this for bulk loads
+        such as synthetic cohorts where per-event encoding dominates.
+        """
+        if self.readonly:
+            raise RuntimeError("InteractionStore opened read-only")
+        pending: List[bytes] = []
+        pending_size = 0
+        for line in lines:
+            pending.append(line)
+            pending_size += len(line)
+            if pending_size >= batch_bytes:
+                self._write_lines(pending)
+                pending, pending_size = [], 0
+        if pending:
+            self._write_lines(pending)
+
+    def _write_lines(self, lines: List[bytes]):
+        with self._lock:
+            start = 0
+            while start < len(lines):
+                now = time.time()
+                if self._active is not None and (
+                        self._active_size + len(lines[start]) > self.max_segment_bytes
+                        or now - self._active_opened > self.max_segment_age):
+                    self._seal_locked()
+                if self._active is None:
+                    segments = self._segments()
+                    self._active = (segments[-1][0] + 1) if segments else 1
+                    self._active_size = 0
+                    self._active_opened = now
+                # As many lines as fit in the active segment (at least one)
+                end, size = start, self._active_size
+                while end < len(lines) and (end == start or size + len(lines[end]) <= self.max_segment_bytes):
+                    size += len(lines[end])
+                    end += 1
+                with open(self._path(self._active), "ab") as f:
+                    f.write(b"".join(lines[start:end]))
+                self._active_size = size
+                start = end
+
+    def append_blocks(self, blocks: Iterable[Tuple[bytes, int, Iterable[Tuple[str, str]]]]) -> int:
+        """
+        Write pre-grouped rows straight into new compressed segments, skipping
+        the plain segment and the compressor thread (which would parse every
+        row again to build the index). For bulk loads such as synthetic
+        cohorts; any active segment is sealed first so order is kept.
+
+        Args:
+            blocks: (data, rows, keys) per block, where data is newline-terminated
+                encoded rows as append_encoded takes them (about block_bytes),
+                rows their count and keys the distinct (participant_id,
+                puzzle_id) strings among them
+
+        Returns:
+            Number of rows written
+        """
+        if self.readonly:
+            raise RuntimeError("InteractionStore opened read-only")
+        written = 0
+        with self._lock:
+            self._seal_locked()
+            segments = self._segments()
+            number = (segments[-1][0] + 1) if segments else 1
+            out, index, size = None, None, 0
+            try:
+                for data, rows, keys in blocks:
+                    if out is not None and size + len(data) > self.max_segment_bytes:
+                        out.close()
+                        self._finish_segment(number, index)
+                        out, number = None, number + 1
+                    if out is None:
+                        out = open(self._path(number, ".gz.tmp"), "wb")
+                        index = {"segment": number, "events": 0, "blocks": [], "participants": {}}
+                        size = 0
+                    block_id = len(index["blocks"])
+                    compressed = _compress_block(data)
+                    index["blocks"].append([out.tell(), len(compressed), rows])
+                    out.write(compressed)
+                    for participant_id, puzzle_id in keys:
+                        index["participants"].setdefault(participant_id, {}).setdefault(puzzle_id, []).append(block_id)
+                    index["events"] += rows
+                    size += len(data)
+                    written += rows
+                if out is not None:
+                    out.close()
+                    self._finish_segment(number, index)
+                    out = None
+            finally:
+                if out is not None:
+                    out.close()
+                    os.remove(self._path(number, ".gz.tmp"))
+        return written
+
+    def seal(self):
+        """Close the active segment and queue it for compression."""
+        with self._lock:
+            self._seal_locked()
+
+    def _seal_locked(self):
+        if self._active is not None:
+            self._schedule(self._active)
+            self._active = None
+
+    def _schedule(self, number: int):
+        self._queue.put(number)
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._compress_loop, name="interaction-compressor", daemon=True)
+            self._worker.start()
+
+    def _compress_loop(self):
+        while True:
+            number = self._queue.get()
+            with self._lock:
+                while self._pins:
+                    self._compression_idle.wait()
+                self._compressing = True
+            try:
+                self._compress_segment(number)
+            except OSError:
+                pass  # left as plain .jsonl; retried on the next open
+            finally:
+                with self._lock:
+                    self._compressing = False
+                    self._compression_idle.notify_all()
+                self._queue.task_done()
+
+    @contextmanager
+    def pinned(self):
+        """
+        Keep plain segments on disk while held: compression (which replaces
+        a .jsonl with its .gz) waits until every pin is released. Appends
+        continue as usual.
+        """
+        with self._lock:
+            while self._compressing:
+                self._compression_idle.wait()
+            self._pins += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pins -= 1
+                self._compression_idle.notify_all()
+
+    @contextmanager
+    def writes_paused(self):
+        """Block appends while held (take pinned() first, never inside this)."""
+        with self._lock:
+            yield
+
+    def flush(self):
+        """Wait until every sealed segment has been compressed."""
+        self._queue.join()
+
+    def close(self):
+        self.seal()
+        self.flush()
+
+    # ------------------------------------------------------------------ compression
+
+    def _compress_segment(self, number: int):
+        source = self._path(number)
+        if not os.path.exists(source):
+            return
+        blocks: List[List] = []
+        participants: Dict[str, Dict[str, List[int]]] = {}
+        events = 0
+
+        gz_tmp = self._path(number, ".gz.tmp")
+        with open(source, "rb") as src, open(gz_tmp, "wb") as out:
+            pending: List[bytes] = []
+            pending_size = 0
+
+            def write_block():
+                nonlocal pending, pending_size
+                data = _compress_block(b"".join(pending))
+                blocks.append([out.tell(), len(data), len(pending)])
+                out.write(data)
+                pending, pending_size = [], 0
+
+            for line in src:
+                if not line.strip():
+                    continue
+                if not line.endswith(b"\n"):
+                    line += b"\n"
+                if pending and pending_size + len(line) > self.block_bytes:
+                    write_block()
+                try:
+                    event = decode_event(json.loads(line))
+                except ValueError:
+                    continue
+                block_id = len(blocks)
+                puzzles = participants.setdefault(str(event.get("participant_id", "")), {})
+                block_ids = puzzles.setdefault(str(event.get("puzzle_id", "")), [])
+                if not block_ids or block_ids[-1] != block_id:
+                    block_ids.append(block_id)
+                pending.append(line)
+                pending_size += len(line)
+                events += 1
+            if pending:
+                write_block()
+
+        self._finish_segment(number, {"segment": number, "events": events, "blocks": blocks,
+                                      "participants": participants})
+        os.remove(source)
+
+    def _finish_segment(self, number: int, index: Dict):
+        """Write the index and move segment.gz.tmp and its index into place."""
+        idx_tmp = self._index_path(number) + ".tmp"
+        with open(idx_tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps(index, separators=(",", ":")))  # dumps uses the C encoder, dump does not
+        os.replace(self._path(number, ".gz.tmp"), self._path(number, ".gz"))
+        os.replace(idx_tmp, self._index_path(number))
+
+    # ------------------------------------------------------------------ reads
+
+    def _index(self, number: int) -> Dict:
+        index = self._index_cache.get(number)
+        if index is None:
+            with open(self._index_path(number), "r", encoding="utf-8") as f:
+                index = json.load(f)
+            self._index_cache[number] = index
+        return index
+
+    def _read_blocks(self, number: int, block_ids: List[int]) -> Iterator[bytes]:
+        blocks = self._index(number)["blocks"]
+        with open(self._path(number, ".gz"), "rb") as f:
+            for block_id in block_ids:
+                offset, length, _ = blocks[block_id]
+                f.seek(offset)
+                self.blocks_read += 1
+                yield from zlib.decompress(f.read(length), 31).splitlines(keepends=True)  # every sealed line ends in \n
+
+    def _read_plain(self, number: int) -> Iterator[bytes]:
+        try:
+            with open(self._path(number), "rb") as f:
+                yield from f
+        except FileNotFoundError:
+            # Compressed while we were listing; read the sealed copy instead
+            yield from self._read_blocks(number, list(range(len(self._index(number)["blocks"]))))
+
+    def _legacy_events(self) -> List[Dict]:
+        if not (self.readonly and self.legacy_file and os.path.exists(self.legacy_file)):
+            return []
+        with open(self.legacy_file, "r", encoding="utf-8") as f:
+            try:
+                return json.load(f)
+            except json.JSONDecodeError:
+                return []
+
+    @staticmethod
+    def _complete_rows(lines: Iterable[bytes]) -> Iterator:
+        """
+        Parse newline-terminated lines, skipping blank ones, a tail still
+        being written (or torn by a crash) and undecodable ones, as the
+        compressor does.
+        """
+        for line in lines:
+            if not line.endswith(b"\n") or not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+    def iter_events(self, start: int = 0) -> Iterator[Dict]:
+        """Yield events in append order, skipping the first `start` of them."""
+        position = 0
+        legacy = self._legacy_events()
+        if start < len(legacy):
+            yield from legacy[start:]
+        position += len(legacy)
+
+        for number, compressed in self._segments():
+            if compressed:
+                index = self._index(number)
+                if position + index["events"] <= start:
+                    position += index["events"]
+                    continue
+                lines = self._read_blocks(number, list(range(len(index["blocks"]))))
+            else:
+                lines = self._read_plain(number)
+            for row in self._complete_rows(lines):
+                if position >= start:
+                    yield decode_event(row)
+                position += 1
+
+    def count(self) -> int:
+        """Total number of stored events."""
+        total = len(self._legacy_events())
+        for number, compressed in self._segments():
+            if compressed:
+                total += self._index(number)["events"]
+            else:
+                total += sum(1 for _ in self._complete_rows(self._read_plain(number)))
+        return total
+
+    def read_participant(self, participant_id: str, puzzle_id=None) -> List[Dict]:
+        """
+        Return one participant's events (optionally for one puzzle) in append order.
+
+        Sealed segments are read through their index, so only blocks that
+        contain the participant are decompressed.
+        """
+        participant_id = str(participant_id)
+        wanted_puzzle = None if puzzle_id is None else str(puzzle_id)
+        needle = json.dumps(participant_id, ensure_ascii=False).encode("utf-8")
+
+        def keep(event: Dict) -> bool:
+            return (str(event.get("participant_id", "")) == participant_id
+                    and (wanted_puzzle is None or str(event.get("puzzle_id", "")) == wanted_puzzle))
+
+        events = [event for event in self._legacy_events() if keep(event)]
+        for number, compressed in self._segments():
+            if compressed:
+                puzzles = self._index(number)["participants"].get(participant_id, {})
+                if wanted_puzzle is not None:
+                    block_ids = puzzles.get(wanted_puzzle, [])
+                else:
+                    block_ids = sorted({b for ids in puzzles.values() for b in ids})
+                if not block_ids:
+                    continue
+                lines = self._read_blocks(number, block_ids)
+            else:
+                lines = self._read_plain(number)
+            # Cheap pre-filter before parsing
+            for row in self._complete_rows(line for line in lines if needle in line):
+                event = decode_event(row)
+                if keep(event):
+                    events.append(event)
+        return events
+
+    def disk_usage(self) -> int:
+        """Bytes used by segments and indexes."""
+        if not os.path.isdir(self.directory):
+            return 0
+        return sum(os.path.getsize(os.path.join(self.directory, name)) for name in os.listdir(self.directory))
@@ -0,0 +1,303 @@
+"""
+In-memory incremental aggregates for the live experimenter dashboard.
+
+LiveAggregator is registered as a DataLogger listener, so every logged
+completion or interaction updates the counters in O(log n) without
+re-reading results.csv. Dashboard viewers share one cached JSON payload
+per state version and block on a condition variable between updates.
+"""
+
+import csv
+import heapq
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+
+LOA_LEVELS = ("1", "2", "3", "4")
+PUZZLES_PER_PARTICIPANT = 4
+
+
+class StreamingMedian:
+    """Running median using a max-heap / min-heap pair."""
+
+    __slots__ = ("_low", "_high")
+
+    def __init__(self):
+        self._low = []   # max-heap (negated values)
+        self._high = []  # min-heap
+
+    def add(self, value: float):
+        if self._low and value > -self._low[0]:
+            heapq.heappush(self._high, value)
+        else:
+            heapq.heappush(self._low, -value)
+        if len(self._low) > len(self._high) + 1:
+            heapq.heappush(self._high, -heapq.heappop(self._low))
+        elif len(self._high) > len(self._low):
+            heapq.heappush(self._low, -heapq.heappop(self._high))
+
+    def __len__(self):
+        return len(self._low) + len(self._high)
+
+    @property
+    def value(self) -> Optional[float]:
+        if not self._low:
+            return None
+        if len(self._low) > len(self._high):
+            return -self._low[0]
+        return (-self._low[0] + self._high[0]) / 2.0
+
+
+def _as_bool(value) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() == "true"
+    return bool(value)
+
+
+class LiveAggregator:
+    """Thread-safe incremental study statistics with change notification."""
+
+    def __init__(self, active_window_seconds: float = 600.0):
+        self.active_window_seconds = active_window_seconds
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._version = 0
+        self._payload_version = -1
+        self._payload = "{}"
+
+        self._completions = {loa: 0 for loa in LOA_LEVELS}
+        self._correct = {loa: 0 for loa in LOA_LEVELS}
+        self._medians = {loa: StreamingMedian() for loa in LOA_LEVELS}
+        self._overall_median = StreamingMedian()
+        self._participants = set()
+        self._puzzles_done: Dict[str, int] = {}
+        self._last_seen: Dict[str, float] = {}
+        self._interactions = 0
+        self._model_calls = 0
+        self._model_errors: Dict[str, int] = {}
+        self._hedges = 0
+        self._hedge_wins = 0
+        self._coalesced = 0
+        self._degradations: Dict[str, int] = {}
+        self._breaker_state = "closed"
+        self._prompts = 0
+        self._prompt_tokens: Dict[str, int] = {}
+        self._prompt_median = StreamingMedian()
+        self._prompt_max = 0
+        self._prompt_compactions = 0
+
+    # ------------------------------------------------------------------ updates
+
+    def on_log(self, event: str, payload: Dict):
+        """DataLogger listener entry point."""
+        if event == "puzzle_completion":
+            self.record_completion(payload)
+        elif event == "interaction":
+            self.record_interaction(payload.get("participant_id", ""))
+
+    def record_completion(self, data: Dict, now: Optional[float] = None):
+        loa = str(data.get("loa_level", ""))
+        participant_id = str(data.get("participant_id", ""))
+        with self._lock:
+            if loa in self._completions:
+                self._completions[loa] += 1
+                if _as_bool(data.get("final_correctness", False)):
+                    self._correct[loa] += 1
+                try:
+                    completion_time = float(data.get("completion_time", 0))
+                except (TypeError, ValueError):
+                    completion_time = None
+                if completion_time is not None:
+                    self._medians[loa].add(completion_time)
+                    self._overall_median.add(completion_time)
+
+            self._participants.add(participant_id)
+            done = self._puzzles_done.get(participant_id, 0) + 1
+            self._puzzles_done[participant_id] = done
+            if done >= PUZZLES_PER_PARTICIPANT:
+                self._last_seen.pop(participant_id, None)
+            else:
+                self._last_seen[participant_id] = now if now is not None else time.time()
+            self._bump()
+
+    def record_interaction(self, participant_id: str, now: Optional[float] = None):
+        with self._lock:
+            self._interactions += 1
+            if self._puzzles_done.get(participant_id, 0) < PUZZLES_PER_PARTICIPANT:
+                self._last_seen[participant_id] = now if now is not None else time.time()
+            self._bump()
+
+    def record_model_call(self, error: Optional[str] = None):
+        """Count one LOA3 model attempt; `error` is a short reason when it failed."""
+        with self._lock:
+            self._model_calls += 1
+            if error:
+                self._model_errors[error] = self._model_errors.get(error, 0) + 1
+            self._bump()
+
+    def record_hedge(self, won: bool = False):
+        """Count a hedged LOA3 model request being launched, or (won=True) winning."""
+        with self._lock:
+            if won:
+                self._hedge_wins += 1
+            else:
+                self._hedges += 1
+            self._bump()
+
+    def record_coalesced(self):
+        """Count one LOA3 plan request answered by another participant's identical in-flight request."""
+        with self._lock:
+            self._coalesced += 1
+            self._bump()
+
+    def record_degradation(self, reason: str):
+        """Count one LOA3 plan served locally instead of by the model (breaker_open, deadline, model_error)."""
+        with self._lock:
+            self._degradations[reason] = self._degradations.get(reason, 0) + 1
+            self._bump()
+
+    def record_breaker_state(self, state: str):
+        """Track the LOA3 circuit breaker state; only changes notify listeners."""
+        with self._lock:
+            if state != self._breaker_state:
+                self._breaker_state = state
+                self._bump()
+
+    def record_prompt(self, sections: Dict[str, int], compacted_steps: int = 0):
+        """Count one LOA3 prompt and its estimated tokens per section."""
+        total = sum(sections.values())
+        with self._lock:
+            self._prompts += 1
+            for name, tokens in sections.items():
+                self._prompt_tokens[name] = self._prompt_tokens.get(name, 0) + tokens
+            self._prompt_median.add(total)
+            self._prompt_max = max(self._prompt_max, total)
+            if compacted_steps:
+                self._prompt_compactions += 1
+            self._bump()
+
+    def load_existing(self, results_file: str):
+        """Seed completion counters from results.csv once at startup."""
+        if not os.path.exists(results_file):
+            return
+        with open(results_file, "r", encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                self.record_completion(row, now=0.0)
+        with self._lock:
+            # Historical rows say nothing about who is online right now
+            self._last_seen = {pid: seen for pid, seen in self._last_seen.items() if seen > 0.0}
+
+    def _bump(self):
+        self._version += 1
+        self._changed.notify_all()
+
+    def _expire_sessions(self, now: float):
+        cutoff = now - self.active_window_seconds
+        stale = [pid for pid, seen in self._last_seen.items() if seen < cutoff]
+        for pid in stale:
+            del self._last_seen[pid]
+        if stale:
+            self._bump()
+
+    # ------------------------------------------------------------------ reads
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return self._snapshot_locked(time.time())
+
+    def _snapshot_locked(self, now: float) -> Dict:
+        self._expire_sessions(now)
+        per_loa = {}
+        for loa in LOA_LEVELS:
+            count = self._completions[loa]
+            per_loa[loa] = {
+                "completed": count,
+                "correctness_rate": (self._correct[loa] / count) if count else None,
+                "median_completion_time": self._medians[loa].value,
+            }
+        errors = sum(self._model_errors.values())
+        return {
+            "version": self._version,
+            "generated_at": datetime.now().isoformat(),
+            "participants": len(self._participants),
+            "active_sessions": len(self._last_seen),
+            "total_completed": sum(self._completions.values()),
+            "median_completion_time": self._overall_median.value,
+            "interactions": self._interactions,
+            "loa": per_loa,
+            "model": {
+                "calls": self._model_calls,
+                "errors": errors,
+                "error_rate": (errors / self._model_calls) if self._model_calls else None,
+                "errors_by_reason": dict(self._model_errors),
+                "hedges": self._hedges,
+                "hedge_wins": self._hedge_wins,
+                "coalesced": self._coalesced,
+                "degraded": sum(self._degradations.values()),
+                "degraded_by_reason": dict(self._degradations),
+                "breaker_state": self._breaker_state,
+            },
+            "prompt": {
+                "count": self._prompts,
+                "median_tokens": self._prompt_median.value,
+                "max_tokens": self._prompt_max,
+                "mean_tokens_by_section": {
+                    name: tokens / self._prompts for name, tokens in self._prompt_tokens.items()
+                },
+                "compacted": self._prompt_compactions,
+            },
+        }
+
+    def payload(self) -> Tuple[int, str]:
+        """Return (version, JSON) — serialised once per version and shared by all viewers."""
+        with self._lock:
+            return self._payload_locked()
+
+    def _payload_locked(self) -> Tuple[int, str]:
+        self._expire_sessions(time.time())
+        if self._payload_version != self._version:
+            snapshot = self._snapshot_locked(time.time())
+            self._payload = json.dumps(snapshot)
+            self._payload_version = snapshot["version"]
+        return self._payload_version, self._payload
+
+    def wait_for_update(self, last_version: int, timeout: float) -> Tuple[int, Optional[str]]:
+        """
+        Block until the state moves past `last_version` or `timeout` elapses.
+
+        Returns:
+            (version, JSON payload) or (last_version, None) on timeout
+        """
+        with self._lock:
+            if self._version == last_version:
+                self._changed.wait(timeout)
+                self._expire_sessions(time.time())
+            if self._version == last_version:
+                return last_version, None
+            return self._payload_locked()
+
+
+def sse_stream(aggregator: LiveAggregator, min_interval: float = 1.0, heartbeat: float = 15.0):
+    """
+    Generator of Server-Sent Events for one dashboard viewer.
+
+    Updates arriving faster than `min_interval` are coalesced into one event;
+    a comment line is sent every `heartbeat` seconds to keep proxies open.
+    """
+    version, data = aggregator.payload()
+    yield f"id: {version}\nevent: stats\ndata: {data}\n\n"
+    while True:
+        started = time.monotonic()
+        new_version, data = aggregator.wait_for_update(version, heartbeat)
+        if data is None:
+            yield ": keepalive\n\n"
+            continue
+        version = new_version
+        yield f"id: {version}\nevent: stats\ndata: {data}\n\n"
+        elapsed = time.monotonic() - started
+        if elapsed < min_interval:
+            time.sleep(min_interval - elapsed)
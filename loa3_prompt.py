@@ -0,0 +1,176 @@
+"""
+Prompt builder for the LOA3 step planner.
+
+The prompt is split into a stable prefix (condition, puzzle, final
+arrangement rules, output format and example) and a short suffix (the
+accepted steps and which steps to generate). The prefix only depends on the
+puzzle and condition, so it is rendered once and cached, and because it
+comes first, provider-side prompt caching can reuse it across participants
+and retries.
+
+Token counts are estimated at ~4 characters per token (no tokenizer is
+needed offline). When a prompt exceeds the token budget, the oldest
+accepted steps are shortened, then summarised, until it fits.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple
+
+
+CHARS_PER_TOKEN = 4
+DEFAULT_TOKEN_BUDGET = 1500
+COMPACT_STEP_CHARS = 80
+
+_FAULTY = (
+    "IMPORTANT: You are simulating a faulty-yet-confident AI. Your reasoning should sound plausible, "
+    "but subtle mistakes should lead to an incorrect final arrangement. Never admit you are faulty.\n\n"
+)
+_CORRECT = (
+    "IMPORTANT: You must be correct and internally consistent. Carefully obey every constraint so the "
+    "final arrangement is correct.\n\n"
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for `text`."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class LOA3Prompt(NamedTuple):
+    """A rendered prompt with its estimated size per section."""
+    text: str
+    sections: Dict[str, int]
+    compacted_steps: int
+
+    @property
+    def tokens(self) -> int:
+        return sum(self.sections.values())
+
+
+class PromptBuilder:
+    """
+    Builds LOA3 planning prompts from a cached per-puzzle prefix.
+
+    Args:
+        total_steps: Number of steps in a full plan
+        plan_example: Example JSON response shown to the model
+        token_budget: Compact accepted steps once a prompt is larger than this
+        cache_size: Number of (puzzle, condition) prefixes kept
+    """
+
+    def __init__(self, total_steps: int, plan_example: str, token_budget: int = DEFAULT_TOKEN_BUDGET,
+                 cache_size: int = 64):
+        self.total_steps = total_steps
+        self.plan_example = plan_example
+        self.token_budget = token_budget
+        self.cache_size = cache_size
+        self._prefixes: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def prefix(self, puzzle: Dict, expected_final_sequence: str, is_faulty: bool):
+        """Return (text, tokens) of the stable prompt prefix for a puzzle and condition."""
+        key = (puzzle.get("puzzle_id"), puzzle.get("prompt", ""), expected_final_sequence, bool(is_faulty))
+        with self._lock:
+            cached = self._prefixes.get(key)
+            if cached is not None:
+                self._prefixes.move_to_end(key)
+                return cached
+
+        last = self.total_steps
+        text = (
+            (_FAULTY if is_faulty else _CORRECT)
+            + "You are an AI assistant helping a participant solve a logic puzzle.\n"
+            "You must operate under a supervisory model: generate a fixed number of reasoning steps, "
+            "and the user will reveal them one by one.\n\n"
+            f"Puzzle:\n{puzzle.get('prompt', '')}\n\n"
+            "Rules for every plan:\n"
+            "- Each step must start with the literal prefix \"Step X:\" where X is the step number.\n"
+            "- Each step must contain only 1-2 sentences describing a single incremental deduction.\n"
+            f"- Avoid revealing the final arrangement until Step {last}.\n"
+            f"- The final arrangement MUST be exactly: \"{expected_final_sequence}\".\n"
+            f"- Step {last} must include the phrase \"This is my final step\" and set is_final=true.\n"
+            f"- The 'final_sequence' field in the JSON for Step {last} must be EXACTLY the string "
+            f"\"{expected_final_sequence}\" (without a trailing period).\n"
+            "- For all earlier steps, set is_final=false and final_sequence=null.\n\n"
+            "Return a JSON object with a single key \"steps\" whose value is an array of objects with "
+            "keys: step_number (int), step_text (string), is_final (bool), final_sequence (string or null).\n"
+            f"Example format:\n{self.plan_example}\n\n"
+        )
+        entry = (text, estimate_tokens(text))
+        with self._lock:
+            self._prefixes[key] = entry
+            while len(self._prefixes) > self.cache_size:
+                self._prefixes.popitem(last=False)
+        return entry
+
+    def build(self, puzzle: Dict, accepted_steps: List[Dict], start_step_number: int,
+              expected_final_sequence: str, is_faulty: bool) -> LOA3Prompt:
+        """
+        Render the prompt for generating steps `start_step_number`..total_steps.
+
+        Returns:
+            LOA3Prompt with token estimates for the "prefix", "accepted_steps"
+            and "request" sections
+        """
+        prefix_text, prefix_tokens = self.prefix(puzzle, expected_final_sequence, is_faulty)
+        count = self.total_steps - start_step_number + 1
+        request = (
+            f"Generate EXACTLY {count} new steps covering Step {start_step_number} "
+            f"through Step {self.total_steps}, following the rules above.\n"
+        )
+        request_tokens = estimate_tokens(request)
+
+        texts = [step["step_text"] for step in accepted_steps]
+        available = self.token_budget - prefix_tokens - request_tokens
+        accepted, compacted = _compact_steps(texts, available)
+        accepted_text = "Previously accepted steps:\n" + (accepted or "None so far.") + "\n\n"
+
+        return LOA3Prompt(
+            text=prefix_text + accepted_text + request,
+            sections={
+                "prefix": prefix_tokens,
+                "accepted_steps": estimate_tokens(accepted_text),
+                "request": request_tokens,
+            },
+            compacted_steps=compacted,
+        )
+
+
+def _first_sentence(text: str) -> str:
+    sentence = re.split(r"(?<=[.!?])\s", text.strip(), maxsplit=1)[0]
+    if len(sentence) > COMPACT_STEP_CHARS:
+        sentence = sentence[:COMPACT_STEP_CHARS - 3].rstrip() + "..."
+    return sentence
+
+
+def _compact_steps(texts: List[str], budget: int):
+    """
+    Join accepted step texts, shortening the oldest ones until they fit `budget` tokens.
+
+    Returns:
+        (joined text, number of steps that were shortened or omitted)
+    """
+    texts = list(texts)
+    shortened = [False] * len(texts)
+
+    def fits():
+        return estimate_tokens("\n".join(texts)) <= budget
+
+    # First keep only the first sentence of older steps, oldest first
+    for i in range(len(texts) - 1):
+        if fits():
+            break
+        shorter = _first_sentence(texts[i])
+        shortened[i] = shorter != texts[i]
+        texts[i] = shorter
+    # Then fold the oldest steps into a single note, always keeping the latest
+    omitted = 0
+    while len(texts) > 1 and not fits():
+        texts.pop(0)
+        shortened.pop(0)
+        omitted += 1
+    if omitted:
+        texts.insert(0, f"(Steps 1-{omitted} omitted for brevity.)")
+    return "\n".join(texts), omitted + sum(shortened)
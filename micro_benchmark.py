@@ -0,0 +1,272 @@
+"""
+Micro-benchmark regression suite for the logging, scoring and LOA3 helpers.
+
+Times the hot functions on synthetic data (no network, no model):
+
+    log_interaction[N]        DataLogger.log_interaction with N events already logged
+    log_puzzle_completion     DataLogger.log_puzzle_completion
+    export_summary[N]         DataLogger.export_summary over N results.csv rows
+    calculate_edit_distance   DataLogger.calculate_edit_distance
+    check_correctness         DataLogger.check_correctness (fuzzy path)
+    validate_loa3_plan        app._validate_loa3_plan on a valid plan
+    plan_steps_fallback       app._plan_steps_fallback for a fresh plan
+
+Each result is seconds per call, also expressed relative to a fixed
+pure-Python calibration loop so that a baseline saved on one machine can be
+checked on another. A run fails (exit code 1) when any benchmark is more
+than --threshold times slower than the baseline even in its fastest of up
+to --runs runs (the suite is only re-run while something looks slow).
+Baselines are the best of --runs runs. The baseline saved from a
+known-good build is committed (data/benchmarks/micro-baseline.json); a run
+without one fails with exit code 2 unless --allow-missing-baseline is given.
+
+Usage:
+    python micro_benchmark.py --save-baseline          # on a known-good build
+    python micro_benchmark.py [--threshold 1.5] [--quick] [--allow-missing-baseline]
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Sequence
+
+from data_logger import RESULTS_COLUMNS, DataLogger
+
+
+SIZES = (1_000, 10_000, 100_000)
+QUICK_SIZES = (100, 1_000)
+DEFAULT_BASELINE = os.path.join("data", "benchmarks", "micro-baseline.json")
+DEFAULT_THRESHOLD = 1.5
+DEFAULT_RUNS = 3
+PUZZLES_FILE = "logic_puzzles.json"
+
+
+def time_call(fn: Callable[[], object], min_time: float = 0.05, repeats: int = 5) -> float:
+    """
+    Seconds per call in the fastest of `repeats` batches of at least
+    `min_time` each (noise from other processes only ever adds time).
+    """
+    def batch(number: int) -> float:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        return time.perf_counter() - started
+
+    number = 1
+    elapsed = batch(number)
+    while elapsed < min_time:
+        number *= 2
+        elapsed = batch(number)
+    samples = [elapsed / number] + [batch(number) / number for _ in range(repeats - 1)]
+    return min(samples)
+
+
+def calibrate() -> float:
+    """Seconds per call of a fixed pure-Python workload (dict, string and list operations)."""
+    def workload():
+        counts = {}
+        for i in range(2000):
+            key = "k" + str(i % 97)
+            counts[key] = counts.get(key, 0) + i
+        return sorted(counts.items())
+    return time_call(workload, min_time=0.1, repeats=10)
+
+
+# ------------------------------------------------------------------ fixtures
+
+def _interaction(i: int, start: datetime) -> Dict:
+    return {
+        "participant_id": f"P{i // 400:04d}",
+        "puzzle_id": i // 100 % 4 + 1,
+        "interaction_type": ("drag_start", "drop_in_solution", "return_to_pool", "request_hint")[i % 4],
+        "timestamp": (start + timedelta(milliseconds=750 * i)).isoformat(),
+        "details": {"element": "ABCDEF"[i % 6], "position": i % 6 + 1},
+    }
+
+
+def _completion(i: int) -> Dict:
+    return {
+        "participant_id": f"P{i // 4:04d}", "loa_level": i % 4 + 1, "puzzle_id": i % 4 + 1,
+        "ai_faulty": i % 3 == 0, "start_time": "2025-12-08T10:00:00", "end_time": "2025-12-08T10:05:00",
+        "completion_time": 300.0 + i % 60, "num_interactions": 40, "decision_latency": 12.5,
+        "action_sequence": ["drag_start", "drop_in_solution"] * 20, "accepted_advice": True,
+        "hints_used": i % 3, "edit_distance": i % 7, "final_correctness": i % 2 == 0,
+        "pre_trust_survey": {f"Q{q}": 4 for q in range(1, 6)},
+        "post_trust_survey": {f"Q{q}": 5 for q in range(1, 6)},
+        "awareness_quiz_answers": {f"Q{q}": "b" for q in range(1, 6)},
+        "productivity_survey": {f"Q{q}": 3 for q in range(1, 5)},
+        "final_answer": "Alice, Bob, Carol, Dave", "expected_answer": "Alice, Bob, Carol, Dave",
+    }
+
+
+def _logger_with_interactions(directory: str, count: int) -> DataLogger:
+    logger = DataLogger(output_dir=directory)
+    store = logger.interaction_store
+    start = datetime(2025, 12, 8, 10, 0, 0)
+    for i in range(count):
+        store.append(_interaction(i, start))
+    return logger
+
+
+def _results_csv(directory: str, rows: int) -> DataLogger:
+    logger = DataLogger(output_dir=directory)
+    template = DataLogger(output_dir=os.path.join(directory, "template"))
+    for i in range(4):
+        template.log_puzzle_completion(_completion(i))
+    with open(template.results_file, "r", encoding="utf-8", newline="") as f:
+        sample = list(csv.DictReader(f))
+    with open(logger.results_file, "a", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULTS_COLUMNS)
+        for i in range(rows):
+            row = dict(sample[i % 4], participant_id=f"P{i // 4:05d}")
+            writer.writerow(row)
+    return logger
+
+
+# ------------------------------------------------------------------ suite
+
+def run_suite(sizes: Sequence[int] = SIZES, min_time: float = 0.05) -> Dict[str, float]:
+    """Run every benchmark and return {name: seconds per call}."""
+    import app as app_module  # deferred: only the LOA3 helpers need it
+
+    with open(PUZZLES_FILE, "r", encoding="utf-8") as f:
+        puzzle = json.load(f)["puzzles"][0]
+    expected = app_module._get_expected_final_sequence(puzzle, False)
+    plan = app_module._plan_steps_fallback(puzzle, [], 1, expected, False)
+    required = list(range(1, app_module.LOA3_TOTAL_STEPS + 1))
+
+    results: Dict[str, float] = {}
+    with tempfile.TemporaryDirectory() as root:
+        for size in sizes:
+            logger = _logger_with_interactions(os.path.join(root, f"interactions-{size}"), size)
+            counter = iter(range(size, size + 10_000_000))
+            start = datetime(2025, 12, 8, 10, 0, 0)
+
+            def log_one():
+                i = next(counter)
+                event = _interaction(i, start)
+                logger.log_interaction(event["participant_id"], event["puzzle_id"], event["interaction_type"],
+                                       event["timestamp"], event["details"])
+
+            results[f"log_interaction[{size}]"] = time_call(log_one, min_time)
+            logger.interaction_store.close()
+
+            summary_logger = _results_csv(os.path.join(root, f"results-{size}"), size)
+            results[f"export_summary[{size}]"] = time_call(summary_logger.export_summary, min_time, repeats=3)
+
+        completion_logger = DataLogger(output_dir=os.path.join(root, "completions"))
+        completion = _completion(1)
+        results["log_puzzle_completion"] = time_call(lambda: completion_logger.log_puzzle_completion(completion),
+                                                     min_time)
+        completion_logger.interaction_store.close()
+
+    ai_solution = "Alice, Bob, Carol, Dave, Erin, Frank"
+    answer = "Alice, Carol, Bob, Dave, Frank, Erin"
+    results["calculate_edit_distance"] = time_call(
+        lambda: DataLogger.calculate_edit_distance(ai_solution, answer), min_time)
+    results["check_correctness"] = time_call(lambda: DataLogger.check_correctness(answer, ai_solution), min_time)
+    results["validate_loa3_plan"] = time_call(
+        lambda: app_module._validate_loa3_plan(plan, required, expected, puzzle.get("elements", [])), min_time)
+    results["plan_steps_fallback"] = time_call(
+        lambda: app_module._plan_steps_fallback(puzzle, [], 1, expected, False), min_time)
+    return results
+
+
+def check(current: Dict, baseline: Dict, threshold: float = DEFAULT_THRESHOLD) -> List[str]:
+    """
+    Regressions of `current` against `baseline` (both saved reports).
+
+    Times are compared relative to each report's calibration, so machine
+    speed cancels out. Benchmarks missing from either report are skipped.
+
+    Returns:
+        One line per benchmark slower than `threshold` times its baseline
+    """
+    regressions = []
+    for name, seconds in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+        now = seconds / current["calibration"]
+        then = baseline["results"][name] / baseline["calibration"]
+        if then > 0 and now > then * threshold:
+            regressions.append(f"{name}: {now / then:.2f}x slower than baseline (limit {threshold:.2f}x)")
+    return regressions
+
+
+def best_of(reports: Sequence[Dict]) -> Dict:
+    """
+    Combine runs into one report holding each benchmark's fastest time
+    relative to its own run's calibration (calibration 1.0).
+    """
+    names = [name for name in reports[0]["results"] if all(name in r["results"] for r in reports)]
+    return {
+        "meta": dict(reports[0]["meta"], runs=len(reports)),
+        "calibration": 1.0,
+        "results": {name: min(r["results"][name] / r["calibration"] for r in reports) for name in names},
+    }
+
+
+def _run(sizes: Sequence[int], quick: bool) -> Dict:
+    return {
+        "meta": {"created_at": datetime.now().isoformat(), "python": sys.version.split()[0], "sizes": list(sizes)},
+        "calibration": calibrate(),
+        "results": run_suite(sizes, min_time=0.01 if quick else 0.05),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for logging, scoring and LOA3 helpers")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Fail when a benchmark is this many times slower than the baseline")
+    parser.add_argument("--quick", action="store_true", help="Small data sizes and short timings")
+    parser.add_argument("--output", default=None, help="Also save this run's report here")
+    parser.add_argument("--allow-missing-baseline", action="store_true",
+                        help="Exit 0 instead of 2 when there is no baseline to check against")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS,
+                        help="Most suite runs: a baseline is the best of all of them, and a check "
+                             "re-runs while anything looks slower than the threshold")
+    args = parser.parse_args(argv)
+
+    sizes = QUICK_SIZES if args.quick else SIZES
+    runs = [_run(sizes, args.quick)]
+    for name, seconds in runs[0]["results"].items():
+        print(f"{name:>32}: {seconds * 1e6:10.1f} us")
+    if args.save_baseline:
+        runs.extend(_run(sizes, args.quick) for _ in range(args.runs - 1))
+    report = best_of(runs) if len(runs) > 1 else runs[0]
+
+    for path in filter(None, (args.output, args.baseline if args.save_baseline else None)):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved to {path}")
+    if args.save_baseline:
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline on a known-good build")
+        return 0 if args.allow_missing_baseline else 2
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = check(report, baseline, args.threshold)
+    # A busy machine makes single runs look slow; only regressions that persist count
+    while regressions and len(runs) < args.runs:
+        print(f"{len(regressions)} benchmark(s) look slower than the baseline; running again to confirm")
+        runs.append(_run(sizes, args.quick))
+        regressions = check(best_of(runs), baseline, args.threshold)
+    for line in regressions:
+        print("REGRESSION", line)
+    if not regressions:
+        print(f"No regressions against {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+Model backends for the LOA3 step planner.
+
+A backend turns a prompt into the model's raw response text:
+
+    backend.generate(prompt) -> str
+
+It is called from a worker thread, so implementations must be thread-safe.
+GeminiBackend talks to google.generativeai (imported lazily, it is slow to
+load); StubBackend serves deterministic canned or perturbed plans with
+configurable latency and error rates for tests and benchmarks.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+
+LOA3_GENERATION_CONFIG = {"response_mime_type": "application/json", "temperature": 0.4}
+
+_genai = None
+_genai_lock = threading.Lock()
+
+
+def load_genai(api_key: Optional[str] = None):
+    """Import and configure the Gemini SDK once (thread-safe)."""
+    global _genai
+    with _genai_lock:
+        if _genai is None:
+            import google.generativeai as genai
+            genai.configure(api_key=api_key)
+            _genai = genai
+    return _genai
+
+
+class ModelError(RuntimeError):
+    """The backend failed to produce a response (network, quota, timeout...)."""
+
+
+class GeminiBackend:
+    """Calls Gemini's generate_content with the LOA3 generation config."""
+
+    def __init__(self, model_name: str, api_key: Optional[str] = None):
+        self.model_name = model_name
+        self.api_key = api_key
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _get_model(self):
+        with self._lock:
+            if self._model is None:
+                self._model = load_genai(self.api_key).GenerativeModel(self.model_name)
+            return self._model
+
+    def warm_up(self):
+        self._get_model()
+
+    def generate(self, prompt: str) -> str:
+        response = self._get_model().generate_content(prompt, generation_config=LOA3_GENERATION_CONFIG)
+        return response.text
+
+
+# ---------------------------------------------------------------------- stub
+
+_RANGE_PATTERN = re.compile(r"covering Step (\d+) through Step (\d+)")
+_FINAL_PATTERN = re.compile(r'The final arrangement MUST be exactly: "([^"]*)"')
+
+# Defects a StubBackend can inject, named after the planner reject reason
+# (or model error) they are expected to trigger
+DEFECTS = (
+    "request_failed",
+    "json_decode_error",
+    "missing_steps",
+    "incorrect_number_of_steps",
+    "premature_full_sequence",
+    "final_step_missing_flag",
+    "final_sequence_mismatch",
+    "fenced_json",  # Markdown fence and trailing comma: repaired, not rejected
+)
+
+
+def canned_plan(prompt: str, defect: Optional[str] = None, rng: Optional[random.Random] = None) -> str:
+    """
+    Build the JSON a well-behaved model would return for an LOA3 prompt,
+    optionally with one defect applied.
+    """
+    rng = rng or random.Random(0)
+    span = _RANGE_PATTERN.search(prompt)
+    first, last = (int(span.group(1)), int(span.group(2))) if span else (1, 5)
+    final = _FINAL_PATTERN.search(prompt)
+    final_sequence = final.group(1) if final else ""
+
+    if defect == "missing_steps":
+        return json.dumps({"plan": []})
+
+    steps: List[Dict] = []
+    for number in range(first, last + 1):
+        is_final = number == last
+        text = f"Step {number}: I apply constraint {number} to narrow down the seating."
+        if is_final:
+            text = f"Step {number}: This is my final step. The complete arrangement is {final_sequence}."
+        steps.append({"step_number": number, "step_text": text, "is_final": is_final,
+                      "final_sequence": final_sequence if is_final else None})
+
+    if defect == "incorrect_number_of_steps":
+        steps = steps[:-1] if len(steps) > 1 else steps + steps
+    elif defect == "premature_full_sequence" and len(steps) > 1:
+        steps[0]["step_text"] += f" So far the order looks like {final_sequence}."
+    elif defect == "final_step_missing_flag":
+        steps[-1]["is_final"] = False
+    elif defect == "final_sequence_mismatch":
+        parts = [p.strip() for p in final_sequence.split(",")]
+        rng.shuffle(parts)
+        if parts == [p.strip() for p in final_sequence.split(",")]:
+            parts.reverse()
+        steps[-1]["final_sequence"] = ", ".join(parts)
+
+    text = json.dumps({"steps": steps})
+    if defect == "json_decode_error":
+        # Truncated response: cut inside a random step object
+        starts = [m.start() for m in re.finditer(r'\{"step_number"', text)]
+        return text[:starts[rng.randrange(len(starts))] + 20]
+    if defect == "fenced_json":
+        return "```json\n" + text[:-2] + ",\n]}\n```"
+    return text
+
+
+class StubBackend:
+    """
+    Deterministic local model for tests and benchmarks.
+
+    Args:
+        responder: prompt -> response text (default: canned_plan)
+        latency: Seconds per call, or a callable(rng) returning seconds
+        error_rate: Probability of raising ModelError instead of answering
+        defect_rates: {defect name: probability} applied to canned plans
+        seed: Seed for the latency/error/defect draws
+    """
+
+    def __init__(self, responder: Optional[Callable[[str], str]] = None, latency=0.0,
+                 error_rate: float = 0.0, defect_rates: Optional[Dict[str, float]] = None,
+                 seed: int = 0):
+        self.responder = responder
+        self.latency = latency
+        self.error_rate = error_rate
+        self.defect_rates = dict(defect_rates or {})
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _draw(self):
+        with self._lock:
+            self.calls += 1
+            delay = self.latency(self._rng) if callable(self.latency) else self.latency
+            failed = self._rng.random() < self.error_rate
+            defect = None
+            roll = self._rng.random()
+            for name, rate in self.defect_rates.items():
+                if roll < rate:
+                    defect = name
+                    break
+                roll -= rate
+            seed = self._rng.getrandbits(32)
+        return delay, failed, defect, random.Random(seed)
+
+    def generate(self, prompt: str) -> str:
+        delay, failed, defect, rng = self._draw()
+        if delay > 0:
+            time.sleep(delay)
+        if failed or defect == "request_failed":
+            raise ModelError("stub model error")
+        if self.responder is not None:
+            return self.responder(prompt)
+        return canned_plan(prompt, defect, rng)
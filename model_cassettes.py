@@ -0,0 +1,190 @@
+"""
+Record/replay transport for LOA3 model traffic.
+
+RecordingBackend wraps a live backend (usually GeminiBackend) and appends
+every prompt hash, response and latency to a cassette; ReplayBackend serves
+those responses back without a network, sleeping for the recorded (or
+scaled) latency, so the real parsing and validation path in app.py can be
+exercised offline.
+
+A cassette is a gzip-compressed JSON-lines file. Each line is one call:
+
+    {"key": <sha256 of prompt>, "latency": 1.92, "response": "..."}
+    {"key": <sha256 of prompt>, "latency": 30.0, "error": "DeadlineExceeded"}
+
+Prompts themselves are not stored, only their hash. Recording appends a new
+gzip member per call, which gzip readers concatenate transparently. A torn
+last member (the process died while recording) is skipped on load, and cut
+off before the next call is recorded.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from collections import defaultdict
+from typing import Dict, List
+
+from model_backends import ModelError
+
+
+def prompt_key(prompt: str) -> str:
+    """Cassette key for a prompt."""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def _iter_members(f, chunk: int = 1 << 16):
+    """
+    Yield (decompressed bytes, end offset) for each complete gzip member of
+    binary file `f`; stops at a member without its end-of-stream marker.
+    Raises zlib.error for a corrupt member.
+    """
+    offset, pending = 0, b""
+    while True:
+        data = pending or f.read(chunk)
+        if not data:
+            return
+        member = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        out, fed = [], 0
+        while True:
+            fed += len(data)
+            out.append(member.decompress(data))
+            if member.eof:
+                break
+            data = f.read(chunk)
+            if not data:
+                return
+        pending = member.unused_data
+        offset += fed - len(pending)
+        yield b"".join(out), offset
+
+
+class CassetteStore:
+    """
+    Recorded model calls, grouped by prompt hash.
+
+    Args:
+        path: Cassette file (.jsonl.gz); created on the first recorded call
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._calls: Dict[str, List[Dict]] = defaultdict(list)
+        self.torn_bytes = 0  # unreadable tail, cut off before the next add()
+        if os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        good_end = 0
+        with open(self.path, "rb") as f:
+            try:
+                for raw, end in _iter_members(f):
+                    calls = [json.loads(line) for line in raw.decode("utf-8").splitlines() if line.strip()]
+                    for key, call in [(call["key"], call) for call in calls]:
+                        self._calls[key].append(call)
+                    good_end = end
+            except (zlib.error, UnicodeDecodeError, json.JSONDecodeError, KeyError, TypeError):
+                pass  # keep the calls before the damaged member
+        self.torn_bytes = os.path.getsize(self.path) - good_end
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(calls) for calls in self._calls.values())
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._calls
+
+    def add(self, key: str, latency: float, response: str = None, error: str = None):
+        """Append one call to the cassette (and to the in-memory index)."""
+        call = {"key": key, "latency": round(latency, 4)}
+        if error is not None:
+            call["error"] = error
+        else:
+            call["response"] = response
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            if self.torn_bytes:
+                os.truncate(self.path, os.path.getsize(self.path) - self.torn_bytes)
+                self.torn_bytes = 0
+            with gzip.open(self.path, "at", encoding="utf-8") as f:
+                f.write(json.dumps(call, ensure_ascii=False) + "\n")
+            self._calls[key].append(call)
+
+    def calls(self, key: str) -> List[Dict]:
+        with self._lock:
+            return list(self._calls.get(key, ()))
+
+
+class RecordingBackend:
+    """
+    Pass calls through to `backend` and record them in `store`.
+
+    Args:
+        backend: Live model backend
+        store: CassetteStore to append to
+    """
+
+    def __init__(self, backend, store: CassetteStore):
+        self.backend = backend
+        self.store = store
+
+    def warm_up(self):
+        if hasattr(self.backend, "warm_up"):
+            self.backend.warm_up()
+
+    def generate(self, prompt: str) -> str:
+        key = prompt_key(prompt)
+        started = time.perf_counter()
+        try:
+            response = self.backend.generate(prompt)
+        except Exception as e:
+            self.store.add(key, time.perf_counter() - started, error=type(e).__name__)
+            raise
+        self.store.add(key, time.perf_counter() - started, response=response)
+        return response
+
+
+class ReplayBackend:
+    """
+    Serve recorded responses for matching prompts.
+
+    Repeated calls with the same prompt (retries, hedges) walk through that
+    prompt's recordings in order and wrap around, so a short recording can
+    drive a long benchmark.
+
+    Args:
+        store: CassetteStore to replay
+        latency_scale: Multiplier for recorded latencies (0 replays instantly)
+    """
+
+    def __init__(self, store: CassetteStore, latency_scale: float = 1.0):
+        self.store = store
+        self.latency_scale = latency_scale
+        self.calls = 0
+        self.misses = 0
+        self._positions: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def generate(self, prompt: str) -> str:
+        key = prompt_key(prompt)
+        recorded = self.store.calls(key)
+        with self._lock:
+            self.calls += 1
+            if not recorded:
+                self.misses += 1
+                raise ModelError(f"no recording for prompt {key[:12]}")
+            call = recorded[self._positions[key] % len(recorded)]
+            self._positions[key] += 1
+        delay = call["latency"] * self.latency_scale
+        if delay > 0:
+            time.sleep(delay)
+        if "error" in call:
+            raise ModelError(f"recorded model error: {call['error']}")
+        return call["response"]
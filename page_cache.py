@@ -0,0 +1,140 @@
+"""
+In-memory cache of rendered pages.
+
+Pages such as welcome.html and loa_intro.html are the same for every
+participant apart from a couple of small values (the LOA level picks one
+of four variants; the step number goes into the progress bar). PageCache
+renders each variant once, with placeholders in place of those values,
+and serves later requests by joining the cached pieces with the values:
+
+    cache = PageCache(flask_app)
+    return cache.respond('loa_intro.html', key=loa,
+                         context={'loa': loa, 'loa_info': LOA_DESCRIPTIONS[loa]},
+                         substitutions={'step': step, 'progress': step / 4 * 100})
+
+Responses carry an ETag (the variant's content hash plus the substituted
+values) and answer If-None-Match with 304. A variant is rendered again
+when its template file changes on disk, checked at most once every
+`check_interval` seconds.
+
+Rendering happens on first use, inside a request, so url_for() and the
+other context processors behave exactly as with render_template.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from typing import Dict, Hashable, List, Mapping, NamedTuple, Optional, Tuple
+
+from flask import Response, render_template, request
+from markupsafe import escape
+
+
+_PLACEHOLDER = "\x00{}\x00"
+
+
+class CachedPage(NamedTuple):
+    parts: List[str]  # literal text, alternating with substitution names
+    etag: str
+    mtime: float
+
+
+class PageCache:
+    """
+    Args:
+        flask_app: App whose templates are cached (registered as
+            flask_app.extensions["page_cache"])
+        check_interval: Seconds between template modification checks
+    """
+
+    def __init__(self, flask_app, check_interval: float = 1.0):
+        self.app = flask_app
+        self.check_interval = check_interval
+        self._pages: Dict[Tuple[str, Hashable], CachedPage] = {}
+        self._mtimes: Dict[str, Tuple[float, float]] = {}  # template -> (mtime, checked at)
+        self._lock = threading.Lock()
+        self.renders = 0
+        self.hits = 0
+        flask_app.extensions["page_cache"] = self
+
+    def _template_mtime(self, name: str) -> float:
+        """Modification time of a template file, re-read at most every check_interval."""
+        now = time.monotonic()
+        cached = self._mtimes.get(name)
+        if cached is not None and now - cached[1] < self.check_interval:
+            return cached[0]
+        _, filename, _ = self.app.jinja_env.loader.get_source(self.app.jinja_env, name)
+        try:
+            mtime = os.stat(filename).st_mtime if filename else 0.0
+        except OSError:
+            mtime = 0.0
+        if cached is not None and mtime != cached[0]:
+            self.app.jinja_env.cache.clear()  # recompile even without TEMPLATES_AUTO_RELOAD
+        self._mtimes[name] = (mtime, now)
+        return mtime
+
+    def _render(self, name: str, context: Mapping, names: List[str], mtime: float) -> CachedPage:
+        placeholders = {key: _PLACEHOLDER.format(key) for key in names}
+        body = render_template(name, **context, **placeholders)
+        parts: List[str] = []
+        rest = body
+        while True:
+            position, found = min(((rest.find(mark), key) for key, mark in placeholders.items()
+                                   if mark in rest), default=(-1, None))
+            if found is None:
+                parts.append(rest)
+                break
+            parts.extend((rest[:position], found))
+            rest = rest[position + len(placeholders[found]):]
+        etag = hashlib.sha1(body.encode("utf-8")).hexdigest()[:16]
+        self.renders += 1
+        return CachedPage(parts, etag, mtime)
+
+    def page(self, name: str, key: Hashable = None, context: Optional[Mapping] = None,
+             substitutions: Optional[Mapping] = None) -> CachedPage:
+        """
+        Cached variant `key` of template `name`, rendered now if missing or stale.
+
+        Args:
+            name: Template name
+            key: Identifies the variant; `context` must be the same for equal keys
+            context: Template variables that are fixed for this variant
+            substitutions: Names of the per-request values (only the keys are used)
+
+        Returns:
+            The CachedPage
+        """
+        mtime = self._template_mtime(name)
+        cache_key = (name, key)
+        cached = self._pages.get(cache_key)
+        if cached is not None and cached.mtime == mtime:
+            self.hits += 1
+            return cached
+        with self._lock:
+            cached = self._pages.get(cache_key)
+            if cached is None or cached.mtime != mtime:
+                cached = self._render(name, context or {}, list(substitutions or ()), mtime)
+                self._pages[cache_key] = cached
+            return cached
+
+    def respond(self, name: str, key: Hashable = None, context: Optional[Mapping] = None,
+                substitutions: Optional[Mapping] = None) -> Response:
+        """HTML response for a cached page with `substitutions` filled in; 304 when the ETag matches."""
+        substitutions = substitutions or {}
+        cached = self.page(name, key, context, substitutions)
+        # Escaped as the template would have escaped them
+        values = {key: str(escape(value)) for key, value in substitutions.items()}
+        body = "".join(values[part] if i % 2 else part for i, part in enumerate(cached.parts))
+        etag = cached.etag
+        if values:
+            etag += "-" + "-".join(values[key] for key in sorted(values))
+        response = Response(body, mimetype="text/html")
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"  # revalidate: the step changes between visits
+        return response.make_conditional(request)
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+            self._mtimes.clear()
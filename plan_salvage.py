@@ -0,0 +1,74 @@
+"""
+Tolerant parsing of LOA3 model responses.
+
+Models occasionally wrap their JSON in Markdown fences or prose, leave
+trailing commas, or stop mid-object when a response is truncated. Rather
+than discard such a response, parse_plan_json recovers every complete step
+object from the "steps" array; app.py then keeps the longest valid prefix
+of steps and only asks the model for the rest.
+"""
+
+import json
+import re
+from typing import Dict, List, Tuple
+
+
+_FENCE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.IGNORECASE)
+_TRAILING_COMMA = re.compile(r",(\s*[\]}])")
+_STEPS_KEY = re.compile(r'"steps"\s*:\s*\[')
+
+_decoder = json.JSONDecoder()
+
+
+def _stream_objects(text: str, pos: int) -> List[Dict]:
+    """Decode consecutive JSON objects from an array body starting at `pos`, stopping at the first broken one."""
+    objects = []
+    length = len(text)
+    while pos < length:
+        while pos < length and text[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= length or text[pos] != "{":
+            break
+        try:
+            obj, pos = _decoder.raw_decode(text, pos)
+        except json.JSONDecodeError:
+            break
+        if isinstance(obj, dict):
+            objects.append(obj)
+    return objects
+
+
+def parse_plan_json(text: str) -> Tuple[Dict, bool]:
+    """
+    Parse a model response into a plan dict.
+
+    Args:
+        text: Raw response text
+
+    Returns:
+        (data, repaired) where repaired is True if the text was not valid
+        JSON as-is. A repaired plan holds only the complete step objects.
+
+    Raises:
+        json.JSONDecodeError: if no plan could be recovered
+    """
+    try:
+        return json.loads(text), False
+    except json.JSONDecodeError as error:
+        original_error = error
+
+    cleaned = _TRAILING_COMMA.sub(r"\1", _FENCE.sub("", text or ""))
+    start = cleaned.find("{")
+    if start >= 0:
+        try:
+            data, _ = _decoder.raw_decode(cleaned, start)
+            return data, True
+        except json.JSONDecodeError:
+            pass
+
+    match = _STEPS_KEY.search(cleaned)
+    if match:
+        steps = _stream_objects(cleaned, match.end())
+        if steps:
+            return {"steps": steps}, True
+    raise original_error
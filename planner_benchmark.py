@@ -0,0 +1,271 @@
+"""
+Benchmark and quality suite for the LOA3 step planner.
+
+Drives app._plan_steps for every puzzle, both AI conditions (correct and
+faulty) and a fresh plan as well as a mid-puzzle retry, against a
+deterministic StubBackend (or a cassette recorded with model_cassettes).
+Reports attempts per plan, a histogram of reject reasons and model errors,
+steps salvaged from rejected plans, the fallback rate, prompt size and wall
+time per plan. Results are saved as
+JSON together with a hash of the prompt template so that runs before and
+after a prompt change can be compared.
+
+Usage:
+    python planner_benchmark.py [--scenario noisy] [--repeats 3] [--seed 0]
+                                [--latency-scale 1.0] [--retry-delay 0]
+                                [--output data/benchmarks/planner/planner-noisy.json]
+                                [--compare baseline.json]
+    python planner_benchmark.py --replay data/cassettes/loa3.jsonl.gz [--latency-scale 0.5]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+import app as app_module
+from circuit_breaker import CircuitBreaker
+from loa3_prompt import PromptBuilder
+from model_backends import StubBackend
+from model_cassettes import CassetteStore, RecordingBackend, ReplayBackend
+
+
+# Stub configurations; latencies are in seconds before --latency-scale
+SCENARIOS = {
+    "clean": {},
+    "noisy": {
+        "defect_rates": {
+            "premature_full_sequence": 0.10,
+            "final_sequence_mismatch": 0.10,
+            "json_decode_error": 0.05,
+            "fenced_json": 0.05,
+            "incorrect_number_of_steps": 0.05,
+            "final_step_missing_flag": 0.03,
+        },
+    },
+    "flaky": {
+        "error_rate": 0.10,
+        "defect_rates": {"final_sequence_mismatch": 0.15, "json_decode_error": 0.05},
+        "latency": ("lognormal", 0.8, 0.6),
+    },
+    "slow": {
+        "latency": ("lognormal", 2.0, 0.9),
+    },
+}
+
+START_STEPS = (1, 3)  # a fresh plan and a retry from step 3
+DEGRADATIONS = ("breaker_open", "deadline", "model_error")  # why a plan fell back (see app._plan_steps)
+MARKERS = ("fallback", "hedge", "hedge_win", "json_repaired", "salvage", "coalesced") + DEGRADATIONS  # not model responses
+DEFAULT_OUTPUT_DIR = os.path.join("data", "benchmarks", "planner")  # beside the committed micro-baseline
+
+
+def make_backend(scenario: str, seed: int = 0, latency_scale: float = 1.0) -> StubBackend:
+    """Build the StubBackend for a named scenario."""
+    config = dict(SCENARIOS[scenario])
+    latency = config.pop("latency", 0.0)
+    if isinstance(latency, tuple):
+        _, median, sigma = latency
+        mu = float(np.log(median))
+        config["latency"] = lambda rng: rng.lognormvariate(mu, sigma) * latency_scale
+    else:
+        config["latency"] = latency * latency_scale
+    return StubBackend(seed=seed, **config)
+
+
+def prompt_hash() -> str:
+    """Hash of the LOA3 prompt template, to tell prompt revisions apart."""
+    placeholder = {"prompt": "<puzzle>"}
+    builder = PromptBuilder(app_module.LOA3_TOTAL_STEPS, app_module.LOA3_PLAN_EXAMPLE)
+    text = "".join(
+        builder.build(placeholder, [], start, "<final>", faulty).text
+        for start in START_STEPS for faulty in (False, True)
+    )
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+async def _run_plans(puzzles: List[Dict], repeats: int, start_steps: Sequence[int]) -> List[Dict]:
+    rows = []
+    for repeat in range(repeats):
+        for puzzle in puzzles:
+            for is_faulty in (False, True):
+                expected = app_module._get_expected_final_sequence(puzzle, is_faulty)
+                accepted = app_module._plan_steps_fallback(puzzle, [], 1, expected, is_faulty)
+                for start_step in start_steps:
+                    loa3_state = {"is_faulty": is_faulty, "all_steps": accepted}
+                    prompt = app_module._experiment().prompt_builder.build(
+                        puzzle, accepted[:start_step - 1], start_step, expected, is_faulty)
+                    trace: List[str] = []
+                    started = time.perf_counter()
+                    await app_module._plan_steps(puzzle, loa3_state, start_step, trace=trace)
+                    rows.append({
+                        "repeat": repeat,
+                        "puzzle_id": puzzle["puzzle_id"],
+                        "is_faulty": is_faulty,
+                        "start_step": start_step,
+                        "attempts": sum(1 for outcome in trace if outcome not in MARKERS),
+                        "outcomes": trace,
+                        "fallback": "fallback" in trace,
+                        "prompt_tokens": prompt.tokens,
+                        "wall_time": time.perf_counter() - started,
+                    })
+    return rows
+
+
+def run_benchmark(backend, repeats: int = 1, start_steps: Sequence[int] = START_STEPS,
+                  retry_delay: float = 0.0, breaker: Optional[CircuitBreaker] = None) -> List[Dict]:
+    """
+    Plan every puzzle/condition/start step `repeats` times and return one row per plan.
+
+    Without `breaker` the circuit breaker never opens, so every plan reaches
+    the model and the report measures the planner itself.
+    """
+    saved_delay = app_module.LOA3_RETRY_DELAY_SECONDS
+    app_module.LOA3_RETRY_DELAY_SECONDS = retry_delay
+    try:
+        with tempfile.TemporaryDirectory() as data_dir:
+            flask_app = app_module.create_app(
+                data_dir=data_dir, model_backend=backend,
+                circuit_breaker=breaker or CircuitBreaker(min_calls=sys.maxsize))
+            flask_app.logger.setLevel(logging.ERROR)  # rejected plans are expected here
+            with flask_app.app_context():
+                puzzles = flask_app.extensions["experiment"].puzzle_data["puzzles"]
+                return asyncio.run(_run_plans(puzzles, repeats, start_steps))
+    finally:
+        app_module.LOA3_RETRY_DELAY_SECONDS = saved_delay
+
+
+def summarize(rows: List[Dict]) -> Dict:
+    """Aggregate per-plan rows into the benchmark report."""
+    if not rows:
+        return {"plans": 0}
+    attempts = np.array([row["attempts"] for row in rows])
+    prompt_tokens = np.array([row["prompt_tokens"] for row in rows])
+    wall = np.array([row["wall_time"] for row in rows])
+    reasons = Counter(outcome for row in rows for outcome in row["outcomes"]
+                      if outcome != "ok" and outcome not in MARKERS)
+    hedges = sum(row["outcomes"].count("hedge") for row in rows)
+    hedge_wins = sum(row["outcomes"].count("hedge_win") for row in rows)
+    salvaged = sum(row["outcomes"].count("salvage") for row in rows)
+    repaired = sum(row["outcomes"].count("json_repaired") for row in rows)
+    return {
+        "plans": len(rows),
+        "attempts_mean": float(attempts.mean()),
+        "attempts_p95": float(np.percentile(attempts, 95)),
+        "attempts_histogram": {str(k): int(v) for k, v in sorted(Counter(attempts.tolist()).items())},
+        "first_attempt_success_rate": float(np.mean([row["outcomes"][:1] == ["ok"] for row in rows])),
+        "fallback_rate": float(np.mean([row["fallback"] for row in rows])),
+        "degraded": {reason: sum(reason in row["outcomes"] for row in rows) for reason in DEGRADATIONS},
+        "hedges": hedges,
+        "hedge_wins": hedge_wins,
+        "salvaged_steps": salvaged,
+        "json_repaired": repaired,
+        "prompt_tokens_mean": float(prompt_tokens.mean()),
+        "prompt_tokens_max": int(prompt_tokens.max()),
+        "reject_reasons": dict(reasons.most_common()),
+        "wall_time": {
+            "mean": float(wall.mean()),
+            "p50": float(np.percentile(wall, 50)),
+            "p95": float(np.percentile(wall, 95)),
+            "max": float(wall.max()),
+        },
+    }
+
+
+def compare(current: Dict, baseline: Dict) -> List[str]:
+    """Lines describing how `current` differs from `baseline` (both saved reports)."""
+    now, then = current["summary"], baseline["summary"]
+    lines = []
+    if current["meta"].get("prompt_hash") != baseline["meta"].get("prompt_hash"):
+        lines.append(f"prompt template changed: {baseline['meta'].get('prompt_hash')} -> {current['meta']['prompt_hash']}")
+    for key in ("attempts_mean", "attempts_p95", "first_attempt_success_rate", "fallback_rate",
+                "prompt_tokens_mean"):
+        lines.append(f"{key:>28}: {then.get(key, 0):8.3f} -> {now.get(key, 0):8.3f}")
+    for key in ("p50", "p95"):
+        lines.append(f"{'wall_time_' + key:>28}: {then['wall_time'][key]:8.3f} -> {now['wall_time'][key]:8.3f} s")
+    for reason in sorted(set(now["reject_reasons"]) | set(then["reject_reasons"])):
+        lines.append(f"{reason:>28}: {then['reject_reasons'].get(reason, 0):8d} -> {now['reject_reasons'].get(reason, 0):8d}")
+    return lines
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the LOA3 planner against a stub model")
+    parser.add_argument("--scenario", default="noisy", choices=sorted(SCENARIOS))
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency-scale", type=float, default=1.0)
+    parser.add_argument("--retry-delay", type=float, default=0.0,
+                        help="Seconds between model attempts (the app uses %s)" % app_module.LOA3_RETRY_DELAY_SECONDS)
+    parser.add_argument("--breaker", action="store_true",
+                        help="Use the app's circuit breaker (default: never open)")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--compare", default=None, help="Saved report to compare against")
+    parser.add_argument("--record", default=None, metavar="CASSETTE", help="Record the stub's traffic to a cassette")
+    parser.add_argument("--replay", default=None, metavar="CASSETTE",
+                        help="Replay a recorded cassette instead of the stub scenario")
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        backend = ReplayBackend(CassetteStore(args.replay), latency_scale=args.latency_scale)
+        args.scenario = "replay"
+    else:
+        backend = make_backend(args.scenario, args.seed, args.latency_scale)
+        if args.record:
+            backend = RecordingBackend(backend, CassetteStore(args.record))
+    rows = run_benchmark(backend, args.repeats, retry_delay=args.retry_delay,
+                         breaker=CircuitBreaker() if args.breaker else None)
+    report = {
+        "meta": {
+            "scenario": args.scenario,
+            "seed": args.seed,
+            "repeats": args.repeats,
+            "latency_scale": args.latency_scale,
+            "retry_delay": args.retry_delay,
+            "breaker": args.breaker,
+            "cassette": args.replay,
+            "prompt_hash": prompt_hash(),
+            "created_at": datetime.now().isoformat(),
+        },
+        "summary": summarize(rows),
+        "plans": rows,
+    }
+
+    output = args.output or os.path.join(DEFAULT_OUTPUT_DIR, f"planner-{args.scenario}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    summary = report["summary"]
+    print(f"Scenario '{args.scenario}': {summary['plans']} plans, prompt {report['meta']['prompt_hash']}")
+    print(f"  attempts/plan: mean {summary['attempts_mean']:.2f}, p95 {summary['attempts_p95']:.0f}")
+    print(f"  prompt tokens/plan: mean {summary['prompt_tokens_mean']:.0f}, max {summary['prompt_tokens_max']}")
+    print(f"  fallback rate: {summary['fallback_rate']:.1%} "
+          f"({', '.join(f'{reason} {count}' for reason, count in summary['degraded'].items())})")
+    print(f"  hedges: {summary['hedges']} launched, {summary['hedge_wins']} won")
+    print(f"  salvage: {summary['salvaged_steps']} steps kept from rejected plans, "
+          f"{summary['json_repaired']} responses repaired")
+    print(f"  wall time/plan: p50 {summary['wall_time']['p50']:.3f}s, p95 {summary['wall_time']['p95']:.3f}s")
+    for reason, count in summary["reject_reasons"].items():
+        print(f"  {reason:>28}: {count}")
+    print(f"Saved to {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print("\nCompared with", args.compare)
+        for line in compare(report, baseline):
+            print(" ", line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
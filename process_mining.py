@@ -0,0 +1,354 @@
+"""
+Process-mining helpers for the HTI behavioural logs.
+
+The `action_sequence` column of results.csv and the logged interaction
+events are encoded once into flat integer arrays (one entry per
+event plus a trial index), so transition matrices, n-gram frequencies,
+dwell times and per-LOA Markov models are computed with NumPy over all
+trials at once instead of looping over rows.
+
+Usage:
+    python process_mining.py [data/results.csv] [data/interactions]
+"""
+
+import csv
+import json
+import os
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from event_codec import EVENT_CODES, EVENT_TYPES, OTHER_CODE
+from interaction_store import InteractionStore
+
+NUM_EVENT_TYPES = len(EVENT_TYPES)
+LOA_LEVELS = (1, 2, 3, 4)
+
+
+class EventLog:
+    """
+    Flat, array-backed view of many trials' event sequences.
+
+    Attributes:
+        codes: int8 event code per event
+        trial: int32 trial index per event (events are grouped by trial)
+        trial_loa: int8 LOA level per trial (0 when unknown)
+        trial_keys: list of (participant_id, puzzle_id) per trial, if known
+        timestamps: float64 seconds since epoch per event, or None
+    """
+
+    __slots__ = ("codes", "trial", "trial_loa", "trial_keys", "timestamps")
+
+    def __init__(self, codes, trial, trial_loa, trial_keys=None, timestamps=None):
+        self.codes = codes
+        self.trial = trial
+        self.trial_loa = trial_loa
+        self.trial_keys = trial_keys or []
+        self.timestamps = timestamps
+
+    @property
+    def num_events(self) -> int:
+        return int(self.codes.size)
+
+    @property
+    def num_trials(self) -> int:
+        return int(self.trial_loa.size)
+
+    def event_loa(self) -> np.ndarray:
+        """LOA level of every event, broadcast from its trial."""
+        return self.trial_loa[self.trial]
+
+
+def _codes_for(names: List[str]) -> np.ndarray:
+    """Map a flat list of event names to int8 codes."""
+    lookup = EVENT_CODES.get
+    return np.array([lookup(name, OTHER_CODE) for name in names], dtype=np.int8)
+
+
+def encode_action_sequences(sequences: Iterable, loa_levels: Optional[Iterable] = None,
+                            trial_keys: Optional[List[Tuple]] = None) -> EventLog:
+    """
+    Encode results.csv `action_sequence` values into an EventLog.
+
+    Args:
+        sequences: JSON strings (as stored in the CSV) or already-parsed lists
+        loa_levels: LOA level for each sequence (optional)
+        trial_keys: (participant_id, puzzle_id) for each sequence (optional)
+
+    Returns:
+        EventLog without timestamps
+    """
+    raw = [seq if isinstance(seq, str) else json.dumps(list(seq or [])) for seq in sequences]
+    # One json.loads over the whole column instead of one call per row
+    parsed = json.loads("[" + ",".join(s.strip() or "[]" for s in raw) + "]") if raw else []
+
+    lengths = np.fromiter((len(p) for p in parsed), dtype=np.int64, count=len(parsed))
+    names = [name for seq in parsed for name in seq]
+    codes = _codes_for(names)
+    trial = np.repeat(np.arange(len(parsed), dtype=np.int32), lengths)
+
+    if loa_levels is None:
+        trial_loa = np.zeros(len(parsed), dtype=np.int8)
+    else:
+        trial_loa = np.asarray(list(loa_levels), dtype=np.int8)
+
+    return EventLog(codes, trial, trial_loa, trial_keys)
+
+
+def encode_interactions(interactions: List[Dict], loa_by_trial: Optional[Dict[Tuple, int]] = None) -> EventLog:
+    """
+    Encode interactions.json entries into an EventLog with timestamps.
+
+    Events are grouped into trials by (participant_id, puzzle_id) and
+    ordered by timestamp within each trial.
+
+    Args:
+        interactions: Entries as written by DataLogger.log_interaction
+        loa_by_trial: Optional {(participant_id, puzzle_id): loa_level}
+
+    Returns:
+        EventLog with `timestamps` in seconds
+    """
+    n = len(interactions)
+    if n == 0:
+        empty = np.zeros(0, dtype=np.int32)
+        return EventLog(np.zeros(0, dtype=np.int8), empty, np.zeros(0, dtype=np.int8), [], np.zeros(0))
+
+    participants = np.asarray([str(i.get("participant_id", "")) for i in interactions], dtype=object).astype(str)
+    puzzles = np.asarray([int(i.get("puzzle_id") or 0) for i in interactions], dtype=np.int64)
+    times = np.asarray([i.get("timestamp") or "NaT" for i in interactions], dtype="datetime64[us]")
+    codes = _codes_for([i.get("interaction_type") or "" for i in interactions])
+
+    participant_ids, participant_idx = np.unique(participants, return_inverse=True)
+    order = np.lexsort((times, puzzles, participant_idx))
+    participant_idx, puzzles, times, codes = participant_idx[order], puzzles[order], times[order], codes[order]
+
+    new_trial = np.ones(n, dtype=bool)
+    new_trial[1:] = (participant_idx[1:] != participant_idx[:-1]) | (puzzles[1:] != puzzles[:-1])
+    trial = (np.cumsum(new_trial) - 1).astype(np.int32)
+    starts = np.flatnonzero(new_trial)
+
+    trial_keys = [(str(participant_ids[participant_idx[s]]), int(puzzles[s])) for s in starts]
+    loa_by_trial = loa_by_trial or {}
+    trial_loa = np.asarray([loa_by_trial.get(key, 0) for key in trial_keys], dtype=np.int8)
+
+    seconds = times.astype("datetime64[us]").astype(np.int64) / 1e6
+    seconds[np.isnat(times)] = np.nan
+
+    return EventLog(codes, trial, trial_loa, trial_keys, seconds)
+
+
+def _pair_mask(log: EventLog, gap: int = 1) -> np.ndarray:
+    """Boolean mask over event i selecting windows [i, i+gap] inside one trial."""
+    if log.num_events <= gap:
+        return np.zeros(0, dtype=bool)
+    return log.trial[gap:] == log.trial[:-gap]
+
+
+def transition_matrix(log: EventLog, normalize: bool = True) -> np.ndarray:
+    """
+    Count (or row-normalise) transitions between consecutive events.
+
+    Returns:
+        (NUM_EVENT_TYPES, NUM_EVENT_TYPES) array indexed [from, to]
+    """
+    mask = _pair_mask(log)
+    src = log.codes[:-1][mask].astype(np.int64)
+    dst = log.codes[1:][mask].astype(np.int64)
+    counts = np.bincount(src * NUM_EVENT_TYPES + dst, minlength=NUM_EVENT_TYPES ** 2)
+    counts = counts.reshape(NUM_EVENT_TYPES, NUM_EVENT_TYPES).astype(np.float64)
+    return _row_normalize(counts) if normalize else counts
+
+
+def _row_normalize(counts: np.ndarray) -> np.ndarray:
+    totals = counts.sum(axis=-1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(totals > 0, counts / totals, 0.0)
+
+
+def ngram_counts(log: EventLog, n: int = 2, top: Optional[int] = None) -> List[Tuple[Tuple[str, ...], int]]:
+    """
+    Frequency of every event n-gram that stays inside a single trial.
+
+    Args:
+        log: Encoded events
+        n: n-gram length (>= 1)
+        top: Only return the `top` most frequent n-grams
+
+    Returns:
+        List of (n-gram names, count), most frequent first
+    """
+    if n < 1:
+        raise ValueError("n must be >= 1")
+    if log.num_events < n:
+        return []
+
+    windows = log.num_events - n + 1
+    valid = log.trial[n - 1:] == log.trial[:windows]
+    packed = np.zeros(windows, dtype=np.int64)
+    for offset in range(n):
+        packed = packed * NUM_EVENT_TYPES + log.codes[offset:offset + windows]
+    packed = packed[valid]
+
+    grams, counts = np.unique(packed, return_counts=True)
+    order = np.argsort(-counts, kind="stable")
+    if top is not None:
+        order = order[:top]
+
+    result = []
+    for idx in order:
+        value = int(grams[idx])
+        names = []
+        for _ in range(n):
+            value, code = divmod(value, NUM_EVENT_TYPES)
+            names.append(EVENT_TYPES[code])
+        result.append((tuple(reversed(names)), int(counts[idx])))
+    return result
+
+
+def dwell_times(log: EventLog) -> Dict[str, np.ndarray]:
+    """
+    Seconds spent after each event before the next one in the same trial.
+
+    Returns:
+        {event_type: array of dwell times in seconds}
+    """
+    if log.timestamps is None:
+        raise ValueError("Dwell times need an EventLog built from timestamped interactions")
+    mask = _pair_mask(log)
+    gaps = np.diff(log.timestamps)[mask] if log.num_events > 1 else np.zeros(0)
+    src = log.codes[:-1][mask] if log.num_events > 1 else np.zeros(0, dtype=np.int8)
+    keep = np.isfinite(gaps)
+    gaps, src = gaps[keep], src[keep]
+
+    order = np.argsort(src, kind="stable")
+    gaps, src = gaps[order], src[order]
+    bounds = np.searchsorted(src, np.arange(NUM_EVENT_TYPES + 1))
+    return {
+        EVENT_TYPES[code]: gaps[bounds[code]:bounds[code + 1]]
+        for code in range(NUM_EVENT_TYPES)
+        if bounds[code + 1] > bounds[code]
+    }
+
+
+def dwell_time_summary(log: EventLog, percentiles=(50, 90, 99)) -> Dict[str, Dict[str, float]]:
+    """Count, mean and percentiles of dwell time per event type."""
+    summary = {}
+    for name, values in dwell_times(log).items():
+        stats = {"count": int(values.size), "mean": float(values.mean())}
+        for p, v in zip(percentiles, np.percentile(values, percentiles)):
+            stats[f"p{p}"] = float(v)
+        summary[name] = stats
+    return summary
+
+
+def markov_models_by_loa(log: EventLog) -> Dict[int, Dict[str, np.ndarray]]:
+    """
+    First-order Markov model per LOA level, fitted in one bincount.
+
+    Returns:
+        {loa: {"initial": start-state probabilities, "transitions": row-stochastic matrix,
+               "counts": raw transition counts}}
+    """
+    k = NUM_EVENT_TYPES
+    num_loa = len(LOA_LEVELS) + 1  # index 0 collects trials with unknown LOA
+
+    mask = _pair_mask(log)
+    loa = log.event_loa().astype(np.int64)
+    if log.num_events > 1:
+        keys = loa[:-1][mask] * k * k + log.codes[:-1][mask].astype(np.int64) * k + log.codes[1:][mask]
+    else:
+        keys = np.zeros(0, dtype=np.int64)
+    counts = np.bincount(keys, minlength=num_loa * k * k).reshape(num_loa, k, k).astype(np.float64)
+
+    first = np.ones(log.num_events, dtype=bool)
+    first[1:] = log.trial[1:] != log.trial[:-1]
+    initial = np.bincount(loa[first] * k + log.codes[first], minlength=num_loa * k).reshape(num_loa, k)
+    initial = _row_normalize(initial.astype(np.float64))
+
+    transitions = _row_normalize(counts)
+    return {
+        level: {"initial": initial[level], "transitions": transitions[level], "counts": counts[level]}
+        for level in LOA_LEVELS
+    }
+
+
+def load_results_log(results_file: str = "data/results.csv") -> EventLog:
+    """Read only the columns needed for process mining from results.csv."""
+    sequences, loas, keys = [], [], []
+    with open(results_file, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            sequences.append(row.get("action_sequence") or "[]")
+            try:
+                loas.append(int(row.get("loa_level") or 0))
+            except ValueError:
+                loas.append(0)
+            keys.append((row.get("participant_id", ""), row.get("puzzle_id", "")))
+    return encode_action_sequences(sequences, loas, keys)
+
+
+def load_interactions_log(interactions_path: str = "data/interactions",
+                          results_file: Optional[str] = "data/results.csv") -> EventLog:
+    """
+    Encode logged interactions, tagging each trial with its LOA from results.csv.
+
+    `interactions_path` is an InteractionStore directory or a legacy
+    single-array interactions.json file.
+    """
+    if os.path.isdir(interactions_path):
+        interactions = list(InteractionStore(interactions_path, readonly=True).iter_events())
+    else:
+        with open(interactions_path, "r", encoding="utf-8") as f:
+            interactions = json.load(f)
+
+    loa_by_trial = {}
+    if results_file and os.path.exists(results_file):
+        with open(results_file, "r", encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                try:
+                    loa_by_trial[(row["participant_id"], int(row["puzzle_id"]))] = int(row["loa_level"])
+                except (KeyError, ValueError, TypeError):
+                    continue
+    return encode_interactions(interactions, loa_by_trial)
+
+
+def _print_matrix(matrix: np.ndarray):
+    short = [name[:10] for name in EVENT_TYPES]
+    print(" " * 20 + " ".join(f"{s:>10}" for s in short))
+    for name, row in zip(EVENT_TYPES, matrix):
+        if row.any():
+            print(f"{name:>20}" + " ".join(f"{v:10.2f}" for v in row))
+
+
+def main(argv: List[str]) -> int:
+    results_file = argv[1] if len(argv) > 1 else "data/results.csv"
+    interactions_file = argv[2] if len(argv) > 2 else "data/interactions"
+
+    log = load_results_log(results_file)
+    print("=" * 60)
+    print("PROCESS MINING - ACTION SEQUENCES")
+    print("=" * 60)
+    print(f"Trials: {log.num_trials}  Events: {log.num_events}")
+
+    for level, model in markov_models_by_loa(log).items():
+        if model["counts"].sum() == 0:
+            continue
+        print(f"\nLOA {level} transition probabilities:")
+        _print_matrix(model["transitions"])
+
+    print("\nTop trigrams:")
+    for gram, count in ngram_counts(log, 3, top=10):
+        print(f"  {count:6d}  {' -> '.join(gram)}")
+
+    if os.path.exists(interactions_file):
+        timed = load_interactions_log(interactions_file, results_file)
+        print("\nDwell time after each event (seconds):")
+        for name, stats in dwell_time_summary(timed).items():
+            print(f"  {name:>20}: n={stats['count']:6d} median={stats['p50']:8.2f} p90={stats['p90']:8.2f}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,290 @@
+"""
+On-demand request profiling.
+
+RequestProfiler captures cProfile stats and a tracemalloc allocation diff
+for selected requests:
+
+    - a random `sample_rate` fraction of all requests,
+    - every request to one of `routes` (e.g. /loa3/step), or
+    - any request carrying the X-Profile header from an admin.
+
+Each capture is written to the profile directory as <name>.prof (pstats)
+and <name>.json (request metadata and the top allocation sites). Only the
+newest `max_profiles` captures are kept.
+
+tracemalloc traces the whole process, so a diff taken while another
+request runs includes that request's allocations too. Only one capture at
+a time records allocations; a capture that overlaps it gets cProfile
+stats only, with "allocations": null, and is left out of the allocation
+totals.
+
+The profiler runs around the view function itself, in the thread that
+executes it, so async views (which Flask runs on their own event loop
+thread) are covered too. Work handed to asyncio.to_thread, such as model
+calls, shows up as time spent waiting, not as its own frames.
+
+Aggregate captures with:
+    python request_profiler.py [data/profiles] [--top 20] [--route /loa3/step]
+"""
+
+import argparse
+import cProfile
+import functools
+import glob
+import inspect
+import json
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence
+
+from flask import g, request
+
+
+PROFILE_HEADER = "X-Profile"
+DEFAULT_MAX_PROFILES = 200
+TOP_ALLOCATIONS = 25
+_SNAPSHOT_FILTERS = (tracemalloc.Filter(False, tracemalloc.__file__),)
+
+
+class RequestProfiler:
+    """
+    Args:
+        directory: Where captures are written
+        sample_rate: Fraction of requests profiled at random (0..1)
+        routes: Request paths that are always profiled; a trailing '*'
+            matches a prefix (e.g. '/admin/*')
+        max_profiles: Captures kept before the oldest are deleted
+        authorize: Callable deciding whether a request may ask for a
+            profile with the X-Profile header (e.g. an admin check)
+    """
+
+    def __init__(self, directory: str, sample_rate: float = 0.0, routes: Sequence[str] = (),
+                 max_profiles: int = DEFAULT_MAX_PROFILES, authorize: Optional[Callable[[], bool]] = None):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.routes = [route.strip() for route in routes if route.strip()]
+        self.max_profiles = max_profiles
+        self.authorize = authorize
+        self._lock = threading.Lock()
+        self._allocation_lock = threading.Lock()  # held by the one capture using tracemalloc
+        self._started_tracing = False
+        self.captured = 0
+
+    @classmethod
+    def from_env(cls, data_dir: str, authorize: Optional[Callable[[], bool]] = None) -> "RequestProfiler":
+        """Configure from PROFILE_SAMPLE_RATE, PROFILE_ROUTES (comma-separated) and PROFILE_DIR."""
+        return cls(
+            os.getenv("PROFILE_DIR", os.path.join(data_dir, "profiles")),
+            sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0") or 0),
+            routes=os.getenv("PROFILE_ROUTES", "").split(","),
+            max_profiles=int(os.getenv("PROFILE_MAX_FILES", DEFAULT_MAX_PROFILES)),
+            authorize=authorize,
+        )
+
+    # ------------------------------------------------------------------ selection
+
+    def _route_selected(self, path: str) -> bool:
+        for route in self.routes:
+            if route.endswith("*") and path.startswith(route[:-1]):
+                return True
+            if path == route:
+                return True
+        return False
+
+    def should_profile(self) -> bool:
+        if self._route_selected(request.path):
+            return True
+        if request.headers.get(PROFILE_HEADER) and (self.authorize is None or self.authorize()):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    # ------------------------------------------------------------------ hooks
+
+    def init_app(self, flask_app):
+        """Register the request hooks and wrap every view registered so far."""
+        flask_app.extensions["request_profiler"] = self
+        flask_app.before_request(self._before_request)
+        flask_app.after_request(self._after_request)
+        flask_app.teardown_request(self._teardown_request)
+        for endpoint, view in list(flask_app.view_functions.items()):
+            flask_app.view_functions[endpoint] = self._wrap_view(view)
+
+    def _wrap_view(self, view):
+        if inspect.iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def profiled_async(*args, **kwargs):
+                profile = g.get("request_profile")
+                if profile is None:
+                    return await view(*args, **kwargs)
+                profile.enable()
+                try:
+                    return await view(*args, **kwargs)
+                finally:
+                    profile.disable()
+            return profiled_async
+
+        @functools.wraps(view)
+        def profiled(*args, **kwargs):
+            profile = g.get("request_profile")
+            if profile is None:
+                return view(*args, **kwargs)
+            profile.enable()
+            try:
+                return view(*args, **kwargs)
+            finally:
+                profile.disable()
+        return profiled
+
+    def _before_request(self):
+        if not self.should_profile():
+            return
+        g.request_profile = cProfile.Profile()
+        g.request_profile_snapshot = None
+        if self._allocation_lock.acquire(blocking=False):
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            g.request_profile_snapshot = tracemalloc.take_snapshot()
+        g.request_profile_started = time.perf_counter()
+
+    def _after_request(self, response):
+        profile = g.pop("request_profile", None)
+        if profile is None:
+            return response
+        duration = time.perf_counter() - g.pop("request_profile_started")
+        before = g.get("request_profile_snapshot")
+        after = tracemalloc.take_snapshot() if before is not None else None
+        self._release_allocations()
+        try:
+            self._write(profile, before, after, duration, response.status_code)
+        except OSError:
+            pass  # profiling must never break a request
+        return response
+
+    def _teardown_request(self, exc):
+        # after_request is skipped when a request fails before producing a response
+        self._release_allocations()
+
+    def _release_allocations(self):
+        if g.pop("request_profile_snapshot", None) is None:
+            return
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        self._allocation_lock.release()
+
+    # ------------------------------------------------------------------ output
+
+    def _write(self, profile: cProfile.Profile, before, after, duration: float, status: int):
+        os.makedirs(self.directory, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", request.path).strip("_") or "root"
+        name = f"{datetime.now():%Y%m%d-%H%M%S-%f}-{slug}"
+        allocations = None if before is None else []
+        diff = [] if before is None else \
+            after.filter_traces(_SNAPSHOT_FILTERS).compare_to(before.filter_traces(_SNAPSHOT_FILTERS), "lineno")
+        for stat in diff[:TOP_ALLOCATIONS]:
+            if stat.size_diff <= 0:
+                continue
+            frame = stat.traceback[0]
+            allocations.append({
+                "site": f"{frame.filename}:{frame.lineno}",
+                "size_diff": stat.size_diff,
+                "count_diff": stat.count_diff,
+            })
+        meta = {
+            "path": request.path,
+            "method": request.method,
+            "endpoint": request.endpoint,
+            "status": status,
+            "duration": duration,
+            "captured_at": datetime.now().isoformat(),
+            "allocations": allocations,
+        }
+        profile.dump_stats(os.path.join(self.directory, name + ".prof"))
+        with open(os.path.join(self.directory, name + ".json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        with self._lock:
+            self.captured += 1
+            self._rotate()
+
+    def _rotate(self):
+        captures = sorted(glob.glob(os.path.join(self.directory, "*.json")))
+        for meta_file in captures[:max(len(captures) - self.max_profiles, 0)]:
+            for path in (meta_file, meta_file[:-len(".json")] + ".prof"):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+# ---------------------------------------------------------------------- CLI
+
+def load_captures(directory: str, route: Optional[str] = None) -> List[Dict]:
+    """Metadata of every capture in `directory` (optionally for one path), oldest first."""
+    captures = []
+    for meta_file in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        with open(meta_file, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if route and meta.get("path") != route:
+            continue
+        meta["profile"] = meta_file[:-len(".json")] + ".prof"
+        captures.append(meta)
+    return captures
+
+
+def aggregate_allocations(captures: List[Dict], top: int = 20) -> List[Dict]:
+    """Allocation sites summed over captures, largest first (captures without a diff are skipped)."""
+    sites: Dict[str, Dict] = defaultdict(lambda: {"size_diff": 0, "count_diff": 0, "requests": 0})
+    for capture in captures:
+        for allocation in capture.get("allocations") or []:
+            site = sites[allocation["site"]]
+            site["size_diff"] += allocation["size_diff"]
+            site["count_diff"] += allocation["count_diff"]
+            site["requests"] += 1
+    ranked = sorted(sites.items(), key=lambda item: item[1]["size_diff"], reverse=True)[:top]
+    return [{"site": site, **totals} for site, totals in ranked]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Aggregate captured request profiles")
+    parser.add_argument("directory", nargs="?", default=os.path.join("data", "profiles"))
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--route", default=None, help="Only captures for this request path")
+    args = parser.parse_args(argv)
+
+    captures = [c for c in load_captures(args.directory, args.route) if os.path.exists(c["profile"])]
+    if not captures:
+        print(f"No captures in {args.directory}")
+        return 1
+
+    by_path = defaultdict(list)
+    for capture in captures:
+        by_path[capture["path"]].append(capture["duration"])
+    print(f"{len(captures)} captured requests")
+    for path, durations in sorted(by_path.items()):
+        print(f"  {path}: {len(durations)} requests, mean {sum(durations) / len(durations) * 1000:.1f} ms, "
+              f"max {max(durations) * 1000:.1f} ms")
+
+    print(f"\nTop {args.top} functions by cumulative time")
+    stats = pstats.Stats(*[c["profile"] for c in captures], stream=sys.stdout)
+    stats.sort_stats("cumulative").print_stats(args.top)
+
+    print(f"Top {args.top} allocation sites (net bytes across requests)")
+    overlapped = sum(1 for c in captures if c.get("allocations") is None)
+    if overlapped:
+        print(f"  ({overlapped} capture(s) overlapped another and have no allocation diff)")
+    for site in aggregate_allocations(captures, args.top):
+        print(f"  {site['size_diff']:>10} B {site['count_diff']:>7} blocks {site['requests']:>4} req  {site['site']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
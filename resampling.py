@@ -0,0 +1,379 @@
+"""
+Vectorised bootstrap and permutation tests for the HTI results.
+
+Resamples are drawn as index matrices (one row per resample) in fixed-size
+batches, so grouped means/medians and their differences are evaluated with
+a handful of NumPy reductions per batch. Every batch has its own seed
+derived from the top-level seed, which keeps results identical whether the
+batches run in this process or are spread over a process pool.
+
+Usage:
+    python resampling.py [data/results.csv] [--resamples 10000] [--stat mean|median]
+                         [--workers N] [--seed 0] [--output data/resampling.csv]
+"""
+
+import argparse
+import csv
+import os
+import sys
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+PRODUCTIVITY_COLS = [f"productivity_Q{i}" for i in range(1, 5)]
+AWARENESS_COLS = [f"awareness_quiz_Q{i}" for i in range(1, 6)]
+PRE_TRUST_COLS = [f"pre_trust_Q{i}" for i in range(1, 6)]
+POST_TRUST_COLS = [f"post_trust_Q{i}" for i in range(1, 6)]
+PERFORMANCE_COLS = [
+    "completion_time",
+    "num_interactions",
+    "decision_latency",
+    "hints_used",
+    "edit_distance",
+    "final_correctness",
+    "accepted_advice",
+    "overridden",
+]
+COMPOSITE_COLS = [
+    "productivity_score",
+    "awareness_score",
+    "pre_trust_score",
+    "post_trust_score",
+    "trust_change",
+]
+DEFAULT_METRICS = (
+    PERFORMANCE_COLS + COMPOSITE_COLS
+    + PRODUCTIVITY_COLS + AWARENESS_COLS + PRE_TRUST_COLS + POST_TRUST_COLS
+)
+
+def _median(x: np.ndarray) -> np.ndarray:
+    """Median over the last axis; inputs are NaN-free so np.median's checks are skipped."""
+    n = x.shape[-1]
+    k = n // 2
+    if n % 2:
+        return np.partition(x, k, axis=-1)[..., k]
+    part = np.partition(x, [k - 1, k], axis=-1)
+    return (part[..., k - 1] + part[..., k]) / 2.0
+
+
+STATISTICS = {
+    "mean": lambda x: np.mean(x, axis=-1),
+    "median": _median,
+}
+DEFAULT_BATCH_SIZE = 1000
+
+
+def _to_float(value: str) -> float:
+    value = (value or "").strip()
+    if value.lower() == "true":
+        return 1.0
+    if value.lower() == "false":
+        return 0.0
+    try:
+        return float(value)
+    except ValueError:
+        return np.nan
+
+
+def _results_arrays(rows, metrics: Sequence[str]) -> Dict[str, np.ndarray]:
+    """Condition and metric arrays from rows of {column: value} (strings or numbers)."""
+    raw_cols = set(PERFORMANCE_COLS + PRODUCTIVITY_COLS + AWARENESS_COLS + PRE_TRUST_COLS + POST_TRUST_COLS)
+    columns: Dict[str, List[float]] = {col: [] for col in raw_cols}
+    loa, faulty = [], []
+
+    for row in rows:
+        level = _to_float(str(row.get("loa_level")))
+        loa.append(int(level) if np.isfinite(level) else 0)
+        faulty.append(_to_float(str(row.get("ai_faulty"))) == 1.0)
+        for col in raw_cols:
+            columns[col].append(_to_float(str(row.get(col))))
+
+    arrays = {col: np.asarray(values, dtype=np.float64) for col, values in columns.items()}
+    with warnings.catch_warnings():
+        # Rows without any trust answers (LOA 1) legitimately average to NaN
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        arrays["productivity_score"] = np.nanmean(np.vstack([arrays[c] for c in PRODUCTIVITY_COLS]), axis=0) if loa else np.zeros(0)
+        arrays["awareness_score"] = np.nansum(np.vstack([arrays[c] for c in AWARENESS_COLS]), axis=0) if loa else np.zeros(0)
+        arrays["pre_trust_score"] = np.nanmean(np.vstack([arrays[c] for c in PRE_TRUST_COLS]), axis=0) if loa else np.zeros(0)
+        arrays["post_trust_score"] = np.nanmean(np.vstack([arrays[c] for c in POST_TRUST_COLS]), axis=0) if loa else np.zeros(0)
+    arrays["trust_change"] = arrays["post_trust_score"] - arrays["pre_trust_score"]
+
+    result = {"loa_level": np.asarray(loa, dtype=np.int64), "ai_faulty": np.asarray(faulty, dtype=bool)}
+    for metric in metrics:
+        result[metric] = arrays[metric]
+    return result
+
+
+def load_results_arrays(results_file: str = "data/results.csv",
+                        metrics: Sequence[str] = DEFAULT_METRICS) -> Dict[str, np.ndarray]:
+    """
+    Load the condition columns and metric columns of results.csv as arrays.
+
+    Composite scores are derived the same way as in Final_Analysis.ipynb
+    (productivity/trust means, awareness sum, trust change).
+
+    Returns:
+        {"loa_level": int array, "ai_faulty": bool array, <metric>: float array, ...}
+    """
+    with open(results_file, "r", encoding="utf-8", newline="") as f:
+        return _results_arrays(csv.DictReader(f), metrics)
+
+
+def frame_to_arrays(df, metrics: Sequence[str] = DEFAULT_METRICS) -> Dict[str, np.ndarray]:
+    """
+    Same arrays as load_results_arrays, from a results DataFrame.
+
+    Use this when the notebook has already adjusted the data (e.g. the
+    LOA 3 completion_time correction), so the tests see the same values.
+
+    Returns:
+        {"loa_level": int array, "ai_faulty": bool array, <metric>: float array, ...}
+    """
+    return _results_arrays(df.to_dict("records"), metrics)
+
+
+def condition_contrasts(loa: np.ndarray, faulty: np.ndarray) -> List[Tuple[str, np.ndarray, np.ndarray]]:
+    """
+    Every LOA / ai_faulty comparison used in the analysis.
+
+    Returns:
+        List of (name, mask_a, mask_b); the estimate is stat(a) - stat(b)
+    """
+    levels = sorted(int(level) for level in np.unique(loa) if level > 0)
+    contrasts = []
+    for i, a in enumerate(levels):
+        for b in levels[i + 1:]:
+            contrasts.append((f"LOA{a} - LOA{b}", loa == a, loa == b))
+    ai_rows = loa > 1
+    contrasts.append(("faulty - reliable (LOA 2-4)", ai_rows & faulty, ai_rows & ~faulty))
+    for level in levels:
+        if level > 1:
+            contrasts.append((f"faulty - reliable (LOA{level})", (loa == level) & faulty, (loa == level) & ~faulty))
+    return contrasts
+
+
+def _batch_seeds(seed: int, task: int, n_batches: int) -> List[np.random.SeedSequence]:
+    return [np.random.SeedSequence(entropy=seed, spawn_key=(task, batch)) for batch in range(n_batches)]
+
+
+def _batch_sizes(n_resamples: int, batch_size: int) -> List[int]:
+    full, rest = divmod(n_resamples, batch_size)
+    return [batch_size] * full + ([rest] if rest else [])
+
+
+def _resample_batch(args) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    One batch of bootstrap and permutation replicates for a two-group contrast.
+
+    `a` and `b` are (metrics, rows) matrices that share the same valid rows,
+    so a single index matrix resamples every metric at once.
+
+    Returns:
+        (bootstrap differences, permutation differences), each (metrics, size)
+    """
+    a, b, stat_name, size, seed_seq = args
+    stat = STATISTICS[stat_name]
+    rng = np.random.default_rng(seed_seq)
+    n_a, n_b = a.shape[1], b.shape[1]
+
+    boot_a = a[:, rng.integers(0, n_a, size=(size, n_a))]
+    boot_b = b[:, rng.integers(0, n_b, size=(size, n_b))]
+    boot = stat(boot_a) - stat(boot_b)
+
+    pooled = np.concatenate([a, b], axis=1)
+    perm_idx = rng.permuted(np.broadcast_to(np.arange(n_a + n_b), (size, n_a + n_b)), axis=1)
+    shuffled = pooled[:, perm_idx]
+    perm = stat(shuffled[:, :, :n_a]) - stat(shuffled[:, :, n_a:])
+    return boot, perm
+
+
+def _bootstrap_batch(args) -> np.ndarray:
+    """One batch of bootstrap replicates of a single-group statistic."""
+    values, stat_name, size, seed_seq = args
+    rng = np.random.default_rng(seed_seq)
+    return STATISTICS[stat_name](values[rng.integers(0, values.size, size=(size, values.size))])
+
+
+def _run_batches(func, jobs: list, workers: Optional[int]) -> list:
+    if workers and workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(func, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+    return [func(job) for job in jobs]
+
+
+def _interval(replicates: np.ndarray, ci: float) -> Tuple[float, float]:
+    alpha = (1.0 - ci) / 2.0
+    low, high = np.quantile(replicates, [alpha, 1.0 - alpha])
+    return float(low), float(high)
+
+
+def grouped_bootstrap(values: np.ndarray, groups: np.ndarray, stat: str = "mean",
+                      n_resamples: int = 10000, ci: float = 0.95, seed: int = 0,
+                      batch_size: int = DEFAULT_BATCH_SIZE, workers: Optional[int] = None) -> Dict:
+    """
+    Bootstrap confidence interval of `stat` for every group.
+
+    Args:
+        values: Metric values (NaN entries are dropped)
+        groups: Group label per value (e.g. loa_level)
+        stat: "mean" or "median"
+        n_resamples: Bootstrap replicates per group
+        ci: Confidence level
+        seed: Seed for reproducible resamples
+        batch_size: Replicates per index-matrix batch
+        workers: Spread batches over this many processes
+
+    Returns:
+        {group: {"n", "estimate", "ci_low", "ci_high"}}
+    """
+    values = np.asarray(values, dtype=np.float64)
+    groups = np.asarray(groups)
+    sizes = _batch_sizes(n_resamples, batch_size)
+    labels = [g for g in np.unique(groups)]
+
+    jobs, owners = [], []
+    for task, label in enumerate(labels):
+        group_values = values[(groups == label) & ~np.isnan(values)]
+        if group_values.size == 0:
+            continue
+        for size, seed_seq in zip(sizes, _batch_seeds(seed, task, len(sizes))):
+            jobs.append((group_values, stat, size, seed_seq))
+            owners.append(label)
+
+    replicates: Dict = {}
+    for label, batch in zip(owners, _run_batches(_bootstrap_batch, jobs, workers)):
+        replicates.setdefault(label, []).append(batch)
+
+    result = {}
+    for label, batches in replicates.items():
+        group_values = values[(groups == label) & ~np.isnan(values)]
+        low, high = _interval(np.concatenate(batches), ci)
+        result[label.item() if hasattr(label, "item") else label] = {
+            "n": int(group_values.size),
+            "estimate": float(STATISTICS[stat](group_values)),
+            "ci_low": low,
+            "ci_high": high,
+        }
+    return result
+
+
+def contrast_tests(data: Dict[str, np.ndarray], metrics: Sequence[str] = DEFAULT_METRICS,
+                   stat: str = "mean", n_resamples: int = 10000, ci: float = 0.95, seed: int = 0,
+                   batch_size: int = DEFAULT_BATCH_SIZE, workers: Optional[int] = None) -> List[Dict]:
+    """
+    Bootstrap CIs and permutation p-values for every metric and condition contrast.
+
+    Args:
+        data: Output of load_results_arrays (or any dict with the same keys)
+        metrics: Metric columns to test
+        stat: "mean" or "median"
+        n_resamples: Replicates per contrast for both bootstrap and permutation
+        ci: Confidence level of the bootstrap interval
+        seed: Seed for reproducible resamples
+        batch_size: Replicates per index-matrix batch
+        workers: Spread batches over this many processes
+
+    Returns:
+        One dict per (metric, contrast) with estimate, CI and two-sided p-value
+    """
+    if stat not in STATISTICS:
+        raise ValueError(f"Unknown statistic '{stat}', expected one of {sorted(STATISTICS)}")
+
+    contrasts = condition_contrasts(data["loa_level"], data["ai_faulty"])
+    sizes = _batch_sizes(n_resamples, batch_size)
+    stat_fn = STATISTICS[stat]
+
+    # Metrics with the same missing-value pattern share one resampling task per contrast
+    by_pattern: Dict[bytes, List[str]] = {}
+    for metric in metrics:
+        valid = ~np.isnan(np.asarray(data[metric], dtype=np.float64))
+        by_pattern.setdefault(valid.tobytes(), []).append(metric)
+
+    tasks, jobs, owners = [], [], []
+    for pattern, group in by_pattern.items():
+        valid = np.frombuffer(pattern, dtype=bool)
+        matrix = np.vstack([np.asarray(data[m], dtype=np.float64) for m in group])
+        for name, mask_a, mask_b in contrasts:
+            a, b = matrix[:, mask_a & valid], matrix[:, mask_b & valid]
+            task = len(tasks)
+            tasks.append((group, name, a, b))
+            if a.shape[1] == 0 or b.shape[1] == 0:
+                continue
+            for size, seed_seq in zip(sizes, _batch_seeds(seed, task, len(sizes))):
+                jobs.append((a, b, stat, size, seed_seq))
+                owners.append(task)
+
+    boot: Dict[int, list] = {}
+    perm: Dict[int, list] = {}
+    for task, (boot_batch, perm_batch) in zip(owners, _run_batches(_resample_batch, jobs, workers)):
+        boot.setdefault(task, []).append(boot_batch)
+        perm.setdefault(task, []).append(perm_batch)
+
+    results = {}
+    for task, (group, name, a, b) in enumerate(tasks):
+        if task in boot:
+            observed = stat_fn(a) - stat_fn(b)
+            boot_all = np.concatenate(boot[task], axis=1)
+            perm_all = np.concatenate(perm[task], axis=1)
+            extreme = np.count_nonzero(np.abs(perm_all) >= np.abs(observed)[:, None] - 1e-12, axis=1)
+        for i, metric in enumerate(group):
+            row = {"metric": metric, "contrast": name, "stat": stat, "n_a": int(a.shape[1]), "n_b": int(b.shape[1]),
+                   "estimate": np.nan, "ci_low": np.nan, "ci_high": np.nan, "p_value": np.nan}
+            if task in boot:
+                row["estimate"] = float(observed[i])
+                row["ci_low"], row["ci_high"] = _interval(boot_all[i], ci)
+                row["p_value"] = (int(extreme[i]) + 1) / (perm_all.shape[1] + 1)
+            results[(metric, name)] = row
+
+    return [results[(metric, name)] for metric in metrics for name, _, _ in contrasts]
+
+
+def write_rows(rows: List[Dict], output_file: str):
+    """Write contrast_tests output to CSV."""
+    if not rows:
+        return
+    with open(output_file, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Bootstrap CIs and permutation tests for results.csv")
+    parser.add_argument("results_file", nargs="?", default="data/results.csv")
+    parser.add_argument("--resamples", type=int, default=10000)
+    parser.add_argument("--stat", choices=sorted(STATISTICS), default="mean")
+    parser.add_argument("--ci", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default=None, help="Optional CSV path for the full table")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.results_file):
+        print(f"Results file not found: {args.results_file}")
+        return 1
+
+    data = load_results_arrays(args.results_file)
+    rows = contrast_tests(data, stat=args.stat, n_resamples=args.resamples, ci=args.ci,
+                          seed=args.seed, workers=args.workers)
+
+    print("=" * 100)
+    print(f"RESAMPLING TESTS ({args.resamples} resamples, {args.stat}, {args.ci:.0%} CI)")
+    print("=" * 100)
+    for row in rows:
+        if np.isnan(row["estimate"]):
+            continue
+        print(f"{row['metric']:20s} {row['contrast']:30s} "
+              f"{row['estimate']:+10.3f} [{row['ci_low']:+10.3f}, {row['ci_high']:+10.3f}]  p={row['p_value']:.4f}")
+
+    if args.output:
+        write_rows(rows, args.output)
+        print(f"\nSaved {len(rows)} rows to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
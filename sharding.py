@@ -0,0 +1,168 @@
+"""
+Sharded data directories for running several app nodes.
+
+Each node (or worker process) started with its own HTI_NODE_ID writes its
+own shard through DataLogger(node_id=...):
+
+    data/shards/<node_id>/results.csv
+    data/shards/<node_id>/interactions/
+
+With HTI_NODES listing every node and its public URL, each node answers
+/start only for the participants that shard_for(participant_id, nodes)
+assigns to it and sends the others to their node's welcome page, so one
+participant's data stays on one node. Merging does not depend on it.
+
+merge_shards streams all shards into one consolidated data directory,
+k-way merging results by end_time and interactions by timestamp. Each shard
+is already in time order, so only one row per shard is held in memory.
+Resubmitted puzzles (same participant and puzzle) keep their first
+submission, and identical interaction events are written once.
+
+Usage:
+    python sharding.py [data] [--output data/merged]
+"""
+
+import argparse
+import csv
+import hashlib
+import heapq
+import json
+import os
+import sys
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from data_logger import RESULTS_COLUMNS, SHARDS_DIRNAME
+from interaction_store import InteractionStore
+
+
+def shard_for(participant_id: str, nodes: Sequence[str]) -> str:
+    """
+    Node that owns a participant (rendezvous hashing).
+
+    Adding or removing a node only moves the participants of that node.
+    """
+    if not nodes:
+        raise ValueError("No nodes to route to")
+
+    def weight(node: str) -> bytes:
+        return hashlib.sha1(f"{node}:{participant_id}".encode("utf-8")).digest()
+
+    return max(nodes, key=weight)
+
+
+def parse_nodes(spec: str) -> Dict[str, str]:
+    """
+    Parse HTI_NODES ("a=http://host-a:5000,b=http://host-b:5000").
+
+    Returns:
+        {node_id: base URL without a trailing slash}
+    """
+    nodes = {}
+    for entry in filter(None, (part.strip() for part in (spec or "").split(","))):
+        node_id, sep, url = entry.partition("=")
+        if not sep or not node_id.strip() or not url.strip():
+            raise ValueError(f"Invalid HTI_NODES entry {entry!r}: expected <node id>=<url>")
+        nodes[node_id.strip()] = url.strip().rstrip("/")
+    return nodes
+
+
+def list_shards(data_dir: str) -> List[str]:
+    """Shard directories under `data_dir`, sorted by node id."""
+    root = os.path.join(data_dir, SHARDS_DIRNAME)
+    if not os.path.isdir(root):
+        return []
+    return [os.path.join(root, name) for name in sorted(os.listdir(root))
+            if os.path.isdir(os.path.join(root, name))]
+
+
+def _iter_results(path: str) -> Iterator[Dict]:
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        yield from csv.DictReader(f)
+
+
+def _iter_interactions(directory: str) -> Iterator[Dict]:
+    if not os.path.isdir(directory):
+        return iter(())
+    return InteractionStore(directory, readonly=True).iter_events()
+
+
+def merge_shards(shard_dirs: Sequence[str], output_dir: str) -> Dict[str, int]:
+    """
+    Merge shard directories into one data directory.
+
+    Args:
+        shard_dirs: Shard directories (each with results.csv and interactions/)
+        output_dir: Destination; must not already contain results or interactions
+
+    Returns:
+        Counts of rows and events written and duplicates dropped
+    """
+    results_file = os.path.join(output_dir, "results.csv")
+    interactions_dir = os.path.join(output_dir, "interactions")
+    if os.path.exists(results_file) or (os.path.isdir(interactions_dir) and os.listdir(interactions_dir)):
+        raise FileExistsError(f"{output_dir} already contains a dataset")
+    os.makedirs(output_dir, exist_ok=True)
+
+    stats = {"shards": len(shard_dirs), "results": 0, "duplicate_results": 0,
+             "interactions": 0, "duplicate_interactions": 0}
+
+    # Results: one completion per (participant, puzzle), earliest submission wins
+    streams = [_iter_results(os.path.join(shard, "results.csv")) for shard in shard_dirs]
+    seen = set()
+    tmp_file = results_file + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULTS_COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        for row in heapq.merge(*streams, key=lambda row: row.get("end_time", "")):
+            key = (row.get("participant_id", ""), row.get("puzzle_id", ""))
+            if key in seen:
+                stats["duplicate_results"] += 1
+                continue
+            seen.add(key)
+            writer.writerow(row)
+            stats["results"] += 1
+    os.replace(tmp_file, results_file)
+
+    # Interactions: duplicates share a timestamp, so only that run is remembered
+    streams = [_iter_interactions(os.path.join(shard, "interactions")) for shard in shard_dirs]
+    store = InteractionStore(interactions_dir)
+    current_timestamp, current_events = None, set()
+    try:
+        for event in heapq.merge(*streams, key=lambda event: event.get("timestamp", "")):
+            timestamp = event.get("timestamp", "")
+            if timestamp != current_timestamp:
+                current_timestamp, current_events = timestamp, set()
+            fingerprint = json.dumps(event, sort_keys=True)
+            if fingerprint in current_events:
+                stats["duplicate_interactions"] += 1
+                continue
+            current_events.add(fingerprint)
+            store.append(event)
+            stats["interactions"] += 1
+    finally:
+        store.close()
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Merge per-node data shards into one dataset")
+    parser.add_argument("data_dir", nargs="?", default="data")
+    parser.add_argument("--output", default=None, help="Destination (default: <data_dir>/merged)")
+    args = parser.parse_args(argv)
+
+    shards = list_shards(args.data_dir)
+    if not shards:
+        print(f"No shards found under {os.path.join(args.data_dir, SHARDS_DIRNAME)}")
+        return 1
+    output = args.output or os.path.join(args.data_dir, "merged")
+    stats = merge_shards(shards, output)
+    print(f"Merged {stats['shards']} shards into {output}: "
+          f"{stats['results']} results ({stats['duplicate_results']} resubmissions dropped), "
+          f"{stats['interactions']} interactions ({stats['duplicate_interactions']} duplicates dropped)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
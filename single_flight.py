@@ -0,0 +1,81 @@
+"""
+Single-flight coalescing for the LOA3 planner.
+
+When a cohort starts together, many participants ask for a plan for the
+same puzzle, condition and accepted steps within seconds. SingleFlight
+lets the first caller for a key (the leader) run the call while concurrent
+callers with the same key wait for its result, so the model sees one
+request per distinct key instead of one per participant.
+
+Flask runs every async view on its own event loop, so callers are joined
+through a thread-safe concurrent.futures.Future rather than an asyncio one.
+Every caller gets its own deep copy of the result. A failure is raised in
+every waiting caller; the key is released as soon as the call finishes, so
+nothing (result or error) is reused by later calls.
+"""
+
+import asyncio
+import concurrent.futures
+import copy
+import threading
+from typing import Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class SingleFlight:
+    """Run at most one call per key at a time and share its result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, concurrent.futures.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    async def run(self, key: Hashable, call: Callable[[], Awaitable]) -> Tuple[object, bool]:
+        """
+        Await call() unless a call for `key` is already running, in which
+        case wait for that one instead.
+
+        Args:
+            key: Hashable identity of the call's inputs
+            call: Starts the work and returns an awaitable
+
+        Returns:
+            (copy of the result, shared) where shared is True for callers
+            that waited on another caller's call
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = concurrent.futures.Future()
+                future.set_running_or_notify_cancel()  # a waiter's cancel() must not cancel it for all
+                self._calls[key] = future
+                self.calls += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return copy.deepcopy(await asyncio.wrap_future(future)), True
+
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            self._finish(key, future, exception=RuntimeError("coalesced call was cancelled"))
+            raise
+        except BaseException as exc:
+            self._finish(key, future, exception=exc)
+            raise
+        self._finish(key, future, result=result)
+        return copy.deepcopy(result), False
+
+    def _finish(self, key, future, result=None, exception=None):
+        with self._lock:
+            del self._calls[key]  # callers from now on start a fresh call
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
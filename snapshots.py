@@ -0,0 +1,364 @@
+"""
+Online, point-in-time snapshots of the data directory.
+
+A snapshot copies results.csv and the interaction store (including every
+node's shard under shards/) while the app keeps logging:
+
+    - results.csv and the active plain segment are append-only, so each is
+      copied up to the size it had at the snapshot point (cut back to the
+      last complete line);
+    - sealed .jsonl.gz segments and their .idx.json indexes never change,
+      so they are copied once and referenced by later snapshots.
+
+The snapshot point is consistent: with a DataLogger (in the app process)
+writes are held back for the few stat() calls that fix the sizes, and
+segment compression waits until the copy is done. From another process
+(the CLI) results.csv is measured before the interaction log; since a
+trial's events are logged before its results row, every row in the
+snapshot still has its events.
+
+Snapshots are incremental: an append-only file that only grew since the
+previous snapshot is stored as the new bytes alone. Each snapshot has a
+manifest.json listing every file as parts (snapshot id, offset, length,
+sha256); restoring concatenates the parts from the snapshot chain.
+
+    python snapshots.py [data] [--full]
+    python snapshots.py [data] --list
+    python snapshots.py [data] --verify 20251208-101500-000000
+    python snapshots.py [data] --restore 20251208-101500-000000 --to restored/
+"""
+
+import argparse
+import contextlib
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from data_logger import SHARDS_DIRNAME
+from interaction_store import SEGMENT_PATTERN
+
+
+SNAPSHOTS_DIRNAME = "snapshots"
+MANIFEST_NAME = "manifest.json"
+APPEND, WHOLE = "append", "whole"  # copied by offset / copied once per change
+TAIL_BYTES = 4096  # checked to tell a grown file from a rewritten one
+CHUNK_BYTES = 1024 * 1024
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _open_source(path: str):
+    """Open a source file; a plain segment compressed since it was measured is read from its .gz."""
+    try:
+        return open(path, "rb")
+    except FileNotFoundError:
+        if path.endswith(".jsonl") and os.path.exists(path + ".gz"):
+            return gzip.open(path + ".gz", "rb")
+        raise
+
+
+def _copy_stream(src, dst=None) -> Tuple[int, str]:
+    """Copy src to dst (if given) in chunks; returns (bytes, sha256)."""
+    digest = hashlib.sha256()
+    length = 0
+    for chunk in iter(lambda: src.read(CHUNK_BYTES), b""):
+        digest.update(chunk)
+        length += len(chunk)
+        if dst is not None:
+            dst.write(chunk)
+    return length, digest.hexdigest()
+
+
+def _read_range(path: str, offset: int, length: int) -> bytes:
+    with _open_source(path) as f:
+        f.seek(offset)
+        return f.read(length)
+
+
+def _line_boundary(path: str, size: int) -> int:
+    """Largest offset <= size that ends a complete line (0 if none)."""
+    end = size
+    with _open_source(path) as f:
+        while end > 0:
+            start = max(end - CHUNK_BYTES, 0)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline >= 0:
+                return start + newline + 1
+            end = start
+    return 0
+
+
+class Snapshotter:
+    """
+    Args:
+        data_dir: Data directory to snapshot (results.csv, interactions/,
+            shards/<node>/...)
+        snapshot_dir: Where snapshots are kept (default: data_dir/snapshots)
+        logger: DataLogger writing to data_dir in this process; used to fix
+            the snapshot point exactly and to hold back segment compression
+    """
+
+    def __init__(self, data_dir: str, snapshot_dir: Optional[str] = None, logger=None):
+        self.data_dir = data_dir
+        self.snapshot_dir = snapshot_dir or os.path.join(data_dir, SNAPSHOTS_DIRNAME)
+        self.logger = logger
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------ sources
+
+    def _roots(self) -> List[str]:
+        """Relative directories holding DataLogger files: '' and each shard."""
+        roots = [""]
+        shards = os.path.join(self.data_dir, SHARDS_DIRNAME)
+        if os.path.isdir(shards):
+            roots.extend(f"{SHARDS_DIRNAME}/{name}" for name in sorted(os.listdir(shards))
+                         if os.path.isdir(os.path.join(shards, name)))
+        return roots
+
+    def _abspath(self, relpath: str) -> str:
+        return os.path.join(self.data_dir, *relpath.split("/"))
+
+    def _measure(self) -> Dict[str, Dict]:
+        """Kind and size of every source file; results first, then interactions."""
+        files: Dict[str, Dict] = {}
+
+        def add(relpath: str, kind: str):
+            try:
+                stat = os.stat(self._abspath(relpath))
+            except FileNotFoundError:
+                return
+            files[relpath] = {"kind": kind, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+        roots = self._roots()
+        for root in roots:
+            add(f"{root}/results.csv".lstrip("/"), APPEND)
+        for root in roots:
+            for legacy in ("interactions.json", "interactions.json.migrated"):
+                add(f"{root}/{legacy}".lstrip("/"), WHOLE)
+            directory = f"{root}/interactions".lstrip("/")
+            try:
+                names = set(os.listdir(self._abspath(directory)))
+            except FileNotFoundError:
+                continue
+            plain, packed = set(), set()
+            for name in names:
+                match = SEGMENT_PATTERN.match(name)
+                if match:
+                    (packed if match.group(2) else plain).add(int(match.group(1)))
+            # Same rule as InteractionStore: the plain file wins until its index exists
+            for number in sorted(plain | packed):
+                stem = f"{directory}/segment-{number:06d}"
+                if number in plain:
+                    add(stem + ".jsonl", APPEND)
+                elif f"segment-{number:06d}.idx.json" in names:
+                    add(stem + ".jsonl.gz", WHOLE)
+                    add(stem + ".idx.json", WHOLE)
+        return files
+
+    # ------------------------------------------------------------------ snapshots
+
+    def list_snapshots(self) -> List[Dict]:
+        """Manifests of the complete snapshots, oldest first."""
+        manifests = []
+        if not os.path.isdir(self.snapshot_dir):
+            return manifests
+        for name in sorted(os.listdir(self.snapshot_dir)):
+            path = os.path.join(self.snapshot_dir, name, MANIFEST_NAME)
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    manifests.append(json.load(f))
+        return manifests
+
+    def load(self, snapshot_id: str) -> Dict:
+        with open(os.path.join(self.snapshot_dir, snapshot_id, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def take(self, full: bool = False) -> Dict:
+        """
+        Take a snapshot now.
+
+        Args:
+            full: Copy everything instead of building on the latest snapshot
+
+        Returns:
+            The snapshot's manifest
+        """
+        with self._lock, contextlib.ExitStack() as stack:
+            if self.logger is not None:
+                stack.enter_context(self.logger.interaction_store.pinned())
+                with self.logger.writes_paused():
+                    measured = self._measure()
+            else:
+                measured = self._measure()
+            created_at = datetime.now()
+
+            previous = self.list_snapshots()
+            base = None if full or not previous else previous[-1]
+            snapshot_id = created_at.strftime("%Y%m%d-%H%M%S-%f")
+            work_dir = os.path.join(self.snapshot_dir, snapshot_id + ".tmp")
+            shutil.rmtree(work_dir, ignore_errors=True)
+            os.makedirs(work_dir)
+
+            files, copied = {}, 0
+            for relpath, info in measured.items():
+                entry, written = self._snapshot_file(relpath, info, base, snapshot_id, work_dir)
+                files[relpath] = entry
+                copied += written
+
+            manifest = {
+                "id": snapshot_id,
+                "created_at": created_at.isoformat(),
+                "base": base["id"] if base else None,
+                "data_dir": os.path.abspath(self.data_dir),
+                "files": files,
+                "total_bytes": sum(entry["size"] for entry in files.values()),
+                "copied_bytes": copied,
+            }
+            with open(os.path.join(work_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(work_dir, os.path.join(self.snapshot_dir, snapshot_id))
+            return manifest
+
+    def _snapshot_file(self, relpath: str, info: Dict, base: Optional[Dict], snapshot_id: str,
+                       work_dir: str) -> Tuple[Dict, int]:
+        source = self._abspath(relpath)
+        previous = (base or {}).get("files", {}).get(relpath)
+        if previous is not None and previous["kind"] != info["kind"]:
+            previous = None
+
+        if info["kind"] == WHOLE:
+            if previous is not None and (previous["size"], previous["mtime_ns"]) == (info["size"], info["mtime_ns"]):
+                return previous, 0
+            entry = {"kind": WHOLE, "size": info["size"], "mtime_ns": info["mtime_ns"], "parts": []}
+            start, end = 0, info["size"]
+        else:
+            end = _line_boundary(source, info["size"])
+            entry = {"kind": APPEND, "size": end, "tail_sha256": self._tail(source, end), "parts": []}
+            start = 0
+            if (previous is not None and previous["size"] <= end
+                    and self._tail(source, previous["size"]) == previous["tail_sha256"]):
+                entry["parts"] = list(previous["parts"])
+                start = previous["size"]
+
+        if end > start:
+            entry["parts"].append(self._copy_part(source, relpath, start, end - start, snapshot_id, work_dir))
+        return entry, end - start
+
+    @staticmethod
+    def _tail(path: str, end: int) -> str:
+        start = max(end - TAIL_BYTES, 0)
+        return _sha256(_read_range(path, start, end - start))
+
+    def _copy_part(self, source: str, relpath: str, offset: int, length: int, snapshot_id: str,
+                   work_dir: str) -> Dict:
+        target = os.path.join(work_dir, "files", *relpath.split("/"))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        digest = hashlib.sha256()
+        remaining = length
+        with _open_source(source) as src, open(target, "wb") as dst:
+            src.seek(offset)
+            while remaining:
+                chunk = src.read(min(remaining, CHUNK_BYTES))
+                if not chunk:
+                    raise RuntimeError(f"{source} shrank while being copied")
+                digest.update(chunk)
+                dst.write(chunk)
+                remaining -= len(chunk)
+        return {"snapshot": snapshot_id, "offset": offset, "length": length, "sha256": digest.hexdigest()}
+
+    # ------------------------------------------------------------------ verify / restore
+
+    def _part_path(self, part: Dict, relpath: str) -> str:
+        return os.path.join(self.snapshot_dir, part["snapshot"], "files", *relpath.split("/"))
+
+    def verify(self, snapshot_id: str) -> List[str]:
+        """
+        Check every part a snapshot needs against its checksum.
+
+        Returns:
+            Problems found (empty when the snapshot can be restored)
+        """
+        problems = []
+        for relpath, entry in self.load(snapshot_id)["files"].items():
+            if sum(part["length"] for part in entry["parts"]) != entry["size"]:
+                problems.append(f"{relpath}: parts do not add up to {entry['size']} bytes")
+            for part in entry["parts"]:
+                try:
+                    with open(self._part_path(part, relpath), "rb") as f:
+                        checked = _copy_stream(f)
+                except FileNotFoundError:
+                    problems.append(f"{relpath}: missing part from snapshot {part['snapshot']}")
+                    continue
+                if checked != (part["length"], part["sha256"]):
+                    problems.append(f"{relpath}: checksum mismatch in part from snapshot {part['snapshot']}")
+        return problems
+
+    def restore(self, snapshot_id: str, target_dir: str) -> int:
+        """
+        Rebuild the data directory as of a snapshot into `target_dir`.
+
+        Returns:
+            Number of files written
+        """
+        if os.path.isdir(target_dir) and os.listdir(target_dir):
+            raise ValueError(f"{target_dir} is not empty")
+        files = self.load(snapshot_id)["files"]
+        for relpath, entry in files.items():
+            target = os.path.join(target_dir, *relpath.split("/"))
+            os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+            with open(target, "wb") as dst:
+                for part in entry["parts"]:
+                    with open(self._part_path(part, relpath), "rb") as src:
+                        checked = _copy_stream(src, dst)
+                    if checked != (part["length"], part["sha256"]):
+                        raise ValueError(f"{relpath}: checksum mismatch in part from snapshot {part['snapshot']}")
+        return len(files)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Consistent snapshots of the data directory")
+    parser.add_argument("data_dir", nargs="?", default="data")
+    parser.add_argument("--output", default=None, help="Snapshot directory (default: <data_dir>/snapshots)")
+    parser.add_argument("--full", action="store_true", help="Copy everything, not only what changed")
+    parser.add_argument("--list", action="store_true", help="List snapshots")
+    parser.add_argument("--verify", default=None, metavar="ID", help="Check a snapshot's checksums")
+    parser.add_argument("--restore", default=None, metavar="ID", help="Restore a snapshot (with --to)")
+    parser.add_argument("--to", default=None, help="Empty directory to restore into")
+    args = parser.parse_args(argv)
+
+    snapshotter = Snapshotter(args.data_dir, args.output)
+    if args.list:
+        for manifest in snapshotter.list_snapshots():
+            print(f"{manifest['id']}  {len(manifest['files']):4d} files  {manifest['total_bytes']:>12} B  "
+                  f"copied {manifest['copied_bytes']:>12} B  base {manifest['base'] or '-'}")
+        return 0
+    if args.verify:
+        problems = snapshotter.verify(args.verify)
+        for problem in problems:
+            print(problem)
+        print(f"{args.verify}: {'OK' if not problems else f'{len(problems)} problems'}")
+        return 1 if problems else 0
+    if args.restore:
+        if not args.to:
+            parser.error("--restore needs --to")
+        count = snapshotter.restore(args.restore, args.to)
+        print(f"Restored {count} files into {args.to}")
+        return 0
+
+    manifest = snapshotter.take(full=args.full)
+    print(f"Snapshot {manifest['id']}: {len(manifest['files'])} files, {manifest['total_bytes']} B "
+          f"({manifest['copied_bytes']} B copied, base {manifest['base'] or 'none'})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
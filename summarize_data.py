@@ -1,7 +1,16 @@
 import pandas as pd
 import numpy as np
 
-df = pd.read_csv('data/results.csv')
+from columnar_export import load_results
+from data_logger import RESULTS_COLUMNS
+
+# Reads the typed columnar export (refreshed incrementally from results.csv),
+# only the columns summarised below
+df = load_results(columns=['participant_id', 'loa_level', 'puzzle_id', 'ai_faulty', 'start_time',
+                           'completion_time', 'num_interactions', 'decision_latency',
+                           'final_correctness', 'accepted_advice', 'overridden'])
+# Categorical in the export's dictionary order; plain strings group and sort by ID
+df['participant_id'] = df['participant_id'].astype(str)
 
 print('='*60)
 print('HTI EXPERIMENT - DATA SUMMARY')
@@ -11,8 +20,8 @@ print(f'Unique Participants: {df["participant_id"].nunique()}')
 print(f'Participant IDs: {sorted(df["participant_id"].unique())}')
 
 # Show all columns
-print(f'\n\nAll Columns ({len(df.columns)} total):')
-for i, col in enumerate(df.columns[:40], 1):
+print(f'\n\nAll Columns ({len(RESULTS_COLUMNS)} total):')
+for i, col in enumerate(RESULTS_COLUMNS[:40], 1):
     print(f'{i}. {col}')
 
 print('\n' + '='*60)
@@ -93,7 +102,7 @@ print(df.groupby('ai_faulty')['num_interactions'].agg(['mean', 'median']))
 print('\n' + '='*60)
 print('PARTICIPANT LEVEL SUMMARY')
 print('='*60)
-participant_summary = df.groupby('participant_id').agg({
+participant_summary = df.groupby('participant_id', sort=True, observed=True).agg({
     'completion_time': ['mean', 'std'],
     'num_interactions': 'mean',
     'puzzle_id': 'count'
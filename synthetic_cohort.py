@@ -0,0 +1,518 @@
+"""
+Synthetic participant cohorts for scale-testing storage and analysis code.
+
+generate_cohort() produces results.csv rows and interaction events in the
+exact formats the app writes, for any number of participants:
+
+    - Condition, LOA order, puzzle assignment and the faulty puzzle are
+      drawn as initialize_session() does (50/50 faulty, a random LOA
+      permutation, four distinct puzzles, one faulty LOA out of 2-4).
+    - Per LOA, action sequences come from the first-order Markov model of
+      the real sequences (process_mining.markov_models_by_loa) with
+      lengths resampled from the real ones; hints_used and
+      num_interactions are counted from the generated sequence.
+    - Completion times and the pause between puzzles are log-normal fits;
+      decision-latency ratios, edit distances and questionnaire answers
+      are resampled from the real rows of the same LOA; accept, override
+      and correctness rates are per LOA (and faulty condition).
+    - results.csv stores no event times, so events arrive uniformly at
+      random over the trial (a Poisson process given the event count).
+
+Everything is generated as NumPy arrays, a batch of participants at a
+time, and formatted a column at a time: each results.csv column and each
+part of an event row becomes an array of strings, and rows are joined
+with str.join. Events skip the plain segment and go straight into
+compressed segments (InteractionStore.append_blocks). Formatting is still
+the largest single cost: about half the time of a --no-interactions run
+(the rest is sampling), and with events, gzip compression and building
+the rows take about two thirds.
+
+Usage:
+    python synthetic_cohort.py --participants 100000 [--output data/synthetic]
+                               [--fit data/results.csv] [--seed 0] [--no-interactions]
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from data_logger import RESULTS_COLUMNS, DataLogger
+from event_codec import EVENT_CODES, EVENT_TYPES, OTHER_CODE
+from process_mining import LOA_LEVELS, NUM_EVENT_TYPES, load_results_log, markov_models_by_loa
+
+
+DEFAULT_OUTPUT = os.path.join("data", "synthetic")
+DEFAULT_BATCH = 20_000  # participants generated at a time
+PUZZLES_FILE = "logic_puzzles.json"
+SURVEY_COLUMNS = RESULTS_COLUMNS[RESULTS_COLUMNS.index("pre_trust_Q1"):RESULTS_COLUMNS.index("final_answer")]
+MIN_RATE_ROWS = 5  # smaller (LOA, faulty) groups use the LOA-wide rate
+
+_ELEMENT_EVENTS = {EVENT_CODES[name] for name in ("drag_start", "drop_in_solution", "return_to_pool")}
+
+
+# ---------------------------------------------------------------------- fitting
+
+def _float(value, default=float("nan")) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _bool(value) -> bool:
+    return str(value).strip().lower() == "true"
+
+
+def _survey_value(value: str) -> str:
+    """Questionnaire answers as DataLogger writes them: integers without a trailing .0."""
+    number = _float(value)
+    if math.isnan(number):
+        return ""
+    return str(int(number)) if number.is_integer() else str(number)
+
+
+def _lognormal(values: List[float], default_median: float) -> List[float]:
+    logs = np.log([v for v in values if v > 0])
+    if logs.size < 2:
+        return [math.log(default_median), 0.5]
+    return [float(logs.mean()), float(logs.std(ddof=1))]
+
+
+def fit_profile(results_file: str = os.path.join("data", "results.csv")) -> Dict:
+    """
+    Fit the per-LOA distributions used by generate_cohort.
+
+    Args:
+        results_file: Real results.csv to fit
+
+    Returns:
+        JSON-serialisable profile (see the module docstring)
+    """
+    with open(results_file, "r", encoding="utf-8", newline="") as f:
+        rows = [row for row in csv.DictReader(f) if row.get("loa_level")]
+    markov = markov_models_by_loa(load_results_log(results_file))
+
+    by_participant: Dict[str, List[Dict]] = {}
+    for row in rows:
+        by_participant.setdefault(row["participant_id"], []).append(row)
+    pauses = []
+    for trials in by_participant.values():
+        trials.sort(key=lambda r: r.get("start_time", ""))
+        for previous, current in zip(trials, trials[1:]):
+            try:
+                gap = (datetime.fromisoformat(current["start_time"])
+                       - datetime.fromisoformat(previous["end_time"])).total_seconds()
+            except (KeyError, ValueError):
+                continue
+            if gap > 0:
+                pauses.append(gap)
+
+    levels = {}
+    for level in LOA_LEVELS:
+        group = [row for row in rows if _float(row["loa_level"]) == level]
+        if not group:
+            raise ValueError(f"{results_file} has no LOA {level} rows to fit")
+        times = [_float(row["completion_time"]) for row in group]
+        ratios = [min(max(_float(row["decision_latency"], 0.0) / t, 0.0), 1.0)
+                  for row, t in zip(group, times) if t > 0]
+        # Older rows have num_interactions but an empty action_sequence
+        lengths = [max(int(_float(row["num_interactions"], 0.0)), len(json.loads(row.get("action_sequence") or "[]")))
+                   for row in group]
+
+        def rate(rows_, column):
+            return sum(_bool(row[column]) for row in rows_) / len(rows_)
+
+        correct = {}
+        for faulty in (False, True):
+            subset = [row for row in group if _bool(row["ai_faulty"]) == faulty]
+            correct[str(faulty).lower()] = rate(subset if len(subset) >= MIN_RATE_ROWS else group,
+                                                "final_correctness")
+        surveys = {}
+        for column in SURVEY_COLUMNS:
+            values, counts = np.unique([_survey_value(row.get(column)) for row in group], return_counts=True)
+            surveys[column] = {"values": values.tolist(), "p": (counts / counts.sum()).tolist()}
+
+        transitions = markov[level]["transitions"]
+        empty = transitions.sum(axis=1) == 0  # states never left in the real data
+        transitions[empty] = markov[level]["initial"]
+        levels[str(level)] = {
+            "completion_time": _lognormal(times, 300.0),
+            "decision_ratio": ratios,
+            "lengths": lengths,
+            "initial": markov[level]["initial"].tolist(),
+            "transitions": transitions.tolist(),
+            "accepted_advice": rate(group, "accepted_advice"),
+            "overridden": rate(group, "overridden"),
+            "final_correctness": correct,
+            "edit_distance": [int(_float(row["edit_distance"], 0.0)) for row in group],
+            "surveys": surveys,
+        }
+    return {"source": results_file, "rows": len(rows), "pause": _lognormal(pauses, 240.0), "loa": levels}
+
+
+# ---------------------------------------------------------------------- generation
+
+def _categorical(rng: np.random.Generator, probabilities: np.ndarray, size: int) -> np.ndarray:
+    cumulative = np.cumsum(probabilities)
+    return np.minimum(np.searchsorted(cumulative, rng.random(size) * cumulative[-1], side="right"),
+                      len(probabilities) - 1)
+
+
+def _markov_sequences(rng: np.random.Generator, initial: np.ndarray, transitions: np.ndarray,
+                      lengths: np.ndarray) -> np.ndarray:
+    """(trials, max length) int8 codes, -1 past each trial's length; one vector step per position."""
+    width = int(lengths.max(initial=0))
+    codes = np.full((lengths.size, width), -1, dtype=np.int8)
+    if width == 0:
+        return codes
+    cumulative = np.cumsum(transitions, axis=1)
+    state = _categorical(rng, initial, lengths.size)
+    codes[:, 0] = state
+    for position in range(1, width):
+        draws = rng.random(lengths.size)[:, None] * cumulative[state, -1:]
+        state = np.minimum((draws >= cumulative[state]).sum(axis=1), NUM_EVENT_TYPES - 1)
+        codes[:, position] = state
+    codes[np.arange(width)[None, :] >= lengths[:, None]] = -1
+    return codes
+
+
+def _iso(microseconds: np.ndarray) -> List[str]:
+    """datetime.isoformat() strings for naive epoch microseconds (no fraction when it is zero)."""
+    text = np.datetime_as_string(microseconds.astype("datetime64[us]"), unit="us").tolist()
+    for i in np.flatnonzero(microseconds % 1_000_000 == 0).tolist():
+        text[i] = text[i][:-len(".000000")]
+    return text
+
+
+def generate_cohort(num_participants: int, profile: Dict, puzzles: List[Dict], seed: Optional[int] = None,
+                    start: datetime = datetime(2025, 12, 8, 9, 0), days: float = 14.0,
+                    first_participant: int = 1) -> Dict[str, np.ndarray]:
+    """
+    Generate one batch of participants (four trials each).
+
+    Args:
+        num_participants: Participants in the batch
+        profile: Output of fit_profile
+        puzzles: Puzzle definitions (logic_puzzles.json "puzzles")
+        seed: Random seed
+        start: Earliest session start
+        days: Sessions start uniformly within this many days of `start`
+        first_participant: Number of the first participant id (SYN0000001, ...)
+
+    Returns:
+        Column arrays, one entry per trial in participant and step order,
+        plus "codes" ((trials, max length) event codes, -1 padded) and
+        "offsets" (matching event times in microseconds since the epoch)
+    """
+    rng = np.random.default_rng(seed)
+    n = num_participants
+    trials = n * 4
+
+    # initialize_session: condition, LOA order, puzzles, faulty LOA
+    is_faulty = rng.random(n) < 0.5
+    loa_order = np.argsort(rng.random((n, 4)), axis=1) + 1
+    puzzle_index = np.argsort(rng.random((n, len(puzzles))), axis=1)[:, :4]
+    faulty_loa = np.where(is_faulty, rng.integers(2, 5, n), 0)
+
+    loa = loa_order.reshape(-1)
+    puzzle_index = puzzle_index.reshape(-1)
+    ai_faulty = (np.repeat(faulty_loa, 4) == loa)
+
+    completion = np.empty(trials)
+    decision = np.empty(trials)
+    accepted = np.empty(trials, dtype=bool)
+    overridden = np.empty(trials, dtype=bool)
+    correct = np.empty(trials, dtype=bool)
+    edit_distance = np.empty(trials, dtype=np.int64)
+    lengths = np.empty(trials, dtype=np.int64)
+    surveys = {column: np.empty(trials, dtype=object) for column in SURVEY_COLUMNS}
+    code_blocks = {}
+    for level in LOA_LEVELS:
+        fitted = profile["loa"][str(level)]
+        rows = np.flatnonzero(loa == level)
+        size = rows.size
+        mu, sigma = fitted["completion_time"]
+        completion[rows] = rng.lognormal(mu, sigma, size)
+        decision[rows] = completion[rows] * rng.choice(np.asarray(fitted["decision_ratio"]), size)
+        accepted[rows] = rng.random(size) < fitted["accepted_advice"]
+        overridden[rows] = rng.random(size) < fitted["overridden"]
+        rates = np.where(ai_faulty[rows], fitted["final_correctness"]["true"], fitted["final_correctness"]["false"])
+        correct[rows] = rng.random(size) < rates
+        edit_distance[rows] = rng.choice(np.asarray(fitted["edit_distance"]), size)
+        lengths[rows] = rng.choice(np.asarray(fitted["lengths"]), size)
+        for column in SURVEY_COLUMNS:
+            choice = fitted["surveys"][column]
+            values = np.asarray(choice["values"], dtype=object)
+            surveys[column][rows] = values[_categorical(rng, np.asarray(choice["p"]), size)]
+        code_blocks[level] = (rows, _markov_sequences(rng, np.asarray(fitted["initial"]),
+                                                      np.asarray(fitted["transitions"]), lengths[rows]))
+
+    width = int(lengths.max(initial=0))
+    codes = np.full((trials, width), -1, dtype=np.int8)
+    for rows, block in code_blocks.values():
+        codes[rows, :block.shape[1]] = block
+
+    # Sessions: each puzzle starts after the previous one and a questionnaire pause
+    session_start = (np.datetime64(start, "us").astype(np.int64)
+                     + (rng.random(n) * days * 86_400e6).astype(np.int64))
+    completion_us = (completion * 1e6).astype(np.int64).reshape(n, 4)
+    pause_us = (rng.lognormal(*profile["pause"], (n, 4)) * 1e6).astype(np.int64)
+    pause_us[:, 0] = 0
+    start_us = session_start[:, None] + np.cumsum(pause_us, axis=1)
+    start_us[:, 1:] += np.cumsum(completion_us, axis=1)[:, :-1]
+    start_us = start_us.reshape(-1)
+    end_us = start_us + completion_us.reshape(-1)
+
+    # Events arrive uniformly over the trial, in order
+    arrivals = np.sort(np.where(codes >= 0, rng.random(codes.shape), np.inf), axis=1)
+    offsets = start_us[:, None] + np.where(codes >= 0, arrivals, 0) * completion_us.reshape(-1)[:, None]
+
+    hints = (codes == EVENT_CODES["request_hint"]).sum(axis=1)
+    ids = np.array([f"SYN{i:07d}" for i in range(first_participant, first_participant + n)])
+    puzzle_ids = np.array([p["puzzle_id"] for p in puzzles])
+    correct_answers = np.array([p["correct_solution"] for p in puzzles], dtype=object)
+    wrong_answers = np.array([p["ai_solution_faulty"] for p in puzzles], dtype=object)
+    columns = {
+        "participant_id": np.repeat(ids, 4),
+        "loa_level": loa,
+        "puzzle_id": puzzle_ids[puzzle_index],
+        "ai_faulty": ai_faulty,
+        "start_time": np.array(_iso(start_us), dtype=object),
+        "end_time": np.array(_iso(end_us), dtype=object),
+        "completion_time": completion_us.reshape(-1) / 1e6,
+        "num_interactions": lengths,
+        "decision_latency": np.round(decision, 3),
+        "accepted_advice": accepted,
+        "overridden": overridden,
+        "hints_used": hints,
+        "edit_distance": edit_distance,
+        "final_correctness": correct,
+        "final_answer": np.where(correct, correct_answers[puzzle_index], wrong_answers[puzzle_index]),
+        "expected_answer": correct_answers[puzzle_index],
+        "loa3_degradation": np.full(n * 4, "", dtype=object),  # synthetic plans never degrade
+        "codes": codes,
+        "offsets": offsets.astype(np.int64),
+        "puzzle_index": puzzle_index,
+    }
+    columns.update(surveys)
+    return columns
+
+
+# ---------------------------------------------------------------------- output
+
+def _csv_field(value) -> str:
+    """One field as csv.writer (QUOTE_MINIMAL) writes it."""
+    text = str(value)
+    if any(char in text for char in ',"\r\n'):
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+
+def _action_sequences(cohort: Dict[str, np.ndarray]) -> List[str]:
+    """The quoted action_sequence field of every trial, built from the code matrix in bulk."""
+    codes = cohort["codes"]
+    lengths = cohort["num_interactions"]
+    used = np.arange(codes.shape[1]) < lengths[:, None]
+    # One piece per event from a table of the names with their separators: '"[' before
+    # the first of a row, ', ' before the others, ']"' and a newline after the last, so
+    # a single join and split gives every row
+    names = ['""' + name + '""' for name in EVENT_TYPES]
+    pieces = np.array([", " + name for name in names] + ['"[' + name for name in names]
+                      + [", " + name + ']"\n' for name in names] + ['"[' + name + ']"\n' for name in names],
+                      dtype=object)
+    first = np.zeros(codes.shape, dtype=np.int64)
+    first[:, 0] = 1
+    last = np.zeros(codes.shape, dtype=np.int64)
+    last[np.flatnonzero(lengths), lengths[lengths > 0] - 1] = 2
+    index = (first + last)[used] * len(names) + codes[used]
+    sequences = np.full(len(lengths), "[]", dtype=object)
+    sequences[lengths > 0] = "".join(pieces[index].tolist()).split("\n")[:-1]
+    return sequences.tolist()
+
+
+def _result_lines(cohort: Dict[str, np.ndarray]) -> str:
+    """
+    results.csv rows for a cohort, byte-identical to DataLogger's csv.writer.
+
+    Each column is turned into a list of field strings in one pass (numbers
+    through NumPy; a string column is scanned once and only quoted, once per
+    distinct value, if anything in it needs quoting) and the rows are joined
+    with C-level joins, with no per-field Python code.
+    """
+    columns = []
+    for name in RESULTS_COLUMNS:
+        if name == "action_sequence":
+            columns.append(_action_sequences(cohort))
+            continue
+        values = cohort[name]
+        if values.dtype == bool:
+            columns.append(np.where(values, "True", "False").tolist())
+        elif values.dtype.kind in "iuf":
+            columns.append(values.astype(str).tolist())
+        else:
+            values = values.tolist()
+            text = "".join(values)
+            if any(char in text for char in ',"\r\n'):
+                quoted = {value: _csv_field(value) for value in set(values)}
+                values = list(map(quoted.__getitem__, values))
+            columns.append(values)
+    if not columns[0]:
+        return ""
+    return "\r\n".join(map(",".join, zip(*columns))) + "\r\n"
+
+
+def _compact(value) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def _event_rows(cohort: Dict[str, np.ndarray], puzzles: List[Dict],
+                seed: Optional[int]) -> Tuple[List[str], np.ndarray]:
+    """
+    Interaction events in timestamp order, already encoded as stored rows.
+
+    Lines are character-for-character what InteractionStore.append writes
+    for the same event, with details shaped like the browser's. Each part of
+    a row (prefix, kind, offset, details) is an object array and the parts
+    are concatenated element-wise.
+
+    Returns:
+        The newline-terminated rows and the trial (cohort row) of each
+    """
+    rng = np.random.default_rng(None if seed is None else seed + 1)
+    codes = cohort["codes"]
+    valid = codes >= 0
+    trial, _ = np.nonzero(valid)
+    event_codes = codes[valid]
+    offsets = cohort["offsets"][valid]
+    order = np.argsort(offsets, kind="stable")
+
+    element_pick = rng.random(event_codes.size)
+    slot = rng.integers(0, 6, event_codes.size)
+    # Hint and LOA3 step counters within each trial
+    hint = np.cumsum(event_codes == EVENT_CODES["request_hint"])
+    continues = event_codes == EVENT_CODES["loa3_continue_step"]
+    step = np.cumsum(continues) - continues  # continues before this event
+    trial_first = np.searchsorted(trial, trial)
+    hint_number = hint - np.concatenate(([0], hint))[trial_first]
+    step_index = np.minimum(step - step[trial_first], 4)
+
+    trial, event_codes = trial[order], event_codes[order]
+    element_pick, slot = element_pick[order], slot[order]
+    hint_number, step_index = hint_number[order], step_index[order]
+
+    details = np.full(event_codes.size, "{}", dtype=object)
+    # Element events name one of their puzzle's elements (a flat table with per-puzzle starts)
+    counts = np.array([len(p["elements"]) for p in puzzles])
+    starts = np.cumsum(counts) - counts
+    elements = np.array([_compact(name) for p in puzzles for name in p["elements"]], dtype=object)
+    picked = np.isin(event_codes, list(_ELEMENT_EVENTS))
+    puzzle = cohort["puzzle_index"][trial[picked]]
+    names = elements[starts[puzzle] + (element_pick[picked] * counts[puzzle]).astype(np.int64)]
+    positions = np.array([f',"position":{n}}}' for n in range(6)], dtype=object)
+    ends = np.where(event_codes[picked] == EVENT_CODES["drop_in_solution"], positions[slot[picked]], "}")
+    details[picked] = '{"element":' + names + ends
+    hints = event_codes == EVENT_CODES["request_hint"]
+    if hints.any():
+        numbers = np.array([f'{{"hint_number":{n}}}' for n in range(hint_number[hints].max() + 1)], dtype=object)
+        details[hints] = numbers[hint_number[hints]]
+    steps = np.isin(event_codes, [EVENT_CODES["loa3_continue_step"], EVENT_CODES["loa3_retry_step"]])
+    details[steps] = np.array([f'{{"current_step_index":{n}}}' for n in range(5)], dtype=object)[step_index[steps]]
+    details[np.isin(event_codes, [EVENT_CODES["accept_ai_solution"], EVENT_CODES["reject_ai_solution"]])] = \
+        '{"reasoning_viewed":false}'
+
+    kinds = np.array([_compact(name) if code == OTHER_CODE else str(code)
+                      for code, name in enumerate(EVENT_TYPES)], dtype=object)
+    prefixes = np.array([f"[{_compact(pid)},{puzzle}," for pid, puzzle in
+                         zip(cohort["participant_id"].tolist(), cohort["puzzle_id"].tolist())], dtype=object)
+    times = offsets[order].astype(str).astype(object)
+    rows = prefixes[trial] + kinds[event_codes] + "," + times + "," + details + "]\n"
+    return rows.tolist(), trial
+
+
+def _event_blocks(cohort: Dict[str, np.ndarray], rows: List[str], trial: np.ndarray,
+                  block_bytes: int) -> Iterator[Tuple[bytes, int, List[Tuple[str, str]]]]:
+    """Group event rows into InteractionStore.append_blocks blocks of about block_bytes."""
+    sizes = np.fromiter(map(len, rows), dtype=np.int64, count=len(rows))
+    block = (np.cumsum(sizes) - sizes) // block_bytes
+    bounds = np.concatenate(([0], np.flatnonzero(np.diff(block)) + 1, [len(rows)]))
+    participants = cohort["participant_id"].tolist()
+    puzzle_ids = [str(puzzle) for puzzle in cohort["puzzle_id"].tolist()]
+    for start, end in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        keys = [(participants[t], puzzle_ids[t]) for t in np.unique(trial[start:end]).tolist()]
+        yield "".join(rows[start:end]).encode("utf-8"), end - start, keys
+
+
+def write_cohort(output_dir: str, num_participants: int, profile: Dict, puzzles: List[Dict],
+                 seed: Optional[int] = None, interactions: bool = True,
+                 batch_size: int = DEFAULT_BATCH) -> Dict[str, int]:
+    """
+    Append a synthetic cohort to a data directory through DataLogger's files.
+
+    Args:
+        output_dir: Data directory (results.csv and interactions/)
+        num_participants: Participants to generate
+        profile: Output of fit_profile
+        puzzles: Puzzle definitions
+        seed: Random seed (each batch uses seed + batch number)
+        interactions: Also write interaction events
+        batch_size: Participants generated at a time
+
+    Returns:
+        Counts of participants, results rows and interaction events written
+    """
+    logger = DataLogger(output_dir=output_dir)
+    stats = {"participants": 0, "results": 0, "interactions": 0}
+    try:
+        for batch, first in enumerate(range(0, num_participants, batch_size)):
+            size = min(batch_size, num_participants - first)
+            batch_seed = None if seed is None else seed + 2 * batch
+            cohort = generate_cohort(size, profile, puzzles, batch_seed, first_participant=first + 1)
+            with open(logger.results_file, "a", encoding="utf-8", newline="") as f:
+                f.write(_result_lines(cohort))
+            if interactions:
+                store = logger.interaction_store
+                rows, trial = _event_rows(cohort, puzzles, batch_seed)
+                stats["interactions"] += store.append_blocks(_event_blocks(cohort, rows, trial, store.block_bytes))
+            stats["participants"] += size
+            stats["results"] += size * 4
+    finally:
+        logger.interaction_store.close()
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate a synthetic participant cohort")
+    parser.add_argument("--participants", type=int, default=1000)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--fit", default=os.path.join("data", "results.csv"), help="Real results.csv to fit")
+    parser.add_argument("--puzzles", default=PUZZLES_FILE)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--no-interactions", action="store_true", help="Only write results.csv")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH)
+    args = parser.parse_args(argv)
+
+    if os.path.abspath(args.output) == os.path.abspath(os.path.dirname(args.fit) or "."):
+        print("Refusing to write synthetic data into the real data directory")
+        return 1
+    profile = fit_profile(args.fit)
+    with open(args.puzzles, "r", encoding="utf-8") as f:
+        puzzles = json.load(f)["puzzles"]
+    started = time.perf_counter()
+    stats = write_cohort(args.output, args.participants, profile, puzzles, args.seed,
+                         interactions=not args.no_interactions, batch_size=args.batch_size)
+    print(f"Fitted {profile['rows']} rows from {args.fit}; wrote {stats['participants']} participants, "
+          f"{stats['results']} results rows and {stats['interactions']} interactions to {args.output} "
+          f"in {time.perf_counter() - started:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Checks for the cached analysis pipeline
+"""
+import csv
+import shutil
+
+import pandas as pd
+
+import analysis_pipeline
+from analysis_pipeline import STAGES, AnalysisPipeline, Stage
+
+
+def _add_participant(results_file, new_id, faulty=False):
+    """Append a copy of the first participant's trials under a new id."""
+    with open(results_file, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = list(reader)
+    pid, faulty_col = header.index("participant_id"), header.index("ai_faulty")
+    copies = [list(row) for row in rows if row and row[pid] == rows[0][pid]]
+    for row in copies:
+        row[pid] = new_id
+        row[faulty_col] = str(faulty)
+    with open(results_file, "a", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerows(copies)
+
+
+def _statuses(report):
+    return {name: entry["status"] for name, entry in report.items()}
+
+
+def test_rerun_is_cached_and_new_participant_recomputes_only_what_changed(tmp_path):
+    results = tmp_path / "results.csv"
+    shutil.copy("data/results.csv", results)
+    pipeline = AnalysisPipeline(str(results), str(tmp_path / "analysis"), workers=1, resamples=200)
+
+    first = pipeline.run()
+    assert {entry["status"] for entry in first.values()} <= {"ran", "skipped"}
+    trials = pd.read_csv(tmp_path / "analysis" / "tables" / "trials.csv")
+    assert "Column2" not in trials.columns and "trust_change" in trials.columns
+
+    second = pipeline.run()
+    assert set(_statuses(second).values()) <= {"cached", "skipped"}
+
+    _add_participant(str(results), "NEW001", faulty=False)
+    third = pipeline.run()
+    assert third["clean"]["computed"] == 1 and third["derive"]["computed"] == 1
+    assert third["descriptives"]["status"] == "ran"
+    # A participant without faulty-AI trials leaves the detection table as it was
+    assert third["faulty_detection"]["fingerprint"] == first["faulty_detection"]["fingerprint"]
+    detection = pd.read_csv(tmp_path / "analysis" / "tables" / "faulty_detection.csv")
+    assert detection["sessions"].sum() > 0
+
+
+def test_parallel_run_matches_serial_run(tmp_path):
+    results = tmp_path / "results.csv"
+    shutil.copy("data/results.csv", results)
+    serial = AnalysisPipeline(str(results), str(tmp_path / "serial"), workers=1, resamples=100).run()
+    parallel = AnalysisPipeline(str(results), str(tmp_path / "parallel"), workers=2, resamples=100).run()
+    for name, entry in serial.items():
+        assert parallel[name].get("fingerprint") == entry.get("fingerprint"), name
+
+
+def test_changed_stage_code_invalidates_its_cache(tmp_path, monkeypatch):
+    results = tmp_path / "results.csv"
+    shutil.copy("data/results.csv", results)
+    AnalysisPipeline(str(results), str(tmp_path / "analysis"), workers=1, resamples=100).run()
+
+    def describe_by_loa(trials):
+        return trials.groupby("loa_level")[["completion_time"]].mean().reset_index()
+
+    monkeypatch.setattr(analysis_pipeline, "describe_by_loa", describe_by_loa)
+    stages = [Stage("descriptives", describe_by_loa, ("trials",)) if stage.name == "descriptives" else stage
+              for stage in STAGES]
+    report = AnalysisPipeline(str(results), str(tmp_path / "analysis"), workers=1, resamples=100,
+                              stages=stages).run()
+    assert report["descriptives"]["status"] == "ran" and report["trials"]["status"] == "cached"
+
+
+def test_code_hash_follows_other_repo_modules_and_library_versions(monkeypatch):
+    resampling_hash = analysis_pipeline.code_hash(analysis_pipeline.resampling_tests)
+    describe_hash = analysis_pipeline.code_hash(analysis_pipeline.describe_by_loa)
+
+    def contrast_tests(data, metrics, n_resamples, seed):
+        return []
+
+    # resampling_tests calls resampling.contrast_tests; a change there must invalidate the stage
+    monkeypatch.setattr(analysis_pipeline, "contrast_tests", contrast_tests)
+    assert analysis_pipeline.code_hash(analysis_pipeline.resampling_tests) != resampling_hash
+    assert analysis_pipeline.code_hash(analysis_pipeline.describe_by_loa) == describe_hash
+
+    monkeypatch.setattr(analysis_pipeline, "LIBRARY_VERSIONS", "scipy=0.0")
+    assert analysis_pipeline.code_hash(analysis_pipeline.describe_by_loa) != describe_hash
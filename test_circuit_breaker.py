@@ -0,0 +1,112 @@
+"""
+Checks for the LOA3 circuit breaker and planning deadline
+"""
+import asyncio
+import csv
+
+import pytest
+
+import app as app_module
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from data_logger import RESULTS_COLUMNS, DataLogger
+from model_backends import StubBackend
+from planner_benchmark import run_benchmark, summarize
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_probes_and_closes():
+    clock = FakeClock()
+    breaker = CircuitBreaker(min_calls=4, error_rate=0.5, open_seconds=30, clock=clock)
+    for ok in (True, False, True):
+        assert breaker.allow()
+        breaker.record(ok, 1.0)
+    assert breaker.state == CLOSED  # too few calls to judge
+    breaker.record(False, 1.0)
+    assert breaker.state == OPEN and not breaker.allow()
+    assert breaker.retry_after() == 30
+
+    clock.now = 30
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() and not breaker.allow()  # a single probe at a time
+    breaker.record(False, 1.0)
+    assert breaker.state == OPEN and breaker.opened == 2
+
+    clock.now = 60
+    assert breaker.allow()
+    breaker.record(True, 1.0)
+    assert breaker.state == CLOSED and breaker.snapshot()["rejected"] == 2
+
+
+def test_slow_calls_open_the_breaker_and_old_calls_expire():
+    clock = FakeClock()
+    breaker = CircuitBreaker(window_seconds=60, min_calls=3, slow_call_seconds=5, slow_rate=0.5, clock=clock)
+    breaker.record(True, 9.0)
+    clock.now = 61
+    breaker.record(True, 9.0)
+    breaker.record(True, 0.5)
+    assert breaker.snapshot()["calls"] == 2  # the first call left the window
+    breaker.record(True, 9.0)
+    assert breaker.state == OPEN
+
+
+def test_cancelled_probe_reopens_the_breaker(tmp_path):
+    clock = FakeClock()
+    breaker = CircuitBreaker(min_calls=1, open_seconds=30, clock=clock)
+    breaker.record(False, 1.0)
+    clock.now = 30
+    flask_app = app_module.create_app(data_dir=str(tmp_path), model_backend=StubBackend(latency=0.5),
+                                      circuit_breaker=breaker)
+    puzzle = flask_app.extensions["experiment"].puzzle_data["puzzles"][0]
+
+    async def cancel_probe():
+        probe = asyncio.create_task(app_module._plan_steps_model(puzzle, [], 1, None, False, []))
+        await asyncio.sleep(0.05)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+    with flask_app.app_context():
+        asyncio.run(cancel_probe())
+    assert breaker.state == OPEN and breaker.opened == 2
+    clock.now = 60
+    assert breaker.allow()  # the next probe is admitted
+
+
+def test_deadline_serves_local_plan(monkeypatch):
+    monkeypatch.setattr(app_module, "LOA3_DEADLINE_SECONDS", 0.1)
+    monkeypatch.setenv("LOA3_HEDGE_BUDGET", "0")
+    summary = summarize(run_benchmark(StubBackend(latency=0.5), start_steps=(1,)))
+    assert summary["fallback_rate"] == 1.0
+    assert summary["degraded"]["deadline"] == summary["plans"]
+    assert summary["wall_time"]["max"] < 0.4
+
+
+def test_open_breaker_skips_the_model():
+    backend = StubBackend(error_rate=1.0)
+    breaker = CircuitBreaker(min_calls=2, open_seconds=3600)
+    summary = summarize(run_benchmark(backend, start_steps=(1,), breaker=breaker))
+    assert summary["degraded"]["model_error"] == 2
+    assert summary["degraded"]["breaker_open"] == summary["plans"] - 2
+    assert backend.calls == 2  # nothing reaches the model once the breaker is open
+
+
+def test_degradation_column_is_added_to_old_results(tmp_path):
+    old_header = RESULTS_COLUMNS[:-1] + ["Column2"]
+    with open(tmp_path / "results.csv", "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows([old_header, ["P1"] + [""] * (len(old_header) - 1)])
+
+    logger = DataLogger(output_dir=str(tmp_path))
+    logger.log_puzzle_completion({"participant_id": "P2", "loa_level": 3, "loa3_degradation": "breaker_open;deadline"})
+
+    with open(tmp_path / "results.csv", newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["participant_id"] for row in rows] == ["P1", "P2"]
+    assert rows[0]["loa3_degradation"] is None and rows[1]["Column2"] == ""
+    assert rows[1]["loa3_degradation"] == "breaker_open;deadline"
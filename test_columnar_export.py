@@ -0,0 +1,69 @@
+"""
+Checks for the incremental columnar export
+"""
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from columnar_export import PYARROW_AVAILABLE, ColumnarExporter, load_interactions, load_results
+from data_logger import DataLogger
+
+
+def _log_trial(logger, participant_id, loa_level, puzzle_id, start):
+    logger.log_puzzle_completion({
+        "participant_id": participant_id,
+        "loa_level": loa_level,
+        "puzzle_id": puzzle_id,
+        "ai_faulty": False,
+        "start_time": start,
+        "completion_time": 30.5,
+        "final_correctness": True,
+        "post_trust_survey": {"Q1": 4},
+    })
+
+
+@pytest.mark.parametrize("fmt", ["npy", "parquet"])
+def test_export_is_incremental_and_partitioned(tmp_path, fmt):
+    if fmt == "parquet" and not PYARROW_AVAILABLE:
+        pytest.skip("pyarrow not installed")
+    logger = DataLogger(output_dir=str(tmp_path))
+    _log_trial(logger, "P1", 1, 101, "2025-12-08T10:00:00")
+    _log_trial(logger, "P1", 3, 102, "2025-12-09T10:00:00")
+
+    exporter = ColumnarExporter(str(tmp_path), fmt=fmt)
+    assert len(exporter.export_results()) == 2
+    assert exporter.export_results() == []  # nothing new
+
+    _log_trial(logger, "P2", 3, 101, "2025-12-09T11:00:00")
+    assert len(ColumnarExporter(str(tmp_path), fmt=fmt).export_results()) == 1
+
+    frame = load_results(data_dir=str(tmp_path), refresh=False)
+    assert list(frame["participant_id"]) == ["P1", "P1", "P2"]
+    assert frame["start_time"].dtype == np.dtype("datetime64[us]")
+    assert frame["final_correctness"].dtype == bool
+    assert frame["post_trust_Q1"].tolist() == [4.0, 4.0, 4.0]
+
+    loa3 = load_results(columns=["participant_id", "completion_time"], loa_levels=[3],
+                        data_dir=str(tmp_path), refresh=False)
+    assert list(loa3.columns) == ["participant_id", "completion_time"]
+    assert sorted(loa3["participant_id"]) == ["P1", "P2"]
+    assert len(load_results(dates=["2025-12-08"], data_dir=str(tmp_path), refresh=False)) == 1
+
+
+def test_interactions_wait_for_their_results_row(tmp_path):
+    logger = DataLogger(output_dir=str(tmp_path))
+    logger.log_interaction("P1", 101, "drag_start", "2025-12-08T10:00:01", {"seat": 1})
+
+    exporter = ColumnarExporter(str(tmp_path), fmt="npy")
+    now = datetime(2025, 12, 8, 10, 5)
+    assert exporter.export_interactions(now=now) == []
+    assert len(exporter.state["interactions"]["deferred"]) == 1
+
+    _log_trial(logger, "P1", 2, 101, "2025-12-08T10:00:00")
+    assert len(exporter.export_interactions(now=now)) == 1
+
+    frame = load_interactions(data_dir=str(tmp_path), refresh=False)
+    assert frame["loa_level"].tolist() == [2]
+    assert frame["interaction_type"].tolist() == ["drag_start"]
+    assert frame["details"].tolist() == ['{"seat": 1}']
@@ -0,0 +1,49 @@
+"""
+Checks for the compact interaction event encodings
+"""
+import csv
+import json
+
+import app as app_module
+from event_codec import TrialEvents, decode_event, encode_event
+
+
+def test_trial_events_round_trip_and_summary():
+    events = TrialEvents()
+    for kind, offset in (("drag_start", 0), ("request_hint", 1500), ("custom_click", 1200),
+                         ("request_hint", 90000), ("custom_click", 90001)):
+        events.append(kind, offset)
+    restored = TrialEvents.from_bytes(events.to_bytes())
+    assert list(restored.offsets) == [0, 1500, 1500, 90000, 90001]  # clamped, never backwards
+    assert restored.summarize() == (
+        ["drag_start", "request_hint", "custom_click", "request_hint", "custom_click"], 2, 5)
+    assert len(events.to_bytes()) < 30
+
+
+def test_stored_rows_decode_to_the_logged_dict():
+    logged = {"participant_id": "P1", "puzzle_id": 3, "interaction_type": "drop_in_solution",
+              "timestamp": "2025-12-08T10:00:01.250000", "details": {"element": "Ann", "position": 2}}
+    row = encode_event(logged)
+    assert row[2] == 1 and isinstance(row[3], int)
+    assert decode_event(json.loads(json.dumps(row))) == logged
+
+    odd = dict(logged, interaction_type="custom", timestamp="yesterday")
+    assert decode_event(encode_event(odd)) == odd
+    assert decode_event(logged) is logged
+
+
+def test_submit_derives_metrics_from_session_events(tmp_path):
+    flask_app = app_module.create_app(data_dir=str(tmp_path))
+    client = flask_app.test_client()
+    client.post('/start', json={"participant_id": "T1"})
+    client.get('/puzzle')
+    for kind in ("drag_start", "request_hint", "drop_in_solution", "request_hint"):
+        client.post('/log-interaction', json={"type": kind, "details": {"element": "A"}})
+    client.post('/submit-puzzle', json={"final_answer": "A, B"})
+
+    with open(tmp_path / "results.csv", encoding="utf-8") as f:
+        row = next(csv.DictReader(f))
+    assert json.loads(row["action_sequence"]) == ["drag_start", "request_hint", "drop_in_solution", "request_hint"]
+    assert row["hints_used"] == "2" and row["num_interactions"] == "4"
+    events = flask_app.extensions["experiment"].logger.get_participant_interactions("T1")
+    assert [e["details"] for e in events] == [{"element": "A"}] * 4
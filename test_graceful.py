@@ -0,0 +1,117 @@
+"""
+Checks for graceful reload: persisted sessions, deferred writes and draining
+"""
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+import pytest
+from werkzeug.serving import make_server
+
+import app as app_module
+from data_logger import DataLogger
+from graceful import SECRET_KEY_FILE, DrainingRequestHandler, WriterLock
+
+
+def test_sessions_survive_a_restart(tmp_path, monkeypatch):
+    monkeypatch.delenv("SECRET_KEY", raising=False)
+    client = app_module.create_app(data_dir=str(tmp_path)).test_client()
+    assert client.post("/start", json={"participant_id": "P1"}).status_code == 200
+    assert os.stat(tmp_path / SECRET_KEY_FILE).st_mode & 0o777 == 0o600
+
+    # A new app on the same data directory accepts the old cookie
+    restarted = app_module.create_app(data_dir=str(tmp_path)).test_client()
+    restarted.set_cookie("session", client.get_cookie("session").value)
+    assert restarted.get("/loa-intro").status_code == 200
+
+    monkeypatch.setenv("SECRET_KEY", "configured")
+    other = app_module.create_app(data_dir=str(tmp_path)).test_client()
+    other.set_cookie("session", client.get_cookie("session").value)
+    assert other.get("/loa-intro").status_code == 302
+
+
+def test_deferred_writes_wait_for_the_writer_lock(tmp_path):
+    current = DataLogger(output_dir=str(tmp_path))
+    current.log_interaction("P1", 101, "drop", "2025-12-08T10:00:00")
+    lock = WriterLock(str(tmp_path))
+    assert lock.acquire(blocking=False)
+
+    taking_over = DataLogger(output_dir=str(tmp_path), deferred=True)
+    taking_over.log_interaction("P2", 101, "drop", "2025-12-08T10:00:01")
+    taking_over.log_puzzle_completion({"participant_id": "P2", "loa_level": 1, "puzzle_id": 101})
+    current.log_puzzle_completion({"participant_id": "P1", "loa_level": 1, "puzzle_id": 101})
+    assert not WriterLock(str(tmp_path)).acquire(blocking=False)
+
+    lock.release()
+    assert taking_over.start_writing() == 2
+    with open(taking_over.results_file, encoding="utf-8") as f:
+        assert [line.split(",")[0] for line in f.readlines()[1:]] == ["P1", "P2"]
+    events = [event["participant_id"] for event in taking_over.interaction_store.iter_events()]
+    assert events == ["P1", "P2"]
+
+
+def test_drain_waits_for_in_flight_requests(tmp_path):
+    flask_app = app_module.create_app(data_dir=str(tmp_path))
+    release = threading.Event()
+    flask_app.add_url_rule("/slow", "slow", lambda: "done" if release.wait(10) else "timeout")
+    drain = flask_app.extensions["drain"]
+    server = make_server("127.0.0.1", 0, flask_app, threaded=True, request_handler=DrainingRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+    responses = []
+    request = threading.Thread(target=lambda: responses.append(urllib.request.urlopen(url + "/slow")))
+    try:
+        request.start()
+        while drain.active == 0:
+            time.sleep(0.01)
+        drain.begin_drain()
+        assert not drain.wait(timeout=0.1)
+        release.set()
+        assert drain.wait(timeout=5)
+        request.join()
+        assert responses[0].read() == b"done"
+        assert responses[0].headers["Connection"] == "close"
+        with pytest.raises(urllib.error.HTTPError) as health:
+            urllib.request.urlopen(url + "/healthz")
+        assert health.value.code == 503
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGHUP"), reason="reload needs POSIX signals")
+def test_reload_keeps_serving(tmp_path):
+    repo = os.path.dirname(os.path.abspath(__file__))
+    supervisor = subprocess.Popen(
+        [sys.executable, "graceful.py", "--host", "127.0.0.1", "--port", "0", "--data-dir", str(tmp_path)],
+        cwd=repo, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    try:
+        url = supervisor.stdout.readline().split()[2]
+        stop, errors, served = threading.Event(), [], []
+
+        def browse():
+            while not stop.is_set():
+                try:
+                    served.append(urllib.request.urlopen(url + "/", timeout=10).status)
+                except Exception as exc:
+                    errors.append(exc)
+
+        clients = [threading.Thread(target=browse) for _ in range(2)]
+        for client in clients:
+            client.start()
+        supervisor.send_signal(signal.SIGHUP)
+        assert "reloaded" in supervisor.stdout.readline()
+        time.sleep(1.0)  # the old worker drains while the new one serves
+        stop.set()
+        for client in clients:
+            client.join()
+        assert errors == [] and served
+        supervisor.send_signal(signal.SIGTERM)
+        assert supervisor.wait(timeout=30) == 0
+    finally:
+        if supervisor.poll() is None:
+            supervisor.kill()
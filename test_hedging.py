@@ -0,0 +1,52 @@
+"""
+Checks for hedged LOA3 model requests
+"""
+import asyncio
+import itertools
+
+import app as app_module
+from hedging import HedgePolicy, hedged_call
+from model_backends import StubBackend
+from planner_benchmark import run_benchmark, summarize
+
+
+def test_slow_primary_loses_to_hedge():
+    calls = itertools.count()
+
+    async def call():
+        n = next(calls)
+        await asyncio.sleep(0.5 if n == 0 else 0.01)
+        return n
+
+    policy = HedgePolicy(min_delay=0.05, default_delay=0.05)
+    result, hedge_won = asyncio.run(hedged_call(call, lambda r: True, policy))
+    assert (result, hedge_won) == (1, True)
+    assert policy.snapshot()["hedges"] == 1 and policy.snapshot()["hedge_wins"] == 1
+    # The cancelled primary still counts, with its elapsed time as a lower bound
+    assert policy.snapshot()["samples"] == 2 and max(policy._latencies) >= 0.05
+
+
+def test_budget_limits_hedges():
+    async def slow():
+        await asyncio.sleep(0.02)
+        return "ok"
+
+    policy = HedgePolicy(min_delay=0.001, default_delay=0.001, budget_ratio=0.1, burst=1)
+    for _ in range(10):
+        asyncio.run(hedged_call(slow, lambda r: True, policy))
+    assert policy.snapshot()["hedges"] == 2  # 10% of 10 requests plus a burst of 1
+
+    disabled = HedgePolicy(min_delay=0.001, default_delay=0.001, budget_ratio=0)
+    asyncio.run(hedged_call(slow, lambda r: True, disabled))
+    assert disabled.snapshot()["hedges"] == 0
+
+
+def test_planner_uses_hedge_when_model_stalls(monkeypatch):
+    # Every fourth call stalls; its hedge answers first
+    backend = StubBackend(latency=lambda rng, n=itertools.count(): 0.5 if next(n) % 4 == 0 else 0.0)
+    policy = HedgePolicy(min_delay=0.05, default_delay=0.05, budget_ratio=1.0)
+    monkeypatch.setattr(app_module, "HedgePolicy", lambda **kwargs: policy)
+    summary = summarize(run_benchmark(backend, start_steps=(1,)))
+    assert summary["fallback_rate"] == 0.0 and summary["attempts_mean"] == 1.0
+    assert summary["hedges"] > 0 and summary["hedge_wins"] == summary["hedges"]
+    assert summary["wall_time"]["max"] < 0.4
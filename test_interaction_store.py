@@ -0,0 +1,110 @@
+"""
+Checks for the segmented interaction store
+"""
+import json
+import os
+
+from data_logger import DataLogger
+from event_codec import encode_event
+from interaction_store import InteractionStore
+
+
+def _events(participants=20, puzzles=4, per_puzzle=30):
+    return [
+        {"participant_id": f"P{p:03d}", "puzzle_id": 100 + z, "interaction_type": "drop",
+         "timestamp": f"2025-12-08T10:{k:02d}:00", "details": {"seat": k % 6 + 1, "person": "ABCDEF"[k % 6]}}
+        for p in range(participants) for z in range(puzzles) for k in range(per_puzzle)
+    ]
+
+
+def test_rotation_compression_and_indexed_reads(tmp_path):
+    events = _events()
+    store = InteractionStore(str(tmp_path / "interactions"), max_segment_bytes=32 * 1024, block_bytes=4 * 1024)
+    for event in events:
+        store.append(event)
+    store.flush()
+
+    names = os.listdir(store.directory)
+    assert sum(name.endswith(".jsonl.gz") for name in names) >= 3
+    assert sum(name.endswith(".jsonl") for name in names) == 1  # the active segment
+
+    store.blocks_read = 0
+    own = store.read_participant("P007", puzzle_id=102)
+    assert own == [e for e in events if e["participant_id"] == "P007" and e["puzzle_id"] == 102]
+    assert 0 < store.blocks_read <= 3
+
+    assert store.count() == len(events)
+    assert list(store.iter_events(len(events) - 3)) == events[-3:]
+
+
+def test_legacy_file_is_migrated_and_shrinks(tmp_path):
+    events = _events()
+    legacy = tmp_path / "interactions.json"
+    legacy.write_text(json.dumps(events, indent=2), encoding="utf-8")
+    legacy_size = legacy.stat().st_size
+
+    logger = DataLogger(output_dir=str(tmp_path))
+    logger.interaction_store.flush()
+    assert not legacy.exists()
+    assert (tmp_path / "interactions.json.migrated").exists()
+    assert logger.interaction_store.disk_usage() * 5 < legacy_size
+
+    logger.log_interaction("P001", 101, "hint_request", "2025-12-08T11:00:00")
+    own = logger.get_participant_interactions("P001", 101)
+    assert len(own) == 31 and own[-1]["interaction_type"] == "hint_request"
+
+    reader = InteractionStore(logger.interactions_dir, readonly=True)
+    assert reader.count() == len(events) + 1
+
+
+def test_bulk_append_matches_single_appends(tmp_path):
+    events = _events()
+    single = InteractionStore(str(tmp_path / "single"), max_segment_bytes=32 * 1024)
+    for event in events:
+        single.append(event)
+    single.close()
+    bulk = InteractionStore(str(tmp_path / "bulk"), max_segment_bytes=32 * 1024)
+    bulk.append_many(iter(events))
+    bulk.close()
+
+    assert sorted(os.listdir(bulk.directory)) == sorted(os.listdir(single.directory))
+    assert list(bulk.iter_events()) == list(single.iter_events())
+
+
+def test_prebuilt_blocks_become_sealed_segments_after_the_active_one(tmp_path):
+    events = _events()
+    lines = [(json.dumps(encode_event(e), separators=(",", ":")) + "\n").encode() for e in events]
+    store = InteractionStore(str(tmp_path), max_segment_bytes=32 * 1024)
+    store.append(events[0])
+    blocks = [(b"".join(lines[start:start + 40]), 40,
+               sorted({(e["participant_id"], str(e["puzzle_id"])) for e in events[start:start + 40]}))
+              for start in range(0, len(lines), 40)]
+    assert store.append_blocks(iter(blocks)) == len(events)
+    store.close()
+
+    names = os.listdir(store.directory)
+    assert not any(name.endswith((".jsonl", ".tmp")) for name in names)
+    assert sum(name.endswith(".jsonl.gz") for name in names) >= 3
+    assert list(store.iter_events()) == events[:1] + events
+    assert store.read_participant("P007", puzzle_id=102) == \
+        [e for e in events if e["participant_id"] == "P007" and e["puzzle_id"] == 102]
+
+
+def test_torn_tail_is_skipped_by_readers_and_cut_on_reopen(tmp_path):
+    events = _events(participants=2, puzzles=1, per_puzzle=3)
+    store = InteractionStore(str(tmp_path))
+    store.append_many(events)
+    segment = os.path.join(str(tmp_path), "segment-000001.jsonl")
+    with open(segment, "ab") as f:
+        f.write(b'{"p":"P000","t":')  # a crash in the middle of a write
+
+    readonly = InteractionStore(str(tmp_path), readonly=True)
+    assert list(readonly.iter_events()) == events
+    assert readonly.count() == len(events)
+    assert readonly.read_participant("P000") == events[:3]
+
+    reopened = InteractionStore(str(tmp_path))
+    extra = dict(events[0], timestamp="2025-12-08T11:00:00")
+    reopened.append(extra)
+    reopened.close()
+    assert list(reopened.iter_events()) == events + [extra]
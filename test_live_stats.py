@@ -0,0 +1,86 @@
+"""
+Checks for the incremental live-dashboard aggregates
+"""
+import json
+import threading
+
+import app as app_module
+from data_logger import DataLogger
+from live_stats import LiveAggregator, StreamingMedian
+
+
+def test_streaming_median():
+    median = StreamingMedian()
+    for value in [5, 1, 9, 3]:
+        median.add(value)
+    assert median.value == 4
+    median.add(100)
+    assert median.value == 5
+
+
+def test_aggregator_follows_data_logger_writes(tmp_path):
+    logger = DataLogger(output_dir=str(tmp_path))
+    stats = LiveAggregator()
+    logger.add_listener(stats.on_log)
+
+    logger.log_interaction("P1", 101, "drag_start", "2025-01-01T10:00:00")
+    logger.log_puzzle_completion({"participant_id": "P1", "loa_level": 3, "completion_time": 40.0, "final_correctness": True})
+    logger.log_puzzle_completion({"participant_id": "P2", "loa_level": 3, "completion_time": 60.0, "final_correctness": False})
+    stats.record_model_call()
+    stats.record_model_call(error="json_decode_error")
+
+    snapshot = stats.snapshot()
+    assert snapshot["active_sessions"] == 2
+    assert snapshot["loa"]["3"] == {"completed": 2, "correctness_rate": 0.5, "median_completion_time": 50.0}
+    assert snapshot["model"]["error_rate"] == 0.5
+
+    # Viewers reuse the payload serialised for the current version
+    version, payload = stats.payload()
+    assert stats.payload() == (version, payload)
+    assert json.loads(payload)["total_completed"] == 2
+
+
+def test_wait_for_update_wakes_on_write():
+    stats = LiveAggregator()
+    version, _ = stats.payload()
+    timer = threading.Timer(0.05, stats.record_interaction, args=("P1",))
+    timer.start()
+    new_version, payload = stats.wait_for_update(version, timeout=5)
+    assert new_version > version
+    assert json.loads(payload)["interactions"] == 1
+    assert stats.wait_for_update(new_version, timeout=0.01) == (new_version, None)
+
+
+def test_admin_routes_need_the_token_or_a_local_request(tmp_path, monkeypatch):
+    monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+    client = app_module.create_app(data_dir=str(tmp_path)).test_client()
+    assert client.get("/admin/live/snapshot").status_code == 200
+    assert client.get("/admin/live/snapshot", environ_base={"REMOTE_ADDR": "10.0.0.5"}).status_code == 403
+    assert client.get("/admin/live/snapshot", headers={"X-Forwarded-For": "10.0.0.5"}).status_code == 403
+
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    client = app_module.create_app(data_dir=str(tmp_path)).test_client()
+    assert client.get("/admin/live/snapshot").status_code == 403
+    assert client.get("/admin/live/snapshot?token=secret").status_code == 403
+    assert client.get("/admin/live/snapshot", headers={"X-Admin-Token": "secret"}).status_code == 200
+    assert client.post("/admin/login", data={"token": "wrong"}).status_code == 403
+    assert client.post("/admin/login", data={"token": "secret"}).status_code == 302
+    assert client.get("/admin/live/snapshot").status_code == 200
+    assert b"secret" not in client.get("/admin/live").data
+
+
+def test_a_second_app_does_not_rewire_the_first(tmp_path, monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "first")
+    first = app_module.create_app(data_dir=str(tmp_path / "a"))
+    monkeypatch.setenv("ADMIN_TOKEN", "second")
+    second = app_module.create_app(data_dir=str(tmp_path / "b"))
+
+    client = first.test_client()
+    client.post('/start', json={"participant_id": "P1"})
+    client.get('/puzzle')
+    client.post('/log-interaction', json={"type": "drag_start", "details": {}})
+    assert first.extensions["experiment"].live_stats.snapshot()["interactions"] == 1
+    assert second.extensions["experiment"].live_stats.snapshot()["interactions"] == 0
+    assert first.extensions["experiment"].logger.get_participant_interactions("P1")
+    assert second.extensions["experiment"].logger.get_participant_interactions("P1") == []
+    assert client.get("/admin/live/snapshot", headers={"X-Admin-Token": "first"}).status_code == 200
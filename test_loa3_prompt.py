@@ -0,0 +1,37 @@
+"""
+Checks for the LOA3 prompt builder
+"""
+from loa3_prompt import PromptBuilder, estimate_tokens
+from model_backends import canned_plan
+
+PUZZLE = {"puzzle_id": 1, "prompt": "Seat Ann, Ben and Cy in a row."}
+EXAMPLE = '{"steps": []}'
+
+
+def _steps(n, sentence="I use a constraint to place someone. Then I check it against every other rule."):
+    return [{"step_text": f"Step {i}: {sentence}"} for i in range(1, n + 1)]
+
+
+def test_prefix_is_cached_and_stable():
+    builder = PromptBuilder(5, EXAMPLE)
+    fresh = builder.build(PUZZLE, [], 1, "Ann, Ben, Cy", False)
+    retry = builder.build(PUZZLE, _steps(2), 3, "Ann, Ben, Cy", False)
+    prefix, tokens = builder.prefix(PUZZLE, "Ann, Ben, Cy", False)
+    assert fresh.text.startswith(prefix) and retry.text.startswith(prefix)
+    assert builder.prefix(PUZZLE, "Ann, Ben, Cy", False)[0] is prefix
+    assert fresh.sections["prefix"] == tokens
+    assert abs(fresh.tokens - estimate_tokens(fresh.text)) <= len(fresh.sections)  # per-section rounding
+    assert builder.build(PUZZLE, [], 1, "Ann, Ben, Cy", True).text != fresh.text
+
+    # The stub model still understands the prompt
+    assert '"step_number": 3' in canned_plan(retry.text)
+
+
+def test_budget_compacts_oldest_steps():
+    roomy = PromptBuilder(5, EXAMPLE).build(PUZZLE, _steps(4), 5, "Ann, Ben, Cy", False)
+    assert roomy.compacted_steps == 0
+
+    budget = roomy.sections["prefix"] + roomy.sections["request"] + 40
+    tight = PromptBuilder(5, EXAMPLE, token_budget=budget).build(PUZZLE, _steps(4), 5, "Ann, Ben, Cy", False)
+    assert tight.compacted_steps > 0 and tight.tokens < roomy.tokens
+    assert "Step 4: I use a constraint to place someone. Then I check" in tight.text  # latest kept whole
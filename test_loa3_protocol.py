@@ -0,0 +1,46 @@
+"""
+Checks for the delta-encoded LOA 3 step protocol
+"""
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setenv("FORCE_LOA3_FIRST", "true")
+    monkeypatch.setenv("GEMINI_API_KEY", "")  # static planner
+    client = app_module.create_app(data_dir=str(tmp_path)).test_client()
+    client.post('/start', json={"participant_id": "T1"})
+    client.get('/puzzle')
+    return client
+
+
+def test_steps_arrive_as_patches_with_versions(client):
+    first = client.post('/loa3/start', json={}).json
+    assert first["patch"] == {"from_index": 0, "steps": [first["patch"]["steps"][0]]}
+    assert "steps" not in first and "loa3_state" not in first
+
+    second = client.post('/loa3/step', json={"action": "continue", "version": first["version"]}).json
+    assert second["patch"]["from_index"] == 1 and len(second["patch"]["steps"]) == 1
+    assert second["version"] == first["version"] + 1
+
+    retried = client.post('/loa3/step', json={"action": "retry", "step_number": 2,
+                                              "version": second["version"]}).json
+    assert retried["patch"]["from_index"] == 1 and len(retried["patch"]["steps"]) == 1
+    assert retried["total_retries"] == 1
+
+
+def test_version_mismatch_resyncs_and_errors_hide_the_plan(client):
+    first = client.post('/loa3/start', json={}).json
+    stale = client.post('/loa3/step', json={"action": "continue", "version": first["version"] - 1}).json
+    assert stale["patch"]["from_index"] == 0 and len(stale["patch"]["steps"]) == 2
+
+    for _ in range(3):
+        client.post('/loa3/step', json={"action": "retry", "version": -1})
+    response = client.post('/loa3/step', json={"action": "retry", "version": -1})
+    assert response.status_code == 400
+    body = response.json
+    assert body["error"].startswith("Retry limit")
+    assert "loa3_state" not in body and "all_steps" not in str(body)
+    assert body["patch"]["from_index"] == 0
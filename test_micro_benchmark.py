@@ -0,0 +1,40 @@
+"""
+Checks for the micro-benchmark regression suite
+"""
+import json
+
+from micro_benchmark import best_of, check, main
+
+
+def _report(calibration, **results):
+    return {"calibration": calibration, "results": results}
+
+
+def test_check_normalises_by_calibration():
+    baseline = _report(1.0, fast=1.0, slow=1.0, dropped=1.0)
+    # A machine twice as slow overall is not a regression...
+    assert check(_report(2.0, fast=2.0, slow=2.5, new=9.0), baseline) == []
+    # ...but one benchmark slowing down on its own is
+    lines = check(_report(2.0, fast=2.0, slow=4.0), baseline, threshold=1.5)
+    assert len(lines) == 1 and lines[0].startswith("slow: 2.00x")
+    # Re-runs keep each benchmark's fastest relative time
+    busy, quiet = _report(2.0, fast=2.0, slow=8.0), _report(1.0, fast=3.0, slow=1.2)
+    assert best_of([dict(busy, meta={}), dict(quiet, meta={})])["results"] == {"fast": 1.0, "slow": 1.2}
+
+
+def test_quick_run_saves_and_checks_baseline(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    assert main(["--quick", "--save-baseline", "--runs", "1", "--baseline", str(baseline)]) == 0
+    saved = json.loads(baseline.read_text())
+    assert {"log_interaction[1000]", "export_summary[100]", "validate_loa3_plan"} <= set(saved["results"])
+    assert main(["--quick", "--runs", "1", "--baseline", str(baseline), "--threshold", "100"]) == 0
+
+    saved["results"]["check_correctness"] /= 1000  # pretend it used to be much faster
+    baseline.write_text(json.dumps(saved))
+    assert main(["--quick", "--runs", "2", "--baseline", str(baseline)]) == 1
+
+
+def test_missing_baseline_fails_unless_allowed(tmp_path):
+    missing = str(tmp_path / "missing.json")
+    assert main(["--quick", "--runs", "1", "--baseline", missing]) == 2
+    assert main(["--quick", "--runs", "1", "--baseline", missing, "--allow-missing-baseline"]) == 0
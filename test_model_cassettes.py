@@ -0,0 +1,54 @@
+"""
+Checks for recording and replaying LOA3 model traffic
+"""
+import os
+
+import pytest
+
+from model_backends import ModelError, StubBackend
+from model_cassettes import CassetteStore, RecordingBackend, ReplayBackend, prompt_key
+from planner_benchmark import main, make_backend, run_benchmark, summarize
+
+
+def test_replay_serves_recordings_in_order(tmp_path):
+    path = str(tmp_path / "c.jsonl.gz")
+    answers = iter(["first", "second"])
+    recorder = RecordingBackend(StubBackend(responder=lambda prompt: next(answers)), CassetteStore(path))
+    recorder.generate("p"), recorder.generate("p")
+    with pytest.raises(ModelError):
+        RecordingBackend(StubBackend(error_rate=1.0), CassetteStore(path)).generate("q")
+
+    store = CassetteStore(path)  # reloaded from disk
+    assert len(store) == 3 and prompt_key("p") in store
+    replay = ReplayBackend(store, latency_scale=0)
+    assert [replay.generate("p") for _ in range(3)] == ["first", "second", "first"]
+    with pytest.raises(ModelError):
+        replay.generate("q")
+    with pytest.raises(ModelError):
+        replay.generate("unseen")
+    assert replay.misses == 1
+
+
+def test_torn_last_call_is_skipped_and_cut_before_recording(tmp_path):
+    path = tmp_path / "c.jsonl.gz"
+    recorder = RecordingBackend(StubBackend(responder=lambda prompt: prompt.upper()), CassetteStore(str(path)))
+    for prompt in ("a", "b", "c"):
+        recorder.generate(prompt)
+    os.truncate(path, os.path.getsize(path) - 10)  # died while writing "c"
+
+    store = CassetteStore(str(path))
+    assert len(store) == 2 and prompt_key("c") not in store and store.torn_bytes > 0
+    RecordingBackend(StubBackend(responder=lambda prompt: prompt.upper()), store).generate("d")
+    reloaded = CassetteStore(str(path))
+    assert len(reloaded) == 3 and reloaded.torn_bytes == 0
+    assert ReplayBackend(reloaded, latency_scale=0).generate("d") == "D"
+
+
+def test_replayed_benchmark_matches_recording(tmp_path):
+    path = str(tmp_path / "noisy.jsonl.gz")
+    recorded = summarize(run_benchmark(RecordingBackend(make_backend("noisy", seed=1), CassetteStore(path))))
+    replayed = summarize(run_benchmark(ReplayBackend(CassetteStore(path), latency_scale=0)))
+    for key in ("plans", "attempts_mean", "fallback_rate", "reject_reasons"):
+        assert replayed[key] == recorded[key]
+
+    assert main(["--replay", path, "--latency-scale", "0", "--output", str(tmp_path / "r.json")]) == 0
@@ -0,0 +1,70 @@
+"""
+Checks for the cached welcome and LOA intro pages
+"""
+import os
+import shutil
+
+import app as app_module
+
+
+def _client(tmp_path, monkeypatch):
+    monkeypatch.setenv("FORCE_LOA3_FIRST", "true")
+    monkeypatch.setenv("GEMINI_API_KEY", "")
+    monkeypatch.setenv("PAGE_CACHE_CHECK_INTERVAL", "0")
+    flask_app = app_module.create_app(data_dir=str(tmp_path))
+    # A private copy, so tests can touch template files
+    templates = tmp_path / "templates"
+    shutil.copytree(os.path.join(flask_app.root_path, flask_app.template_folder), templates)
+    flask_app.template_folder = str(templates)
+    return flask_app, flask_app.test_client()
+
+
+def test_intro_matches_a_fresh_render_and_is_rendered_once_per_loa(tmp_path, monkeypatch):
+    flask_app, client = _client(tmp_path, monkeypatch)
+    cache = flask_app.extensions["page_cache"]
+    client.post('/start', json={"participant_id": "T1"})
+    with client.session_transaction() as sess:
+        loa_order = sess['loa_order']
+
+    for step in range(4):
+        with client.session_transaction() as sess:
+            sess['current_step'] = step
+        body = client.get('/loa-intro').get_data(as_text=True)
+        loa = loa_order[step]
+        with flask_app.test_request_context('/loa-intro'):
+            expected = app_module.render_template(
+                'loa_intro.html', loa=loa, loa_info=app_module.LOA_DESCRIPTIONS[loa],
+                step=step + 1, progress=(step + 1) / 4 * 100)
+        assert body == expected
+        assert f"Puzzle {step + 1} of 4" in body
+
+    # A second participant reuses the four variants
+    other = flask_app.test_client()
+    other.post('/start', json={"participant_id": "T2"})
+    other.get('/loa-intro')
+    assert cache.renders == 4
+
+
+def test_etag_revalidation_and_template_change(tmp_path, monkeypatch):
+    flask_app, client = _client(tmp_path, monkeypatch)
+    cache = flask_app.extensions["page_cache"]
+    first = client.get('/')
+    assert first.status_code == 200 and first.headers["ETag"]
+    assert client.get('/', headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+    assert cache.renders == 1
+
+    template = tmp_path / "templates" / "welcome.html"
+    stat = os.stat(template)
+    os.utime(template, (stat.st_atime, stat.st_mtime + 10))
+    again = client.get('/', headers={"If-None-Match": first.headers["ETag"]})
+    assert cache.renders == 2
+    assert again.status_code == 304  # same content, same ETag
+
+
+def test_substitutions_are_escaped(tmp_path, monkeypatch):
+    flask_app, _ = _client(tmp_path, monkeypatch)
+    with flask_app.test_request_context('/loa-intro'):
+        body = flask_app.extensions["page_cache"].respond(
+            'loa_intro.html', key=1, context={'loa': 1, 'loa_info': app_module.LOA_DESCRIPTIONS[1]},
+            substitutions={'step': '<script>alert(1)</script>', 'progress': 25}).get_data(as_text=True)
+    assert '<script>alert(1)</script>' not in body and '&lt;script&gt;alert(1)&lt;/script&gt;' in body
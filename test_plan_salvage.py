@@ -0,0 +1,42 @@
+"""
+Checks for repairing LOA3 model responses and salvaging valid step prefixes
+"""
+import json
+import random
+
+import pytest
+
+from model_backends import StubBackend, canned_plan
+from plan_salvage import parse_plan_json
+from planner_benchmark import run_benchmark, summarize
+
+PROMPT = 'covering Step 1 through Step 5. The final arrangement MUST be exactly: "A, B, C".'
+
+
+def test_repairs_fences_trailing_commas_and_truncation():
+    assert parse_plan_json('{"steps": []}') == ({"steps": []}, False)
+
+    data, repaired = parse_plan_json(canned_plan(PROMPT, "fenced_json"))
+    assert repaired and len(data["steps"]) == 5
+
+    full = json.loads(canned_plan(PROMPT))["steps"]
+    truncated = canned_plan(PROMPT, "json_decode_error", random.Random(1))
+    data, repaired = parse_plan_json(truncated)
+    assert repaired and data["steps"] == full[:len(data["steps"])] and len(data["steps"]) < 5
+
+    with pytest.raises(json.JSONDecodeError):
+        parse_plan_json('{"steps": [{"step_number": 1, "step_text": "Step')
+
+
+def test_rejected_plan_keeps_valid_prefix():
+    prompts = []
+
+    def responder(prompt):
+        prompts.append(prompt)
+        return canned_plan(prompt, "final_sequence_mismatch" if len(prompts) % 2 else None)
+
+    summary = summarize(run_benchmark(StubBackend(responder=responder), start_steps=(1,)))
+    assert summary["fallback_rate"] == 0.0 and summary["attempts_mean"] == 2.0
+    assert summary["salvaged_steps"] == 4 * summary["plans"]
+    assert "covering Step 5 through Step 5" in prompts[1]
+    assert "Step 4: I apply constraint 4" in prompts[1]  # salvaged steps are sent as accepted
@@ -0,0 +1,42 @@
+"""
+Checks for the LOA3 planner benchmark and stub model backend
+"""
+import json
+
+from model_backends import StubBackend, canned_plan
+from planner_benchmark import compare, main, make_backend, run_benchmark, summarize
+
+
+def test_canned_defects_trigger_matching_rejects():
+    backend = StubBackend(defect_rates={"premature_full_sequence": 1.0})
+    rows = run_benchmark(backend, start_steps=(1,))
+    summary = summarize(rows)
+    assert summary["fallback_rate"] == 1.0
+    assert summary["reject_reasons"] == {"premature_full_sequence": 3 * summary["plans"]}
+
+    clean = summarize(run_benchmark(StubBackend(), start_steps=(1, 3)))
+    assert clean["attempts_mean"] == 1.0 and clean["fallback_rate"] == 0.0 and clean["reject_reasons"] == {}
+
+
+def test_scenarios_are_deterministic():
+    first = summarize(run_benchmark(make_backend("noisy", seed=3)))
+    second = summarize(run_benchmark(make_backend("noisy", seed=3)))
+    first.pop("wall_time"), second.pop("wall_time")
+    assert first == second
+
+
+def test_canned_plan_follows_prompt_range():
+    prompt = 'covering Step 3 through Step 5. The final arrangement MUST be exactly: "A, B, C".'
+    steps = json.loads(canned_plan(prompt))["steps"]
+    assert [s["step_number"] for s in steps] == [3, 4, 5]
+    assert steps[-1]["final_sequence"] == "A, B, C"
+
+
+def test_reports_are_saved_and_comparable(tmp_path, capsys):
+    baseline, current = tmp_path / "baseline.json", tmp_path / "current.json"
+    assert main(["--scenario", "clean", "--output", str(baseline)]) == 0
+    assert main(["--scenario", "noisy", "--output", str(current), "--compare", str(baseline)]) == 0
+    assert "fallback_rate" in capsys.readouterr().out
+
+    lines = compare(json.loads(current.read_text()), json.loads(baseline.read_text()))
+    assert any(line.strip().startswith("final_sequence_mismatch") for line in lines)
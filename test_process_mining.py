@@ -0,0 +1,49 @@
+"""
+Checks for the vectorised process-mining helpers
+"""
+import numpy as np
+
+import process_mining as pm
+
+
+def test_transitions_stay_inside_trials():
+    log = pm.encode_action_sequences(
+        ['["drag_start", "drop_in_solution", "drag_start"]', '["request_hint"]', '["unknown", "drag_start"]'],
+        loa_levels=[1, 2, 2],
+    )
+    counts = pm.transition_matrix(log, normalize=False)
+    drag, drop = pm.EVENT_CODES["drag_start"], pm.EVENT_CODES["drop_in_solution"]
+
+    assert counts.sum() == 3
+    assert counts[drag, drop] == 1
+    assert counts[drop, drag] == 1
+    assert counts[pm.OTHER_CODE, drag] == 1
+
+
+def test_ngrams_and_markov_by_loa():
+    log = pm.encode_action_sequences(
+        [["drag_start", "drop_in_solution"], ["drag_start", "drop_in_solution"], ["request_hint", "request_hint"]],
+        loa_levels=[1, 1, 2],
+    )
+    assert pm.ngram_counts(log, 2)[0] == (("drag_start", "drop_in_solution"), 2)
+
+    models = pm.markov_models_by_loa(log)
+    drag, hint = pm.EVENT_CODES["drag_start"], pm.EVENT_CODES["request_hint"]
+    assert models[1]["initial"][drag] == 1.0
+    assert models[2]["transitions"][hint, hint] == 1.0
+    assert not models[3]["counts"].any()
+
+
+def test_dwell_times_from_interactions():
+    interactions = [
+        {"participant_id": "P1", "puzzle_id": 1, "interaction_type": "drop_in_solution", "timestamp": "2025-01-01T10:00:02"},
+        {"participant_id": "P1", "puzzle_id": 1, "interaction_type": "drag_start", "timestamp": "2025-01-01T10:00:00"},
+        {"participant_id": "P2", "puzzle_id": 1, "interaction_type": "drag_start", "timestamp": "2025-01-01T09:00:00"},
+    ]
+    log = pm.encode_interactions(interactions, {("P1", 1): 1})
+
+    assert log.num_trials == 2
+    assert log.trial_keys == [("P1", 1), ("P2", 1)]
+    dwell = pm.dwell_times(log)
+    assert np.allclose(dwell["drag_start"], [2.0])
+    assert "drop_in_solution" not in dwell
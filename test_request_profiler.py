@@ -0,0 +1,71 @@
+"""
+Checks for on-demand request profiling
+"""
+import pstats
+import tracemalloc
+
+import app as app_module
+from request_profiler import aggregate_allocations, load_captures, main
+
+
+def _client(tmp_path, monkeypatch, **env):
+    monkeypatch.setenv("FORCE_LOA3_FIRST", "true")
+    monkeypatch.setenv("GEMINI_API_KEY", "")
+    for key, value in env.items():
+        monkeypatch.setenv(key, value)
+    flask_app = app_module.create_app(data_dir=str(tmp_path))
+    return flask_app, flask_app.test_client()
+
+
+def test_listed_routes_and_admin_header_are_profiled(tmp_path, monkeypatch):
+    flask_app, client = _client(tmp_path, monkeypatch, PROFILE_ROUTES="/log-interaction", ADMIN_TOKEN="secret")
+    client.post('/start', json={"participant_id": "T1"})
+    client.get('/puzzle')
+    client.post('/log-interaction', json={"type": "drag_start"})
+    client.post('/loa3/start', json={}, headers={"X-Profile": "1"})  # not an admin: ignored
+    client.post('/loa3/start', json={}, headers={"X-Profile": "1", "X-Admin-Token": "secret"})
+
+    captures = load_captures(str(tmp_path / "profiles"))
+    assert [c["path"] for c in captures] == ["/log-interaction", "/loa3/start"]
+    assert all(c["status"] == 200 for c in captures)
+
+    # The async view ran on its own loop thread and was still profiled
+    functions = {name for (_, _, name) in pstats.Stats(captures[1]["profile"]).stats}
+    assert "_generate_loa3_step" in functions
+
+    assert main([str(tmp_path / "profiles"), "--top", "5"]) == 0
+    assert main([str(tmp_path / "profiles"), "--route", "/nowhere"]) == 1
+
+
+def test_rotation_keeps_newest_captures(tmp_path, monkeypatch):
+    flask_app, client = _client(tmp_path, monkeypatch, PROFILE_SAMPLE_RATE="1", PROFILE_MAX_FILES="3")
+    for _ in range(5):
+        client.get('/')
+    assert flask_app.extensions["request_profiler"].captured == 5
+    assert len(load_captures(str(tmp_path / "profiles"))) == 3
+    assert sum(1 for _ in (tmp_path / "profiles").glob("*.prof")) == 3
+
+
+def test_only_one_capture_at_a_time_records_allocations(tmp_path, monkeypatch):
+    flask_app, client = _client(tmp_path, monkeypatch, PROFILE_SAMPLE_RATE="1")
+    profiler = flask_app.extensions["request_profiler"]
+    client.get('/')
+    with profiler._allocation_lock:  # another request is being traced
+        client.get('/')
+    client.get('/')
+
+    captures = load_captures(str(tmp_path / "profiles"))
+    assert [c["allocations"] is None for c in captures] == [False, True, False]
+    assert not tracemalloc.is_tracing()
+    assert main([str(tmp_path / "profiles")]) == 0
+
+
+def test_allocations_are_summed_across_requests():
+    captures = [{"allocations": [{"site": "a.py:1", "size_diff": 100, "count_diff": 2}]},
+                {"allocations": None},
+                {"allocations": [{"site": "a.py:1", "size_diff": 50, "count_diff": 1},
+                                 {"site": "b.py:9", "size_diff": 120, "count_diff": 1}]}]
+    assert aggregate_allocations(captures) == [
+        {"site": "a.py:1", "size_diff": 150, "count_diff": 3, "requests": 2},
+        {"site": "b.py:9", "size_diff": 120, "count_diff": 1, "requests": 1},
+    ]
@@ -0,0 +1,54 @@
+"""
+Checks for the vectorised bootstrap / permutation engine
+"""
+import numpy as np
+import pandas as pd
+
+import resampling
+
+
+def _sample_data():
+    rng = np.random.default_rng(1)
+    loa = np.repeat([1, 2, 3, 4], 20)
+    faulty = np.tile([True, False, False, False], 20)
+    time = rng.normal(100, 10, loa.size) + 30 * (loa == 4)
+    trust = np.where(loa == 1, np.nan, rng.normal(3, 0.5, loa.size))
+    return {"loa_level": loa, "ai_faulty": faulty, "completion_time": time, "post_trust_score": trust}
+
+
+def test_contrasts_are_reproducible_and_detect_shift():
+    data = _sample_data()
+    rows = resampling.contrast_tests(data, ["completion_time", "post_trust_score"], n_resamples=2000, seed=7, batch_size=500)
+    again = resampling.contrast_tests(data, ["completion_time", "post_trust_score"], n_resamples=2000, seed=7, batch_size=500)
+    assert rows == again
+
+    by_key = {(r["metric"], r["contrast"]): r for r in rows}
+    shifted = by_key[("completion_time", "LOA1 - LOA4")]
+    assert shifted["ci_high"] < 0
+    assert shifted["p_value"] < 0.01
+
+    # LOA 1 has no trust answers, so its contrasts cannot be estimated
+    assert np.isnan(by_key[("post_trust_score", "LOA1 - LOA2")]["estimate"])
+    assert by_key[("post_trust_score", "LOA2 - LOA3")]["n_a"] == 20
+
+
+def test_grouped_bootstrap_median_interval_contains_estimate():
+    data = _sample_data()
+    result = resampling.grouped_bootstrap(data["completion_time"], data["loa_level"], stat="median",
+                                          n_resamples=1000, seed=3)
+    assert sorted(result) == [1, 2, 3, 4]
+    for stats in result.values():
+        assert stats["ci_low"] <= stats["estimate"] <= stats["ci_high"]
+
+
+def test_frame_arrays_match_the_csv_and_keep_adjustments(tmp_path):
+    path = tmp_path / "results.csv"
+    path.write_text("loa_level,ai_faulty,completion_time,post_trust_Q1,pre_trust_Q1\n"
+                    "1,False,100,,\n3,True,200,4,3\n", encoding="utf-8")
+    df = pd.read_csv(path)
+    from_csv, from_frame = resampling.load_results_arrays(str(path)), resampling.frame_to_arrays(df)
+    for key, values in from_csv.items():
+        np.testing.assert_array_equal(values, from_frame[key])
+
+    df.loc[df["loa_level"] == 3, "completion_time"] -= 70
+    assert resampling.frame_to_arrays(df)["completion_time"].tolist() == [100.0, 130.0]
@@ -0,0 +1,74 @@
+"""
+Checks for sharded data directories and the shard merge tool
+"""
+import csv
+
+import pytest
+
+from data_logger import DataLogger
+from interaction_store import InteractionStore
+from sharding import list_shards, main, merge_shards, shard_for
+
+
+def _complete(logger, pid, puzzle_id, end_time):
+    logger.log_puzzle_completion({"participant_id": pid, "puzzle_id": puzzle_id, "loa_level": 1,
+                                  "end_time": end_time, "completion_time": 10})
+
+
+def test_merge_interleaves_shards_and_drops_resubmissions(tmp_path):
+    a = DataLogger(str(tmp_path), node_id="node-a")
+    b = DataLogger(str(tmp_path), node_id="node-b")
+    _complete(a, "P1", 1, "2025-01-01T10:00:00")
+    _complete(b, "P2", 1, "2025-01-01T10:00:05")
+    _complete(a, "P1", 2, "2025-01-01T10:00:10")
+    _complete(b, "P1", 2, "2025-01-01T10:00:12")  # resubmitted on another node
+    for logger, pid, ts in ((a, "P1", "2025-01-01T10:00:01"), (b, "P2", "2025-01-01T10:00:02"),
+                            (b, "P2", "2025-01-01T10:00:02"), (a, "P1", "2025-01-01T10:00:03")):
+        logger.log_interaction(pid, 1, "drag", ts, {"element": "A"})
+    a.interaction_store.close(), b.interaction_store.close()
+
+    shards = list_shards(str(tmp_path))
+    assert [s.rsplit("/", 1)[-1] for s in shards] == ["node-a", "node-b"]
+    output = tmp_path / "merged"
+    stats = merge_shards(shards, str(output))
+    assert stats["duplicate_results"] == 1 and stats["duplicate_interactions"] == 1
+
+    with open(output / "results.csv", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [(r["participant_id"], r["puzzle_id"]) for r in rows] == [("P1", "1"), ("P2", "1"), ("P1", "2")]
+    assert rows[-1]["end_time"] == "2025-01-01T10:00:10"
+
+    events = list(InteractionStore(str(output / "interactions"), readonly=True).iter_events())
+    assert [e["timestamp"][-2:] for e in events] == ["01", "02", "03"]
+
+    with pytest.raises(FileExistsError):
+        merge_shards(shards, str(output))
+    assert main([str(tmp_path), "--output", str(tmp_path / "again")]) == 0
+
+
+def test_routing_is_stable_and_moves_few_participants():
+    pids = [f"P{i}" for i in range(300)]
+    three = {pid: shard_for(pid, ["a", "b", "c"]) for pid in pids}
+    assert set(three.values()) == {"a", "b", "c"}
+    four = {pid: shard_for(pid, ["a", "b", "c", "d"]) for pid in pids}
+    assert all(four[pid] in (three[pid], "d") for pid in pids)
+
+    with pytest.raises(ValueError):
+        DataLogger("data", node_id="../escape")
+
+
+def test_start_sends_participants_to_their_node(tmp_path, monkeypatch):
+    import app as app_module
+
+    monkeypatch.setenv("HTI_NODES", "a=http://node-a:5000, b=http://node-b:5000/")
+    node_a = app_module.create_app(data_dir=str(tmp_path), node_id="a").test_client()
+    node_b = app_module.create_app(data_dir=str(tmp_path), node_id="b").test_client()
+    pid = next(f"P{i}" for i in range(100) if shard_for(f"P{i}", ["a", "b"]) == "b")
+
+    misdirected = node_a.post('/start', json={"participant_id": pid})
+    assert misdirected.status_code == 421
+    assert misdirected.json["redirect"] == f"http://node-b:5000/?participant_id={pid}"
+    assert node_b.post('/start', json={"participant_id": pid}).status_code == 200
+
+    with pytest.raises(ValueError):
+        app_module.create_app(data_dir=str(tmp_path), node_id="c")
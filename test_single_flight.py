@@ -0,0 +1,94 @@
+"""
+Checks for single-flight coalescing of LOA3 plan requests
+"""
+import asyncio
+import threading
+
+import app as app_module
+from model_backends import StubBackend
+from single_flight import SingleFlight
+
+
+def _in_threads(count, target):
+    """Run target(i) in `count` threads started together, each with its own event loop (as Flask does)."""
+    barrier = threading.Barrier(count)
+    results, errors = [None] * count, []
+
+    def run(i):
+        barrier.wait()
+        try:
+            results[i] = target(i)
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_concurrent_callers_share_one_call_and_get_copies():
+    flights = SingleFlight()
+    started = []
+
+    async def plan():
+        started.append(1)
+        await asyncio.sleep(0.2)
+        return {"steps": [1, 2, 3]}
+
+    results, errors = _in_threads(5, lambda i: asyncio.run(flights.run(("puzzle", 1), plan)))
+    assert errors == [] and len(started) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    results[0][0]["steps"].append(4)
+    assert all(result == {"steps": [1, 2, 3]} for result, _ in results[1:])
+    assert flights.in_flight() == 0 and (flights.calls, flights.coalesced) == (1, 4)
+
+
+def test_failure_reaches_every_waiter_and_is_not_reused():
+    flights = SingleFlight()
+    outcomes = iter([ValueError("model down"), None])
+
+    async def plan():
+        await asyncio.sleep(0.2)
+        error = next(outcomes)
+        if error:
+            raise error
+        return "plan"
+
+    _, errors = _in_threads(3, lambda i: asyncio.run(flights.run("key", plan)))
+    assert len(errors) == 3 and all(str(error) == "model down" for error in errors)
+    assert asyncio.run(flights.run("key", plan)) == ("plan", False)
+
+
+def test_cohort_start_sends_one_model_request_per_plan(tmp_path, monkeypatch):
+    monkeypatch.setenv("LOA3_HEDGE_BUDGET", "0")
+    backend = StubBackend(latency=0.3)
+    flask_app = app_module.create_app(data_dir=str(tmp_path), model_backend=backend)
+    state = flask_app.extensions["experiment"]
+    puzzle = state.puzzle_data["puzzles"][0]
+
+    def start(i):
+        trace = []
+        with flask_app.app_context():
+            steps = asyncio.run(app_module._plan_steps(puzzle, {"is_faulty": i % 2 == 1}, 1, trace=trace))
+        return steps, trace
+
+    results, errors = _in_threads(8, start)
+    assert errors == []
+    assert backend.calls == 2  # one per condition
+    assert sum("coalesced" in trace for _, trace in results) == 6
+    assert state.live_stats.snapshot()["model"]["coalesced"] == 6
+    same_condition = [steps for i, (steps, _) in enumerate(results) if i % 2 == 0]
+    assert all(steps == same_condition[0] and steps is not same_condition[0] for steps in same_condition[1:])
+
+
+def test_sequential_requests_are_not_coalesced(tmp_path):
+    backend = StubBackend()
+    flask_app = app_module.create_app(data_dir=str(tmp_path), model_backend=backend)
+    puzzle = flask_app.extensions["experiment"].puzzle_data["puzzles"][0]
+    with flask_app.app_context():
+        for _ in range(2):
+            asyncio.run(app_module._plan_steps(puzzle, {"is_faulty": False}, 1))
+    assert backend.calls == 2
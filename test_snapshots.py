@@ -0,0 +1,106 @@
+"""
+Checks for online data directory snapshots
+"""
+import csv
+import os
+import threading
+
+import pytest
+
+from data_logger import DataLogger
+from interaction_store import InteractionStore
+from snapshots import Snapshotter
+
+
+def _log_trial(logger, participant, events=5):
+    for k in range(events):
+        logger.log_interaction(participant, 101, "drop", f"2025-12-08T10:00:{k:02d}", {"seat": k})
+    logger.log_puzzle_completion({"participant_id": participant, "loa_level": 1, "puzzle_id": 101})
+
+
+def _restored(tmp_path, snapshotter, snapshot_id):
+    target = tmp_path / f"restored-{snapshot_id}"
+    snapshotter.restore(snapshot_id, str(target))
+    with open(target / "results.csv", "r", encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+    events = list(InteractionStore(str(target / "interactions"), readonly=True).iter_events())
+    return rows, events
+
+
+@pytest.fixture
+def logger(tmp_path):
+    logger = DataLogger(output_dir=str(tmp_path / "data"))
+    logger.interaction_store.max_segment_bytes = 2048
+    return logger
+
+
+def test_incremental_snapshot_copies_only_new_data(tmp_path, logger):
+    snapshotter = Snapshotter(logger.output_dir, str(tmp_path / "snapshots"), logger=logger)
+    for p in range(20):
+        _log_trial(logger, f"P{p:02d}")
+    logger.interaction_store.flush()
+    first = snapshotter.take()
+    assert first["base"] is None and first["copied_bytes"] == first["total_bytes"]
+
+    _log_trial(logger, "P20")
+    second = snapshotter.take()
+    assert second["base"] == first["id"]
+    assert 0 < second["copied_bytes"] < second["total_bytes"] / 4
+    assert snapshotter.verify(second["id"]) == []
+
+    rows, events = _restored(tmp_path, snapshotter, second["id"])
+    assert [row["participant_id"] for row in rows] == [f"P{p:02d}" for p in range(21)]
+    assert events == list(logger.interaction_store.iter_events())
+    rows, _ = _restored(tmp_path, snapshotter, first["id"])
+    assert len(rows) == 20
+
+
+def test_snapshots_are_consistent_under_concurrent_writes(tmp_path, logger):
+    in_process = Snapshotter(logger.output_dir, str(tmp_path / "snapshots"), logger=logger)
+    external = Snapshotter(logger.output_dir, str(tmp_path / "external"))
+    stop = threading.Event()
+
+    def writer():
+        p = 0
+        while not stop.is_set():
+            _log_trial(logger, f"W{p:04d}")
+            p += 1
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        taken = [(snapshotter, snapshotter.take()) for _ in range(4) for snapshotter in (in_process, external)]
+    finally:
+        stop.set()
+        thread.join()
+
+    for snapshotter, manifest in taken:
+        assert snapshotter.verify(manifest["id"]) == []
+        rows, events = _restored(tmp_path, snapshotter, manifest["id"])
+        counts = {}
+        for event in events:
+            counts[event["participant_id"]] = counts.get(event["participant_id"], 0) + 1
+        # Every results row has all of its trial's events
+        assert all(counts.get(row["participant_id"]) == 5 for row in rows)
+
+
+def test_rewritten_file_is_copied_again_and_corruption_is_reported(tmp_path, logger):
+    snapshotter = Snapshotter(logger.output_dir, str(tmp_path / "snapshots"))
+    _log_trial(logger, "P01")
+    first = snapshotter.take()
+
+    # A rewritten header (as DataLogger's column upgrade does) is not an append
+    with open(logger.results_file, "r", encoding="utf-8", newline="") as f:
+        content = f.read()
+    with open(logger.results_file, "w", encoding="utf-8", newline="") as f:
+        f.write(content.replace("loa3_degradation", "loa3_degradation,extra", 1))
+    second = snapshotter.take()
+    parts = second["files"]["results.csv"]["parts"]
+    assert len(parts) == 1 and parts[0]["snapshot"] == second["id"]
+
+    part = os.path.join(snapshotter.snapshot_dir, first["id"], "files", "results.csv")
+    with open(part, "ab") as f:
+        f.write(b"tampered")
+    assert snapshotter.verify(first["id"]) and snapshotter.verify(second["id"]) == []
+    with pytest.raises(ValueError):
+        snapshotter.restore(first["id"], str(tmp_path / "restored"))
@@ -0,0 +1,58 @@
+"""
+Startup-time benchmark for app.py
+
+Measures, in a fresh interpreter, how long `import app` takes and how long
+it takes from there to the first served request. Run directly to print the
+numbers; under pytest the budgets below guard against regressions such as
+importing the Gemini SDK at module level again.
+"""
+import json
+import os
+import subprocess
+import sys
+
+IMPORT_BUDGET_SECONDS = 1.0
+FIRST_REQUEST_BUDGET_SECONDS = 1.5  # import + create_app() + GET /
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.create_app(data_dir=sys.argv[1]).test_client()
+status = client.get('/').status_code
+served = time.perf_counter()
+print(json.dumps({
+    "import": imported - started,
+    "first_request": served - started,
+    "status": status,
+    "genai_loaded": "google.generativeai" in sys.modules,
+}))
+"""
+
+
+def benchmark_startup(data_dir):
+    """Return timings from a fresh interpreter (Gemini configured, so the lazy path is exercised)."""
+    repo = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, GEMINI_API_KEY="benchmark", GEMINI_MODEL_NAME="benchmark")
+    output = subprocess.run([sys.executable, "-c", _PROBE, str(data_dir)], cwd=repo, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_startup_budget(tmp_path):
+    timings = min((benchmark_startup(tmp_path) for _ in range(3)), key=lambda t: t["first_request"])
+    assert timings["status"] == 200
+    assert not timings["genai_loaded"], "google.generativeai must load lazily"
+    assert timings["import"] < IMPORT_BUDGET_SECONDS, timings
+    assert timings["first_request"] < FIRST_REQUEST_BUDGET_SECONDS, timings
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        result = benchmark_startup(data_dir)
+    print(f"import app:          {result['import'] * 1000:7.1f} ms (budget {IMPORT_BUDGET_SECONDS * 1000:.0f} ms)")
+    print(f"first request ready: {result['first_request'] * 1000:7.1f} ms (budget {FIRST_REQUEST_BUDGET_SECONDS * 1000:.0f} ms)")
+    print(f"Gemini SDK loaded:   {result['genai_loaded']}")
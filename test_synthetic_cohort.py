@@ -0,0 +1,79 @@
+"""
+Checks for the synthetic cohort generator
+"""
+import csv
+import io
+import json
+
+import numpy as np
+import pytest
+
+from data_logger import RESULTS_COLUMNS, DataLogger
+from event_codec import decode_event, encode_event
+from interaction_store import InteractionStore
+from synthetic_cohort import _event_blocks, _event_rows, _result_lines, fit_profile, generate_cohort, write_cohort
+
+
+@pytest.fixture(scope="module")
+def profile():
+    return fit_profile("data/results.csv")
+
+
+@pytest.fixture(scope="module")
+def puzzles():
+    with open("logic_puzzles.json", "r", encoding="utf-8") as f:
+        return json.load(f)["puzzles"]
+
+
+def test_sessions_are_randomised_like_initialize_session(profile, puzzles):
+    cohort = generate_cohort(500, profile, puzzles, seed=3)
+    loa = cohort["loa_level"].reshape(-1, 4)
+    assert (np.sort(loa, axis=1) == [1, 2, 3, 4]).all()
+    assert all(len(set(row)) == 4 for row in cohort["puzzle_id"].reshape(-1, 4).tolist())
+    faulty = cohort["ai_faulty"].reshape(-1, 4)
+    assert faulty.sum(axis=1).max() == 1 and not faulty[loa == 1].any()
+    assert 0.4 < faulty.any(axis=1).mean() < 0.6
+
+    codes = cohort["codes"]
+    assert ((codes >= 0).sum(axis=1) == cohort["num_interactions"]).all()
+    assert ((codes == 4).sum(axis=1) == cohort["hints_used"]).all()  # request_hint
+    assert (cohort["end_time"] > cohort["start_time"]).all()
+
+
+def test_rows_match_csv_writer_and_events_match_the_store(profile, puzzles):
+    cohort = generate_cohort(50, profile, puzzles, seed=5)
+    text = _result_lines(cohort)
+    rows = list(csv.reader(io.StringIO(text)))
+    expected = io.StringIO()
+    csv.writer(expected).writerows(rows)
+    assert text == expected.getvalue()
+    assert all(len(row) == len(RESULTS_COLUMNS) for row in rows)
+
+    lines, trial = _event_rows(cohort, puzzles, seed=5)
+    events = [decode_event(json.loads(line)) for line in lines]
+    assert [e["timestamp"] for e in events] == sorted(e["timestamp"] for e in events)
+    assert [e["participant_id"] for e in events] == cohort["participant_id"][trial].tolist()
+    # Identical to what InteractionStore.append writes for the same event
+    assert lines == [json.dumps(encode_event(e), separators=(",", ":"), ensure_ascii=False) + "\n"
+                     for e in events]
+
+    blocks = list(_event_blocks(cohort, lines, trial, block_bytes=4096))
+    assert len(blocks) > 1 and b"".join(data for data, _, _ in blocks) == "".join(lines).encode()
+    assert sum(rows for _, rows, _ in blocks) == len(lines)
+
+
+def test_write_cohort_is_readable_by_the_logger(profile, puzzles, tmp_path):
+    stats = write_cohort(str(tmp_path), 30, profile, puzzles, seed=1, batch_size=8)
+    assert stats["results"] == 120
+    with open(tmp_path / "results.csv", "r", encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 120 and rows[-1]["participant_id"] == "SYN0000030"
+
+    store = InteractionStore(str(tmp_path / "interactions"), readonly=True)
+    assert all(compressed for _, compressed in store._segments())
+    assert store.count() == stats["interactions"] == sum(int(row["num_interactions"]) for row in rows)
+    events = store.read_participant("SYN0000007")
+    assert {str(e["puzzle_id"]) for e in events} <= {row["puzzle_id"] for row in rows
+                                                     if row["participant_id"] == "SYN0000007"}
+    assert events == [e for e in store.iter_events() if e["participant_id"] == "SYN0000007"]
+    assert DataLogger(output_dir=str(tmp_path)).export_summary()
@@ -0,0 +1,92 @@
+"""
+Checks for the streaming per-trial feature pipeline
+"""
+import json
+import math
+import os
+import random
+
+import pytest
+
+from data_logger import DataLogger
+from trial_features import build_features, external_sort, load_features, merge_join, trial_features
+
+
+def _log_trial(logger, participant_id, loa_level, puzzle_id, minute):
+    start = f"2025-12-08T10:{minute:02d}:00"
+    logger.log_puzzle_completion({
+        "participant_id": participant_id, "loa_level": loa_level, "puzzle_id": puzzle_id,
+        "ai_faulty": False, "start_time": start, "completion_time": 60.0, "final_correctness": True,
+    })
+    events = [("drag_start", 2, {}), ("drop_in_solution", 3, {}), ("request_hint", 20, {}),
+              ("loa3_retry_step", 21, {"current_step_index": 1}), ("drag_start", 40, {})]
+    for kind, second, details in events:
+        logger.log_interaction(participant_id, puzzle_id, kind, f"2025-12-08T10:{minute:02d}:{second:02d}", details)
+
+
+def test_external_sort_spills_and_stays_stable(tmp_path):
+    rows = [{"k": random.Random(i).randint(0, 9), "i": i} for i in range(50)]
+    result = list(external_sort(rows, key=lambda r: r["k"], chunk_rows=7, tmp_dir=str(tmp_path)))
+    assert result == sorted(rows, key=lambda r: r["k"])
+    assert list(tmp_path.iterdir()) == []  # runs are cleaned up
+
+
+def test_merge_join_counts_unmatched_sides():
+    results = [{"participant_id": "A", "puzzle_id": "1"}, {"participant_id": "B", "puzzle_id": "2"}]
+    events = [{"participant_id": "A", "puzzle_id": 1}, {"participant_id": "A", "puzzle_id": 3},
+              {"participant_id": "C", "puzzle_id": 1}]
+    stats = {}
+    joined = list(merge_join(results, events, stats))
+    assert [len(e) for _, e in joined] == [1, 0]
+    assert stats == {"trials": 2, "events": 1, "trials_without_events": 1, "unmatched_events": 2}
+
+
+def test_trial_features():
+    result = {"participant_id": "A", "puzzle_id": "1", "start_time": "2025-12-08T10:00:00"}
+    events = [
+        {"interaction_type": "drag_start", "timestamp": "2025-12-08T10:00:02"},
+        {"interaction_type": "request_hint", "timestamp": "2025-12-08T10:00:20"},
+        {"interaction_type": "loa3_retry_step", "timestamp": "2025-12-08T10:00:21",
+         "details": {"current_step_index": 2}},
+    ]
+    row = trial_features(result, events)
+    assert row["first_action_latency"] == 2.0
+    assert row["drag_count"] == 1 and row["hint_count"] == 1
+    assert row["first_hint_time"] == 20.0
+    assert (row["idle_gaps"], row["idle_gap_max"]) == (1, 18.0)
+    assert row["first_retry_step"] == 3 and json.loads(row["loa3_retry_steps"]) == [3]
+    assert math.isnan(trial_features(result, [])["first_action_latency"])
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_build_features_streams_both_inputs(tmp_path, workers):
+    logger = DataLogger(output_dir=str(tmp_path))
+    for minute, (participant, loa, puzzle) in enumerate([("P2", 3, 1), ("P1", 1, 2), ("P1", 3, 1), ("P3", 2, 4)]):
+        _log_trial(logger, participant, loa, puzzle, minute)
+    logger.log_interaction("P9", 1, "drag_start", "2025-12-08T11:00:00", {})  # never completed
+    logger.interaction_store.close()
+
+    stats = build_features(str(tmp_path), workers=workers, chunk_rows=3, trials_per_task=1, part_rows=2, fmt="npy")
+    assert stats["trials"] == 4 and stats["events"] == 20 and stats["unmatched_events"] == 1
+
+    frame = load_features(data_dir=str(tmp_path))
+    assert list(frame["participant_id"]) == ["P2", "P1", "P1", "P3"]  # by start_time
+    assert frame["drag_count"].tolist() == [2, 2, 2, 2]
+    assert frame["first_action_latency"].tolist() == [2.0] * 4
+    assert frame["first_retry_step"].tolist() == [2] * 4
+    assert load_features(data_dir=str(tmp_path), loa_levels=[3])["puzzle_id"].tolist() == [1, 1]
+
+
+def test_build_features_replaces_only_a_feature_table(tmp_path):
+    logger = DataLogger(output_dir=str(tmp_path))
+    _log_trial(logger, "P1", 1, 2, 0)
+    logger.interaction_store.close()
+    output = tmp_path / "features"
+    build_features(str(tmp_path), str(output), workers=1, fmt="npy")
+    build_features(str(tmp_path), str(output), workers=1, fmt="npy")  # rebuilt in place
+    assert len(load_features(output_dir=str(output))) == 1
+    assert sorted(os.listdir(tmp_path)) == sorted(["features", "interactions", "results.csv"])
+
+    with pytest.raises(ValueError):
+        build_features(str(tmp_path), str(tmp_path), workers=1, fmt="npy")
+    assert (tmp_path / "results.csv").exists()
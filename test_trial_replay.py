@@ -0,0 +1,56 @@
+"""
+Checks for the trial replay timelines
+"""
+import json
+
+from data_logger import DataLogger
+from process_mining import EVENT_CODES
+from trial_replay import ReplayService
+
+
+PUZZLE = {"puzzle_id": 101, "elements": ["A", "B", "C"]}
+
+
+def _log(logger, kind, second, **details):
+    logger.log_interaction("P1", 101, kind, f"2025-12-08T10:00:{second:02d}", details)
+
+
+def test_replay_rebuilds_board_and_caches_completed_trials(tmp_path):
+    logger = DataLogger(output_dir=str(tmp_path))
+    _log(logger, "drag_start", 1, element="B")
+    _log(logger, "drop_in_solution", 2, element="B", position=1)
+    _log(logger, "drop_in_solution", 3, element="A", position=1)
+    _log(logger, "request_hint", 4, hint_number=1)
+    _log(logger, "return_to_pool", 5, element="B")
+    logger.log_interaction("P2", 101, "drag_start", "2025-12-08T10:00:01", {"element": "C"})
+
+    service = ReplayService(logger, [PUZZLE])
+    in_progress = json.loads(service.replay("P1", 101))
+    assert in_progress["complete"] is False
+    assert service._cache == {}
+
+    logger.log_puzzle_completion({"participant_id": "P1", "loa_level": 2, "puzzle_id": 101,
+                                  "start_time": "2025-12-08T10:00:00", "final_answer": "A"})
+    payload = service.replay("P1", 101)
+    timeline = json.loads(payload)
+    assert timeline["complete"] is True and timeline["loa_level"] == 2
+    assert [e[0] for e in timeline["events"]] == [EVENT_CODES[k] for k in
+                                                  ("drag_start", "drop_in_solution", "drop_in_solution",
+                                                   "request_hint", "return_to_pool")]
+    assert [e[1] for e in timeline["events"]] == [1000, 2000, 3000, 4000, 5000]
+    boards = [[timeline["elements"][i] for i in timeline["boards"][e[2]]] for e in timeline["events"]]
+    assert boards == [[], ["B"], ["A", "B"], ["A", "B"], ["A"]]
+    assert timeline["events"][3][3] == 1
+
+    assert service.replay("P1", 101) is payload  # served from the cache
+    assert service.replay("P9", 101) is None
+
+
+def test_loa4_board_starts_prefilled(tmp_path):
+    logger = DataLogger(output_dir=str(tmp_path))
+    logger.log_puzzle_completion({"participant_id": "P1", "loa_level": 4, "puzzle_id": 101,
+                                  "start_time": "2025-12-08T10:00:00"})
+    _log(logger, "return_to_pool", 1, element="A")
+
+    timeline = json.loads(ReplayService(logger, [PUZZLE]).replay("P1", 101))
+    assert timeline["boards"][timeline["events"][0][2]] == [1, 2]
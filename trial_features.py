@@ -0,0 +1,416 @@
+"""
+Per-trial feature extraction across results.csv and the interaction log.
+
+Each results row (one completed trial) is joined to its interaction events
+by (participant_id, puzzle_id) and reduced to one feature row: first-action
+latency, drag/drop counts, idle gaps, hint timing, LOA3 retry positions and
+so on (see FEATURE_SCHEMA).
+
+The pipeline never loads either input fully:
+
+    1. Both inputs are sorted by trial with an external sort: up to
+       `chunk_rows` rows are sorted in memory, and larger inputs are
+       spilled to sorted runs in a temporary directory and k-way merged.
+    2. The two sorted streams are merge-joined; only one trial's events
+       are held at a time.
+    3. Joined trials are batched into chunks and reduced in a process pool,
+       with at most two chunks per worker in flight.
+    4. Feature rows are written as typed columnar parts partitioned by
+       study date and LOA (the columnar_export layout), a part at a time.
+
+Usage:
+    python trial_features.py [--data-dir data] [--output data/export/features]
+                             [--workers 4] [--chunk-rows 100000]
+
+    from trial_features import load_features
+    df = load_features(loa_levels=[3])
+"""
+
+import argparse
+import csv
+import heapq
+import json
+import os
+import shutil
+import sys
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import groupby, islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from columnar_export import PYARROW_AVAILABLE, _load_dataset, _write_partitions, encode_column
+from interaction_store import InteractionStore
+
+
+DEFAULT_CHUNK_ROWS = 100_000
+DEFAULT_TRIALS_PER_TASK = 500
+DEFAULT_PART_ROWS = 50_000
+IDLE_GAP_SECONDS = 10.0  # a pause at least this long counts as an idle gap
+
+# Column kinds as in columnar_export
+FEATURE_SCHEMA = {
+    "participant_id": "dict",
+    "puzzle_id": "int",
+    "loa_level": "int",
+    "ai_faulty": "bool",
+    "start_time": "timestamp",
+    "completion_time": "float",
+    "final_correctness": "bool",
+    "num_events": "int",
+    "first_action_latency": "float",
+    "drag_count": "int",
+    "drop_count": "int",
+    "return_count": "int",
+    "clear_count": "int",
+    "idle_gaps": "int",  # pauses of at least IDLE_GAP_SECONDS between events
+    "idle_gap_max": "float",
+    "idle_gap_mean": "float",  # mean pause between consecutive events
+    "hint_count": "int",
+    "first_hint_time": "float",
+    "last_hint_time": "float",
+    "loa3_retry_count": "int",
+    "first_retry_step": "int",
+    "loa3_retry_steps": "str",
+}
+
+
+def trial_key(row: Dict) -> Tuple[str, str]:
+    """(participant_id, puzzle_id) as strings, so CSV rows and logged events compare equal."""
+    return str(row.get("participant_id", "")), str(row.get("puzzle_id", ""))
+
+
+def _event_sort_key(event: Dict) -> Tuple[str, str, str]:
+    return trial_key(event) + (str(event.get("timestamp", "")),)
+
+
+# ---------------------------------------------------------------------- external sort
+
+def _write_run(rows: List[Dict], directory: str, number: int) -> str:
+    path = os.path.join(directory, f"run-{number:05d}.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False, separators=(",", ":")))
+            f.write("\n")
+    return path
+
+
+def _read_run(path: str) -> Iterator[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def external_sort(rows: Iterable[Dict], key: Callable[[Dict], tuple], chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                  tmp_dir: Optional[str] = None) -> Iterator[Dict]:
+    """
+    Yield `rows` sorted by `key`, holding at most `chunk_rows` rows in memory.
+
+    Inputs that fit in one chunk are sorted in memory. Larger inputs are
+    written to sorted runs under `tmp_dir` and merged; the sort is stable.
+    """
+    iterator = iter(rows)
+    first = list(islice(iterator, chunk_rows))
+    first.sort(key=key)
+    if len(first) < chunk_rows:
+        yield from first
+        return
+
+    with tempfile.TemporaryDirectory(prefix="sort-", dir=tmp_dir) as directory:
+        runs = [_write_run(first, directory, 0)]
+        del first
+        while True:
+            chunk = list(islice(iterator, chunk_rows))
+            if not chunk:
+                break
+            chunk.sort(key=key)
+            runs.append(_write_run(chunk, directory, len(runs)))
+        yield from heapq.merge(*(_read_run(path) for path in runs), key=key)
+
+
+# ---------------------------------------------------------------------- join
+
+def merge_join(results: Iterable[Dict], events: Iterable[Dict],
+               stats: Optional[Dict[str, int]] = None) -> Iterator[Tuple[Dict, List[Dict]]]:
+    """
+    Join sorted results rows to sorted events by trial.
+
+    Args:
+        results: Results rows sorted by trial_key
+        events: Interaction events sorted by trial_key (then timestamp)
+        stats: Optional dict that receives counts of trials, joined events,
+            trials without events and events without a results row
+
+    Returns:
+        Iterator of (results row, that trial's events) for every results row
+    """
+    stats = stats if stats is not None else {}
+    for name in ("trials", "events", "trials_without_events", "unmatched_events"):
+        stats.setdefault(name, 0)
+
+    event_groups = groupby(events, key=trial_key)
+    current = next(event_groups, None)
+    for key, rows in groupby(results, key=trial_key):
+        while current is not None and current[0] < key:
+            stats["unmatched_events"] += sum(1 for _ in current[1])
+            current = next(event_groups, None)
+        trial_events: List[Dict] = []
+        if current is not None and current[0] == key:
+            trial_events = list(current[1])
+            current = next(event_groups, None)
+        for row in rows:  # a resubmitted puzzle shares its events
+            stats["trials"] += 1
+            stats["events"] += len(trial_events)
+            if not trial_events:
+                stats["trials_without_events"] += 1
+            yield row, trial_events
+    while current is not None:
+        stats["unmatched_events"] += sum(1 for _ in current[1])
+        current = next(event_groups, None)
+
+
+# ---------------------------------------------------------------------- features
+
+def _parse_time(value) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+    return moment.replace(tzinfo=None) if moment.tzinfo is not None else moment
+
+
+def _seconds(later: Optional[datetime], earlier: Optional[datetime]) -> float:
+    if later is None or earlier is None:
+        return float("nan")
+    return (later - earlier).total_seconds()
+
+
+def trial_features(result: Dict, events: Sequence[Dict]) -> Dict:
+    """
+    Feature row for one trial.
+
+    Args:
+        result: The trial's results.csv row
+        events: The trial's interaction events in time order
+
+    Returns:
+        Dict with one value per FEATURE_SCHEMA column (times in seconds
+        from the trial start; NaN or -1 where a feature does not apply)
+    """
+    start = _parse_time(result.get("start_time"))
+    counts = {"drag_start": 0, "drop_in_solution": 0, "return_to_pool": 0, "clear_solution": 0}
+    hint_times: List[float] = []
+    retry_steps: List[int] = []
+    gaps: List[float] = []
+    first_time = previous = None
+
+    for event in events:
+        kind = event.get("interaction_type")
+        moment = _parse_time(event.get("timestamp"))
+        if moment is not None:
+            if first_time is None:
+                first_time = moment
+            if previous is not None:
+                gaps.append(max((moment - previous).total_seconds(), 0.0))
+            previous = moment
+        if kind in counts:
+            counts[kind] += 1
+        elif kind == "request_hint":
+            hint_times.append(_seconds(moment, start))
+        elif kind == "loa3_retry_step":
+            index = (event.get("details") or {}).get("current_step_index")
+            retry_steps.append(int(index) + 1 if isinstance(index, (int, float)) else -1)
+
+    idle = [gap for gap in gaps if gap >= IDLE_GAP_SECONDS]
+    return {
+        "participant_id": result.get("participant_id", ""),
+        "puzzle_id": result.get("puzzle_id"),
+        "loa_level": result.get("loa_level"),
+        "ai_faulty": result.get("ai_faulty"),
+        "start_time": result.get("start_time"),
+        "completion_time": result.get("completion_time"),
+        "final_correctness": result.get("final_correctness"),
+        "num_events": len(events),
+        "first_action_latency": _seconds(first_time, start),
+        "drag_count": counts["drag_start"],
+        "drop_count": counts["drop_in_solution"],
+        "return_count": counts["return_to_pool"],
+        "clear_count": counts["clear_solution"],
+        "idle_gaps": len(idle),
+        "idle_gap_max": max(gaps) if gaps else float("nan"),
+        "idle_gap_mean": sum(gaps) / len(gaps) if gaps else float("nan"),
+        "hint_count": len(hint_times),
+        "first_hint_time": hint_times[0] if hint_times else float("nan"),
+        "last_hint_time": hint_times[-1] if hint_times else float("nan"),
+        "loa3_retry_count": len(retry_steps),
+        "first_retry_step": retry_steps[0] if retry_steps else -1,
+        "loa3_retry_steps": json.dumps(retry_steps),
+    }
+
+
+def _features_for_chunk(chunk: List[Tuple[Dict, List[Dict]]]) -> List[Dict]:
+    return [trial_features(result, events) for result, events in chunk]
+
+
+def _chunks(pairs: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(pairs)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _map_chunks(chunks: Iterable[List], workers: int) -> Iterator[List[Dict]]:
+    """Feature rows per chunk, in input order, with at most 2 * workers chunks in flight."""
+    if workers <= 1:
+        yield from map(_features_for_chunk, chunks)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_features_for_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+# ---------------------------------------------------------------------- pipeline
+
+def _iter_results(path: str) -> Iterator[Dict]:
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        yield from csv.DictReader(f)
+
+
+def _write_features(rows: List[Dict], output_dir: str, fmt: str, part_number: int) -> List[str]:
+    columns = {name: encode_column(kind, [row[name] for row in rows]) for name, kind in FEATURE_SCHEMA.items()}
+    return _write_partitions(output_dir, fmt, FEATURE_SCHEMA, columns,
+                             columns["start_time"], columns["loa_level"], part_number)
+
+
+def _is_feature_table(path: str) -> bool:
+    """True for a missing or empty directory, or one holding only date=... partitions."""
+    if not os.path.exists(path):
+        return True
+    if not os.path.isdir(path):
+        return False
+    return all(entry.is_dir() and entry.name.startswith("date=") for entry in os.scandir(path))
+
+
+def _swap_in(new_dir: str, output_dir: str) -> None:
+    """Replace output_dir with new_dir, keeping the old table until the new one is in place."""
+    if not os.path.exists(output_dir):
+        os.replace(new_dir, output_dir)
+        return
+    old_dir = tempfile.mkdtemp(prefix=".features-old-", dir=os.path.dirname(output_dir))
+    os.replace(output_dir, os.path.join(old_dir, "table"))
+    try:
+        os.replace(new_dir, output_dir)
+    except OSError:
+        os.replace(os.path.join(old_dir, "table"), output_dir)
+        raise
+    finally:
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def build_features(data_dir: str = "data", output_dir: Optional[str] = None, workers: Optional[int] = None,
+                   chunk_rows: int = DEFAULT_CHUNK_ROWS, trials_per_task: int = DEFAULT_TRIALS_PER_TASK,
+                   part_rows: int = DEFAULT_PART_ROWS, fmt: str = "auto") -> Dict[str, int]:
+    """
+    Rebuild the per-trial feature table.
+
+    Args:
+        data_dir: Directory holding results.csv and the interaction log
+        output_dir: Feature table location (default: <data_dir>/export/features);
+            replaced on every run. The table is built in a directory next to
+            it and swapped in; anything else already there is refused
+        workers: Feature processes (default: CPU count; 1 computes in-process)
+        chunk_rows: Rows sorted in memory before spilling to disk
+        trials_per_task: Trials sent to a worker at a time
+        part_rows: Feature rows buffered before a part is written
+        fmt: "parquet", "feather", "npy" or "auto" (parquet with pyarrow)
+
+    Returns:
+        Counts of trials, joined events, trials without events, events
+        without a results row, and parts written
+
+    Raises:
+        ValueError: output_dir exists and is not a feature table
+    """
+    if fmt == "auto":
+        fmt = "parquet" if PYARROW_AVAILABLE else "npy"
+    if fmt in ("parquet", "feather") and not PYARROW_AVAILABLE:
+        raise RuntimeError(f"Format '{fmt}' requires pyarrow; install it or use --format npy")
+    output_dir = output_dir or os.path.join(data_dir, "export", "features")
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+
+    store = InteractionStore(os.path.join(data_dir, "interactions"),
+                             legacy_file=os.path.join(data_dir, "interactions.json"), readonly=True)
+    output_dir = os.path.abspath(output_dir)
+    if not _is_feature_table(output_dir):
+        raise ValueError(f"{output_dir} exists and is not a feature table; choose another output directory")
+    os.makedirs(os.path.dirname(output_dir), exist_ok=True)
+
+    stats: Dict[str, int] = {}
+    parts: List[str] = []
+    buffer: List[Dict] = []
+    with tempfile.TemporaryDirectory(prefix=".features-", dir=os.path.dirname(output_dir)) as build_dir:
+        table_dir, runs_dir = os.path.join(build_dir, "table"), os.path.join(build_dir, "runs")
+        os.makedirs(table_dir)
+        os.makedirs(runs_dir)
+        results = external_sort(_iter_results(os.path.join(data_dir, "results.csv")), trial_key,
+                                chunk_rows, runs_dir)
+        events = external_sort(store.iter_events(), _event_sort_key, chunk_rows, runs_dir)
+        joined = merge_join(results, events, stats)
+        for rows in _map_chunks(_chunks(joined, trials_per_task), workers):
+            buffer.extend(rows)
+            if len(buffer) >= part_rows:
+                parts.extend(_write_features(buffer, table_dir, fmt, len(parts) + 1))
+                buffer = []
+        if buffer:
+            parts.extend(_write_features(buffer, table_dir, fmt, len(parts) + 1))
+        _swap_in(table_dir, output_dir)
+    stats["parts"] = len(parts)
+    return stats
+
+
+def load_features(columns: Optional[Sequence[str]] = None, loa_levels: Optional[Iterable] = None,
+                  dates: Optional[Iterable] = None, data_dir: str = "data", output_dir: Optional[str] = None):
+    """Load the feature table as a pandas DataFrame (see columnar_export.load_results)."""
+    output_dir = output_dir or os.path.join(data_dir, "export", "features")
+    frame = _load_dataset(output_dir, FEATURE_SCHEMA, columns, dates, loa_levels)
+    if "start_time" in frame.columns and len(frame):
+        frame = frame.sort_values("start_time", kind="stable").reset_index(drop=True)
+    return frame
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build the per-trial feature table")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--output", default=None, help="Default: <data-dir>/export/features")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--format", default="auto", choices=["auto", "parquet", "feather", "npy"])
+    args = parser.parse_args(argv)
+
+    try:
+        stats = build_features(args.data_dir, args.output, args.workers, args.chunk_rows, fmt=args.format)
+    except ValueError as exc:
+        print(exc)
+        return 1
+    print(f"{stats['trials']} trials, {stats['events']} events joined, {stats['parts']} part(s) written")
+    if stats["trials_without_events"]:
+        print(f"  {stats['trials_without_events']} trial(s) had no logged interactions")
+    if stats["unmatched_events"]:
+        print(f"  {stats['unmatched_events']} event(s) belong to trials without a results row")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
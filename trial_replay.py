@@ -0,0 +1,178 @@
+"""
+Replay of a single trial from the logged interaction events.
+
+A timeline is rebuilt from the participant's events for one puzzle (read
+through the InteractionStore index) and their results.csv row. Each event
+becomes a compact [code, ms_offset, board, arg] entry:
+
+    code       index into EVENT_TYPES (process_mining)
+    ms_offset  milliseconds since the trial started
+    board      index into `boards`, the distinct solution-zone states, each
+               a list of indices into `elements`
+    arg        element index for drag/drop events, hint number for hints,
+               LOA3 step index for continue/retry, otherwise -1
+
+Board states are reconstructed from drag/drop events; the LOA4 board
+starts pre-filled with the puzzle elements as in templates/puzzle.html.
+The LOA3 auto-fill of the final step is not logged and is therefore not
+part of the replayed board.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from data_logger import DataLogger
+from process_mining import EVENT_CODES, EVENT_TYPES, OTHER_CODE
+
+
+DEFAULT_CACHE_SIZE = 128
+ELEMENT_EVENTS = ("drag_start", "drop_in_solution", "return_to_pool")
+
+
+def _parse_time(value) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(str(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _as_int(value, default: int = -1) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def build_timeline(events: List[Dict], result: Optional[Dict] = None,
+                   puzzle: Optional[Dict] = None) -> Dict:
+    """
+    Build the compact timeline for one trial.
+
+    Args:
+        events: The trial's interaction events in logged order
+        result: The trial's results.csv row, if the puzzle was submitted
+        puzzle: The puzzle definition from logic_puzzles.json
+
+    Returns:
+        JSON-serialisable timeline dictionary
+    """
+    result = result or {}
+    elements: List[str] = list((puzzle or {}).get("elements", []))
+    element_ids = {name: i for i, name in enumerate(elements)}
+
+    def element_id(name) -> int:
+        if name is None:
+            return -1
+        name = str(name)
+        if name not in element_ids:
+            element_ids[name] = len(elements)
+            elements.append(name)
+        return element_ids[name]
+
+    loa_level = _as_int(result.get("loa_level"))
+    board: List[int] = list(range(len(elements))) if loa_level == 4 else []
+    boards: List[List[int]] = []
+    board_ids: Dict[Tuple[int, ...], int] = {}
+
+    def board_id() -> int:
+        key = tuple(board)
+        if key not in board_ids:
+            board_ids[key] = len(boards)
+            boards.append(list(key))
+        return board_ids[key]
+
+    start = _parse_time(result.get("start_time"))
+    if start is None and events:
+        start = _parse_time(events[0].get("timestamp"))
+
+    timeline = []
+    for event in events:
+        kind = event.get("interaction_type") or ""
+        code = EVENT_CODES.get(kind, OTHER_CODE)
+        details = event.get("details") or {}
+        arg = -1
+
+        if kind in ELEMENT_EVENTS:
+            arg = element_id(details.get("element"))
+        if kind == "drop_in_solution" and arg >= 0:
+            if arg in board:
+                board.remove(arg)
+            # `position` counts the hidden empty-state placeholder as child 0
+            position = max(_as_int(details.get("position"), len(board) + 1) - 1, 0)
+            board.insert(min(position, len(board)), arg)
+        elif kind == "return_to_pool" and arg in board:
+            board.remove(arg)
+        elif kind == "clear_solution":
+            board.clear()
+        elif kind == "request_hint":
+            arg = _as_int(details.get("hint_number"))
+        elif kind in ("loa3_continue_step", "loa3_retry_step"):
+            arg = _as_int(details.get("current_step_index"))
+
+        moment = _parse_time(event.get("timestamp"))
+        offset = int(round((moment - start).total_seconds() * 1000)) if moment and start else -1
+        timeline.append([code, offset, board_id(), arg])
+
+    return {
+        "participant_id": result.get("participant_id", events[0].get("participant_id") if events else None),
+        "puzzle_id": _as_int(result.get("puzzle_id", events[0].get("puzzle_id") if events else None)),
+        "loa_level": loa_level,
+        "ai_faulty": str(result.get("ai_faulty", "")).lower() == "true",
+        "complete": bool(result),
+        "start_time": start.isoformat() if start else None,
+        "completion_time": float(result["completion_time"]) if result.get("completion_time") else None,
+        "final_answer": result.get("final_answer"),
+        "final_correctness": str(result.get("final_correctness", "")).lower() == "true" if result else None,
+        "event_types": EVENT_TYPES,
+        "elements": elements,
+        "boards": boards,
+        "events": timeline,
+    }
+
+
+class ReplayService:
+    """Builds trial timelines and keeps recently replayed ones as serialised JSON."""
+
+    def __init__(self, logger: DataLogger, puzzles: Optional[List[Dict]] = None,
+                 cache_size: int = DEFAULT_CACHE_SIZE):
+        self.logger = logger
+        self.puzzles = {_as_int(p.get("puzzle_id")): p for p in (puzzles or [])}
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, int], str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _result_row(self, participant_id: str, puzzle_id: int) -> Optional[Dict]:
+        for row in self.logger.get_participant_data(participant_id):
+            if _as_int(row.get("puzzle_id")) == puzzle_id:
+                return row
+        return None
+
+    def replay(self, participant_id: str, puzzle_id: int) -> Optional[str]:
+        """
+        Return the trial timeline as JSON, or None if nothing was logged.
+
+        Only submitted trials are cached; an in-progress trial can still grow.
+        """
+        key = (str(participant_id), int(puzzle_id))
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+
+        result = self._result_row(*key)
+        events = self.logger.get_participant_interactions(*key)
+        if result is None and not events:
+            return None
+        payload = json.dumps(build_timeline(events, result, self.puzzles.get(key[1])), separators=(",", ":"))
+
+        if result is not None:
+            with self._lock:
+                self._cache[key] = payload
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return payload